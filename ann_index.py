@@ -0,0 +1,131 @@
+import math
+import os
+
+# Index types: "flat" (exact), "ivf", "hnsw", "ivfpq".
+# Storage: "float32", "float16" or "int8" (scalar-quantized codes); ignored by ivfpq.
+INDEX_TYPES = ("flat", "ivf", "hnsw", "ivfpq")
+STORAGE_CODES = {"float32": "Flat", "float16": "SQfp16", "int8": "SQ8"}
+
+TRAINING_SAMPLE_SIZE = 50000
+MIN_POINTS_PER_CENTROID = 39
+
+
+def index_spec_from_env():
+    """
+    Index configuration read from RAG_INDEX_* variables. The spec is part of
+    the index settings, so changing it triggers a rebuild on next start.
+    """
+    return {
+        "index_type": os.environ.get("RAG_INDEX_TYPE", "flat"),
+        "storage": os.environ.get("RAG_INDEX_STORAGE", "float32"),
+        "nlist": int(os.environ.get("RAG_INDEX_NLIST", "0")),
+        "hnsw_m": int(os.environ.get("RAG_INDEX_HNSW_M", "32")),
+        "pq_m": int(os.environ.get("RAG_INDEX_PQ_M", "16"))
+    }
+
+
+def search_params_from_env():
+    return {
+        "nprobe": int(os.environ.get("RAG_INDEX_NPROBE", "8")),
+        "ef_search": int(os.environ.get("RAG_INDEX_EF_SEARCH", "64"))
+    }
+
+
+def default_nlist(n_vectors):
+    """
+    ~4*sqrt(n) inverted lists, capped so every centroid still gets enough
+    training points.
+    """
+    nlist = int(4 * math.sqrt(max(n_vectors, 1)))
+    return max(1, min(nlist, n_vectors // MIN_POINTS_PER_CENTROID or 1))
+
+
+def factory_string(spec, n_vectors):
+    index_type = spec["index_type"]
+    storage = STORAGE_CODES[spec["storage"]]
+
+    if index_type == "flat":
+        return storage
+
+    if index_type == "hnsw":
+        m = spec["hnsw_m"]
+        return f"HNSW{m}" if storage == "Flat" else f"HNSW{m}_{storage}"
+
+    nlist = spec["nlist"] or default_nlist(n_vectors)
+
+    if index_type == "ivf":
+        return f"IVF{nlist},{storage}"
+    if index_type == "ivfpq":
+        # PQ codebooks need 2**nbits training points; shrink them for tiny corpora.
+        nbits = max(1, min(8, int(math.log2(max(n_vectors, 2)))))
+        return f"IVF{nlist},PQ{spec['pq_m']}x{nbits}"
+
+    raise ValueError(f"Unknown index type {index_type!r}; expected one of {INDEX_TYPES}")
+
+
+def supports_incremental(spec):
+    """
+    Flat-code indexes compact on remove_ids, which is what LangChain's
+    FAISS.delete assumes. IVF keeps stale positions and HNSW cannot remove
+    at all, so those are rebuilt whenever the documents change.
+    """
+    return spec["index_type"] == "flat"
+
+
+def needs_training(spec):
+    return spec["index_type"] in ("ivf", "ivfpq") or spec["storage"] == "int8"
+
+
+def build_index(spec, vectors, seed=0):
+    """
+    Creates the FAISS index for ``spec`` and trains it on a random sample of
+    ``vectors`` when the index type needs training. Vectors are not added.
+    """
+    import faiss
+    import numpy as np
+
+    vectors = np.ascontiguousarray(vectors, dtype="float32")
+    index = faiss.index_factory(vectors.shape[1], factory_string(spec, len(vectors)))
+
+    if not index.is_trained:
+        if len(vectors) > TRAINING_SAMPLE_SIZE:
+            rng = np.random.default_rng(seed)
+            sample = vectors[rng.choice(len(vectors), TRAINING_SAMPLE_SIZE, replace=False)]
+        else:
+            sample = vectors
+        index.train(sample)
+
+    return index
+
+
+def empty_index(spec, dimension):
+    """
+    An index of ``spec``'s type holding no vectors (an empty knowledge
+    base). Types that need training stay untrained and cannot be
+    searched, so callers check ``ntotal`` first.
+    """
+    import faiss
+
+    return faiss.index_factory(dimension, factory_string(spec, 0))
+
+
+def apply_search_params(index, nprobe=None, ef_search=None):
+    """
+    Sets query-time knobs on whichever index type is loaded; a no-op for flat.
+    """
+    import faiss
+
+    ivf = faiss.try_extract_index_ivf(index)
+    if ivf is not None and nprobe:
+        ivf.nprobe = min(nprobe, ivf.nlist)
+
+    if hasattr(index, "hnsw") and ef_search:
+        index.hnsw.efSearch = ef_search
+
+    return index
+
+
+def index_memory_bytes(index):
+    import faiss
+
+    return int(faiss.serialize_index(index).nbytes)
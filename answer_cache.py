@@ -0,0 +1,232 @@
+import os
+import threading
+
+import rag_engine
+import telemetry
+from calendar_service import get_service_manager
+from event_cache import ALL_TIME, event_bounds, to_epoch
+from google_calendar_server import SEARCH_INDEX_ENABLED, TIMEZONE, get_event_cache, observe_read
+from intent_router import default_list_range
+from rag_engine import normalize_query
+from ttl_cache import TTLCache
+
+ANSWER_CACHE_ENABLED = os.environ.get("AGENT_ANSWER_CACHE", "1") == "1"
+ANSWER_CACHE_SIZE = int(os.environ.get("AGENT_ANSWER_CACHE_SIZE", "256"))
+# Backstop only: calendar answers are re-validated against the event
+# cache on every hit and knowledge answers against the installed index.
+ANSWER_CACHE_TTL = float(os.environ.get("AGENT_ANSWER_CACHE_TTL", "900"))
+
+CALENDAR_INTENTS = {"list", "search"}
+
+# Totals across every user's cache, for metrics.
+ANSWER_STATS = {"hits": 0, "misses": 0, "uncacheable": 0, "invalidated": 0, "stale": 0}
+
+
+class _Answer:
+    __slots__ = ("result", "calendar_id", "start", "end", "event_ids", "index_version")
+
+    def __init__(self, result, calendar_id=None, start=None, end=None, event_ids=(), index_version=None):
+        self.result = result
+        self.calendar_id = calendar_id
+        self.start = start
+        self.end = end
+        self.event_ids = event_ids
+        self.index_version = index_version
+
+    def affected_by(self, calendar_id, changed_ids, changed_bounds):
+        if calendar_id != self.calendar_id:
+            return False
+        if not self.event_ids.isdisjoint(changed_ids):
+            return True
+        return any(start < self.end and end > self.start for start, end in changed_bounds)
+
+
+class _Ticket:
+    __slots__ = ("key", "intent", "scope", "generation", "index_version")
+
+    def __init__(self, key, intent, scope, generation, index_version=None):
+        self.key = key
+        self.intent = intent
+        self.scope = scope
+        self.generation = generation
+        self.index_version = index_version
+
+
+class AnswerCache:
+    """
+    Whole agent responses, keyed by normalized query, intent and slots.
+    One cache lives on each user's CalendarServiceManager, so the user is
+    part of the key by construction.
+
+    Calendar answers remember the window and the event ids they were
+    built from. The cache listens to the EventCache: an incremental sync
+    (sync-token change) or a write-through from create_event that touches
+    one of those ids or lands inside the window drops the answer. Before
+    a hit is served the window is brought up to date the same way
+    list_events would, so remote edits are seen, and the read is reported
+    to the prefetcher as list_events would. Knowledge answers are tied to
+    rag_engine.index_version(), so rebuilding the index drops them.
+    """
+
+    def __init__(self, event_cache, maxsize=ANSWER_CACHE_SIZE, ttl=ANSWER_CACHE_TTL, tz=TIMEZONE):
+        self._events = event_cache
+        self._tz = tz
+        self._entries = TTLCache(maxsize=maxsize, ttl=ttl)
+        self._lock = threading.Lock()
+        self._generation = 0
+
+    # ---------- EventCache listener ----------
+
+    def on_apply(self, calendar_id, events, removed_ids):
+        if not events and not removed_ids:
+            return
+
+        changed_ids = set(removed_ids)
+        changed_bounds = []
+        for event in events:
+            changed_ids.add(event["id"])
+            bounds = event_bounds(event, self._tz)
+            if bounds is not None:
+                changed_bounds.append(bounds)
+        self._invalidate(lambda answer: answer.affected_by(calendar_id, changed_ids, changed_bounds))
+
+    def on_invalidate(self, calendar_id):
+        self._invalidate(
+            lambda answer: answer.calendar_id is not None and calendar_id in (None, answer.calendar_id)
+        )
+
+    def _invalidate(self, affected):
+        with self._lock:
+            self._generation += 1
+        doomed = {key for key, answer in self._entries.items() if affected(answer)}
+        if doomed:
+            ANSWER_STATS["invalidated"] += self._entries.discard_where(doomed.__contains__)
+
+    # ---------- lookups ----------
+
+    def scope(self, intent, slots):
+        """
+        (calendar_id, start_ts, end_ts, fill) a calendar answer depends on,
+        mirroring the arguments the agent passes to list/search_events.
+        """
+        if intent == "list":
+            default_start, default_end = default_list_range()
+            start_ts = to_epoch(slots["start_date"] or default_start, self._tz)
+            end_ts = to_epoch(slots["end_date"] or default_end, self._tz)
+            return "primary", start_ts, end_ts, True
+        return ("primary",) + ALL_TIME + (SEARCH_INDEX_ENABLED,)
+
+    def get(self, user_query, routed):
+        """
+        Returns (result, ticket). On a miss ``result`` is None and the
+        ticket goes back to put() with the computed result; a None ticket
+        means the query is not cacheable (creates, unknown intents).
+        """
+        intent, slots = routed["intent"], routed["slots"]
+        if intent not in CALENDAR_INTENTS and intent != "knowledge":
+            ANSWER_STATS["uncacheable"] += 1
+            return None, None
+
+        key = (normalize_query(user_query), intent, tuple(sorted(slots.items())))
+        answer = self._entries.get(key)
+
+        scope = None
+        version = None
+        if intent in CALENDAR_INTENTS:
+            scope = self.scope(intent, slots)
+            calendar_id, start_ts, end_ts, fill = scope
+            if answer is not None and intent == "list":
+                observe_read(calendar_id, start_ts, end_ts)
+
+            # Runs the incremental sync when the window is stale; any change
+            # reaches on_apply() and drops affected answers before we look.
+            generation = self._generation
+            if not self._events.refresh(calendar_id, start_ts, end_ts, fill=fill):
+                ANSWER_STATS["uncacheable"] += 1
+                return None, None
+            if generation != self._generation:
+                answer = self._entries.get(key)
+        else:
+            version = rag_engine.index_version()
+            if answer is not None and answer.index_version != version:
+                self._entries.pop(key)
+                ANSWER_STATS["stale"] += 1
+                answer = None
+
+        ticket = _Ticket(key, intent, scope, self._generation, version)
+
+        if answer is None:
+            ANSWER_STATS["misses"] += 1
+            return None, ticket
+
+        ANSWER_STATS["hits"] += 1
+        return dict(answer.result), None
+
+    def put(self, ticket, result):
+        if ticket is None:
+            return
+
+        if ticket.intent == "knowledge":
+            self._entries.put(ticket.key, _Answer(result, index_version=ticket.index_version))
+            return
+
+        calendar_id, start_ts, end_ts, _ = ticket.scope
+        events = result.get("response")
+        if not isinstance(events, list):
+            return
+
+        with self._lock:
+            # Something changed while the answer was computed; it may
+            # predate the change and we cannot tell, so leave it out.
+            if ticket.generation != self._generation:
+                return
+            self._entries.put(ticket.key, _Answer(
+                result,
+                calendar_id=calendar_id,
+                start=start_ts,
+                end=end_ts,
+                event_ids=frozenset(event.get("id") for event in events)
+            ))
+
+    def clear(self):
+        self._entries.clear()
+
+    def __len__(self):
+        return len(self._entries)
+
+
+def _new_answer_cache():
+    cache = AnswerCache(get_event_cache())
+    get_event_cache().subscribe(cache)
+    return cache
+
+
+def get_answer_cache():
+    return get_service_manager().get_scoped("answer_cache", _new_answer_cache)
+
+
+def lookup(user_query, routed):
+    """
+    get() on the current user's cache; (None, None) when caching is off.
+    """
+    if not ANSWER_CACHE_ENABLED:
+        return None, None
+
+    result, ticket = get_answer_cache().get(user_query, routed)
+    telemetry.current_span().set(answer_cache="hit" if result is not None else "miss")
+    return result, ticket
+
+
+def store(ticket, result):
+    if ticket is not None:
+        get_answer_cache().put(ticket, result)
+
+
+def _collect_metrics():
+    total = ANSWER_STATS["hits"] + ANSWER_STATS["misses"]
+    metrics = {f"agent.answer_cache.{name}": value for name, value in ANSWER_STATS.items()}
+    metrics["agent.answer_cache.hit_rate"] = ANSWER_STATS["hits"] / total if total else 0.0
+    return metrics
+
+
+telemetry.register_collector(_collect_metrics)
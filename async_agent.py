@@ -0,0 +1,146 @@
+import asyncio
+import contextvars
+import functools
+import os
+from concurrent.futures import ThreadPoolExecutor
+
+import answer_cache
+import google_calendar_server
+import rag_engine
+import telemetry
+from calendar_client import intent_steps
+from intent_router import route
+
+MAX_WORKERS = int(os.environ.get("AGENT_MAX_WORKERS", "16"))
+
+_EXECUTOR = None
+
+
+# ---------------- EXECUTOR ----------------
+
+def get_executor():
+    """
+    Bounded pool that runs the blocking Calendar/FAISS calls. It is sized
+    separately from the event loop so a burst of queries queues here
+    instead of spawning unbounded threads.
+    """
+    global _EXECUTOR
+
+    if _EXECUTOR is None:
+        _EXECUTOR = ThreadPoolExecutor(
+            max_workers=MAX_WORKERS,
+            thread_name_prefix="agent-io"
+        )
+    return _EXECUTOR
+
+
+def shutdown_executor():
+    global _EXECUTOR
+
+    if _EXECUTOR is not None:
+        _EXECUTOR.shutdown(wait=True)
+        _EXECUTOR = None
+
+
+async def run_blocking(fn, *args, **kwargs):
+    # Run in a copy of the caller's context so tool spans nest under the query span.
+    loop = asyncio.get_running_loop()
+    context = contextvars.copy_context()
+    return await loop.run_in_executor(
+        get_executor(),
+        functools.partial(context.run, fn, *args, **kwargs)
+    )
+
+
+# ---------------- ASYNC TOOLS ----------------
+
+async def list_events(start_date: str, end_date: str, **kwargs):
+    return await run_blocking(google_calendar_server.list_events, start_date, end_date, **kwargs)
+
+
+async def search_events(keyword: str, **kwargs):
+    return await run_blocking(google_calendar_server.search_events, keyword, **kwargs)
+
+
+async def create_event(title, date, start_time, end_time, description="", location=""):
+    return await run_blocking(
+        google_calendar_server.create_event,
+        title, date, start_time, end_time, description, location
+    )
+
+
+async def create_events_bulk(events, **kwargs):
+    return await run_blocking(google_calendar_server.create_events_bulk, events, **kwargs)
+
+
+async def retrieve_context(query: str, k: int = 2):
+    return await run_blocking(rag_engine.retrieve_context, query, k)
+
+
+TOOLS = {
+    "list_events": list_events,
+    "search_events": search_events,
+    "create_event": create_event,
+    "retrieve_context": retrieve_context
+}
+
+
+# ---------------- ASYNC AGENT ----------------
+
+@telemetry.traced("agent.query")
+async def agent_decide_and_act(user_query: str):
+    """
+    Async counterpart of calendar_client.agent_decide_and_act. Routing and
+    response shape are identical; only the I/O is awaited.
+    """
+    telemetry.event("agent.query", f"Received query: {user_query}", query=user_query)
+    with telemetry.span("agent.route"):
+        routed = route(user_query)
+    telemetry.current_span().set(intent=routed["intent"])
+
+    # lookup() may run an incremental sync, so it goes to the executor too.
+    cached, ticket = await run_blocking(answer_cache.lookup, user_query, routed)
+    if cached is not None:
+        telemetry.event("agent.reasoning", "Answered this question before; reusing the answer")
+        return cached
+
+    result = await _act(user_query, routed["intent"], routed["slots"])
+    answer_cache.store(ticket, result)
+    return result
+
+
+async def _act(user_query, intent, slots, tools=TOOLS):
+    # Same steps as calendar_client._act, with the tool calls awaited.
+    steps = intent_steps(user_query, intent, slots)
+    try:
+        name, args, kwargs = next(steps)
+        while True:
+            name, args, kwargs = steps.send(await tools[name](*args, **kwargs))
+    except StopIteration as done:
+        return done.value
+
+
+async def gather_calendar_and_context(user_query: str, start_date: str, end_date: str):
+    """
+    Fetches the calendar window and the knowledge-base context for a query
+    at the same time instead of one after the other.
+    """
+    events, context = await asyncio.gather(
+        list_events(start_date, end_date),
+        retrieve_context(user_query)
+    )
+    return {"events": events, "context": context}
+
+
+async def run_queries(queries, concurrency: int = MAX_WORKERS):
+    """
+    Answers many independent queries (e.g. one per user) concurrently,
+    with at most ``concurrency`` in flight. Results keep the input order.
+    """
+    semaphore = asyncio.Semaphore(concurrency)
+
+    async def run_one(query):
+        async with semaphore:
+            return await agent_decide_and_act(query)
+
+    return await asyncio.gather(*(run_one(query) for query in queries))
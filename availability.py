@@ -0,0 +1,192 @@
+import bisect
+import threading
+
+from event_cache import event_bounds, to_epoch
+from ttl_cache import TTLCache
+
+FREEBUSY_TTL_SECONDS = 60
+
+
+# ================= INTERVAL INDEX =================
+
+class IntervalIndex:
+    """
+    Static index over busy intervals.
+
+    Overlap counts use two sorted arrays: an interval overlaps [a, b) iff
+    it starts before b and does not end at or before a, so the count is
+    bisect(starts, b) - bisect(ends, a). Free-slot search walks the
+    merged busy blocks from a bisected starting point.
+    """
+
+    def __init__(self, intervals):
+        items = sorted(intervals, key=lambda item: (item[0], item[1]))
+
+        self._items = items
+        self._starts = [start for start, _, _ in items]
+        self._ends = sorted(end for _, end, _ in items)
+        self._max_duration = max((end - start for start, end, _ in items), default=0)
+
+        merged = []
+        for start, end, _ in items:
+            if merged and start <= merged[-1][1]:
+                if end > merged[-1][1]:
+                    merged[-1][1] = end
+            else:
+                merged.append([start, end])
+
+        self._block_starts = [start for start, _ in merged]
+        self._block_ends = [end for _, end in merged]
+
+    def __len__(self):
+        return len(self._items)
+
+    def count_overlaps(self, start_ts, end_ts):
+        return (
+            bisect.bisect_left(self._starts, end_ts)
+            - bisect.bisect_right(self._ends, start_ts)
+        )
+
+    def is_free(self, start_ts, end_ts):
+        return self.count_overlaps(start_ts, end_ts) == 0
+
+    def overlapping(self, start_ts, end_ts):
+        """
+        Payloads of the intervals overlapping [start_ts, end_ts).
+        """
+        lo = bisect.bisect_left(self._starts, start_ts - self._max_duration)
+        hi = bisect.bisect_left(self._starts, end_ts)
+        return [
+            payload
+            for start, end, payload in self._items[lo:hi]
+            if end > start_ts
+        ]
+
+    def free_slots(self, start_ts, end_ts, length, count, step=None):
+        """
+        Up to ``count`` free [start, start + length) slots between start_ts
+        and end_ts, earliest first. Consecutive slots in one gap are
+        ``step`` seconds apart (default: back to back).
+        """
+        step = step or length
+        slots = []
+        cursor = start_ts
+
+        # First block that ends after the cursor.
+        position = bisect.bisect_right(self._block_ends, cursor)
+
+        while len(slots) < count and cursor + length <= end_ts:
+            if position < len(self._block_starts):
+                gap_end = min(self._block_starts[position], end_ts)
+            else:
+                gap_end = end_ts
+
+            if cursor < gap_end:
+                while len(slots) < count and cursor + length <= gap_end:
+                    slots.append((cursor, cursor + length))
+                    cursor += step
+
+            if position >= len(self._block_starts):
+                break
+
+            cursor = max(cursor, self._block_ends[position])
+            position += 1
+
+        return slots
+
+
+def busy_intervals(events, tz=None):
+    """
+    Busy (start, end, event) triples for cached events. Events marked
+    transparent ("show me as available") and cancelled events are skipped.
+    """
+    intervals = []
+    for event in events:
+        if event.get("transparency") == "transparent" or event.get("status") == "cancelled":
+            continue
+        bounds = event_bounds(event, tz)
+        if bounds:
+            intervals.append((bounds[0], bounds[1], event))
+    return intervals
+
+
+# ================= ENGINE =================
+
+class AvailabilityEngine:
+    """
+    Answers free/busy questions for a calendar.
+
+    Ranges already in the EventCache are answered from an IntervalIndex
+    built over every cached event of the calendar; it is rebuilt only when
+    the cache's version for that calendar changes. Cold ranges go to the
+    Calendar freebusy endpoint via ``fetch_freebusy(calendar_id, start_ts,
+    end_ts)``, which returns [(start_ts, end_ts), ...]; those results are
+    kept for a short TTL.
+    """
+
+    def __init__(self, event_cache, fetch_freebusy, tz=None):
+        self._event_cache = event_cache
+        self._fetch_freebusy = fetch_freebusy
+        self._tz = tz
+        self._lock = threading.Lock()
+        self._indexes = {}
+        self._freebusy = TTLCache(maxsize=256, ttl=FREEBUSY_TTL_SECONDS)
+        self.stats = {"cache_index_builds": 0, "freebusy_calls": 0}
+
+    def index_for(self, calendar_id, start_ts, end_ts):
+        if self._event_cache is not None and self._event_cache.ensure(
+            calendar_id, start_ts, end_ts, fill=False
+        ):
+            version, entries = self._event_cache.snapshot(calendar_id)
+
+            with self._lock:
+                cached = self._indexes.get(calendar_id)
+                if cached is None or cached[0] != version:
+                    events = [event for _, _, event in entries]
+                    cached = (version, IntervalIndex(busy_intervals(events, self._tz)))
+                    self._indexes[calendar_id] = cached
+                    self.stats["cache_index_builds"] += 1
+            return cached[1]
+
+        key = (calendar_id, start_ts, end_ts)
+        index = self._freebusy.get(key)
+        if index is None:
+            self.stats["freebusy_calls"] += 1
+            busy = self._fetch_freebusy(calendar_id, start_ts, end_ts)
+            index = IntervalIndex([(start, end, (start, end)) for start, end in busy])
+            self._freebusy.put(key, index)
+        return index
+
+    def invalidate_freebusy(self):
+        self._freebusy.clear()
+
+    def is_free(self, calendar_id, start_ts, end_ts):
+        return self.index_for(calendar_id, start_ts, end_ts).is_free(start_ts, end_ts)
+
+    def conflicts(self, calendar_id, start_ts, end_ts):
+        """
+        Events overlapping the range, or (start_ts, end_ts) busy blocks when
+        the answer came from freebusy.
+        """
+        index = self.index_for(calendar_id, start_ts, end_ts)
+        return index.overlapping(start_ts, end_ts)
+
+    def free_slots(self, calendar_id, start_ts, end_ts, length, count=3, step=None):
+        index = self.index_for(calendar_id, start_ts, end_ts)
+        return index.free_slots(start_ts, end_ts, length, count, step)
+
+
+def parse_freebusy(response, calendar_id):
+    """
+    Extracts [(start_ts, end_ts), ...] for one calendar from a
+    freebusy().query response.
+    """
+    calendar = response.get("calendars", {}).get(calendar_id, {})
+    if calendar.get("errors"):
+        reasons = ", ".join(error.get("reason", "unknown") for error in calendar["errors"])
+        raise RuntimeError(f"freebusy failed for {calendar_id}: {reasons}")
+
+    return [
+        (to_epoch(block["start"]), to_epoch(block["end"]))
+        for block in calendar.get("busy", [])
+    ]
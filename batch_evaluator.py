@@ -0,0 +1,320 @@
+import argparse
+import itertools
+import json
+import os
+import sys
+import time
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
+
+import numpy as np
+
+import rag_engine
+import telemetry
+from intent_router import route
+
+BATCH_SIZE = int(os.environ.get("EVAL_BATCH_SIZE", "256"))
+EVAL_WORKERS = int(os.environ.get("EVAL_WORKERS", str(os.cpu_count() or 1)))
+REFERENCES_K = 2
+# Cosine similarity between an answer and its best reference needed to
+# count as grounded.
+GROUNDING_THRESHOLD = float(os.environ.get("EVAL_GROUNDING_THRESHOLD", "0.6"))
+
+ID_KEYS = ("request_id", "id")
+QUERY_KEYS = ("query", "user_query", "body")
+RESPONSE_KEYS = ("response", "result")
+
+
+# ---------------- RECORDS ----------------
+
+def _first(record, keys):
+    for key in keys:
+        if record.get(key) is not None:
+            return record[key]
+    return None
+
+
+def _unwrap(response):
+    # The agent returns {"response": ..., "evaluation": ...}.
+    if isinstance(response, dict) and "response" in response and "evaluation" in response:
+        return response["response"]
+    return response
+
+
+def answer_text(response):
+    """
+    The text to ground from a logged agent response: the knowledge
+    answer, or None for calendar results (nothing to embed).
+    """
+    response = _unwrap(response)
+    if isinstance(response, str):
+        return response
+    if isinstance(response, dict) and response.get("answer"):
+        answer = response["answer"]
+        return "\n".join(answer) if isinstance(answer, list) else str(answer)
+    return None
+
+
+def response_error(response):
+    """
+    The error a logged response reports ({"error": ...}), or None.
+    """
+    response = _unwrap(response)
+    if isinstance(response, dict) and response.get("error"):
+        return str(response["error"])
+    return None
+
+
+def parse_record(line, number):
+    """
+    One log line -> {"id", "query", "answer", "error", "intent"}. Lines
+    use the agent's request log shape: an id ("request_id" or "id", else
+    the line number), the query ("query", "user_query" or "body") and
+    optionally what the agent returned ("response" or "result").
+    Raises ValueError for a line that is not a JSON object.
+    """
+    record = json.loads(line)
+    if not isinstance(record, dict):
+        raise ValueError(f"expected a JSON object, got {type(record).__name__}")
+
+    query = _first(record, QUERY_KEYS) or ""
+    if not isinstance(query, str):
+        raise ValueError("query must be a string")
+    response = _first(record, RESPONSE_KEYS)
+    return {
+        "id": _first(record, ID_KEYS) or number,
+        "query": query,
+        "answer": answer_text(response),
+        "error": response_error(response),
+        "intent": record.get("intent") or route(query)["intent"],
+    }
+
+
+def read_batches(handle, batch_size):
+    """
+    Streams (line number, line) pairs from a JSONL file object in lists
+    of ``batch_size``; blank lines are skipped. Parsing happens in the
+    workers.
+    """
+    lines = ((number, line) for number, line in enumerate(handle, 1) if line.strip())
+    while True:
+        batch = list(itertools.islice(lines, batch_size))
+        if not batch:
+            return
+        yield batch
+
+
+# ---------------- SCORING ----------------
+
+def _unit_rows(vectors):
+    norms = np.linalg.norm(vectors, axis=-1, keepdims=True)
+    return vectors / np.where(norms == 0, 1, norms)
+
+
+def grounding_scores(answers, queries, references, embed):
+    """
+    Cosine similarities for a batch, computed as matrix operations over
+    one embedding call for every distinct text.
+
+    ``answers`` and ``queries`` hold one text (or None) per record and
+    ``references`` one list of texts per record. Returns (best, mean,
+    relevance) arrays: the answer's best and mean similarity to its
+    references and the query's best similarity to them; NaN where a
+    record has no answer or no references.
+    """
+    texts = list(dict.fromkeys(
+        [text for text in answers if text] + list(queries) + [text for refs in references for text in refs]
+    ))
+    position = {text: i for i, text in enumerate(texts)}
+    vectors = _unit_rows(np.asarray(embed(texts), dtype="float32"))
+
+    count = len(queries)
+    width = max((len(refs) for refs in references), default=0)
+    if width == 0:
+        empty = np.full(count, np.nan)
+        return empty, empty.copy(), empty.copy()
+
+    # (records, k) indexes into ``vectors``; -1 pads short reference lists.
+    ref_index = np.full((count, width), -1)
+    for row, refs in enumerate(references):
+        ref_index[row, :len(refs)] = [position[text] for text in refs]
+    valid = ref_index >= 0
+    ref_vectors = vectors[np.where(valid, ref_index, 0)]
+
+    query_vectors = vectors[[position[text] for text in queries]]
+    relevance = np.einsum("nd,nkd->nk", query_vectors, ref_vectors)
+
+    has_answer = np.array([bool(text) for text in answers])
+    answer_vectors = vectors[[position[text] if text else 0 for text in answers]]
+    similarity = np.einsum("nd,nkd->nk", answer_vectors, ref_vectors)
+
+    with np.errstate(invalid="ignore"):
+        best = np.where(valid, similarity, -np.inf).max(axis=1)
+        mean = np.where(valid, similarity, 0).sum(axis=1) / valid.sum(axis=1)
+        relevance = np.where(valid, relevance, -np.inf).max(axis=1)
+
+    no_refs = ~valid.any(axis=1)
+    best[no_refs | ~has_answer] = np.nan
+    mean[no_refs | ~has_answer] = np.nan
+    relevance[no_refs] = np.nan
+    return best, mean, relevance
+
+
+def evaluate_batch(lines, k=REFERENCES_K, threshold=GROUNDING_THRESHOLD):
+    """
+    Parses a batch of (line number, line) pairs, re-runs retrieval for all
+    of them in one vectorized call and scores them, in input order.
+
+    Answers are PASS/FAIL by grounding. Records without text to ground
+    (calendar results) are FAIL when the logged response is an error and
+    SKIPPED otherwise; a line that does not parse is ERROR.
+    """
+    results = [None] * len(lines)
+    batch = []
+    for position, (number, line) in enumerate(lines):
+        try:
+            batch.append((position, parse_record(line, number)))
+        except ValueError as exc:
+            results[position] = {"id": number, "result": "ERROR", "error": f"unreadable record: {exc}",
+                                 "grounding": None, "relevance": None}
+
+    if batch:
+        store = rag_engine.get_vector_store()
+        queries = [record["query"] for _, record in batch]
+        references = rag_engine.retrieve_context_batch(queries, k=k)
+        answers = [record["answer"] for _, record in batch]
+        best, mean, relevance = grounding_scores(answers, queries, references, store.embeddings.embed_documents)
+
+    for row, (position, record) in enumerate(batch):
+        result = {
+            "id": record["id"],
+            "intent": record["intent"],
+            "references": len(references[row]),
+            "grounding": None if np.isnan(best[row]) else round(float(best[row]), 4),
+            "grounding_mean": None if np.isnan(mean[row]) else round(float(mean[row]), 4),
+            "relevance": None if np.isnan(relevance[row]) else round(float(relevance[row]), 4),
+        }
+
+        if result["grounding"] is not None:
+            result["confidence_score"] = result["grounding"]
+            result["result"] = "PASS" if result["grounding"] >= threshold else "FAIL"
+        elif record["error"] is not None:
+            result["confidence_score"] = 0.0
+            result["result"] = "FAIL"
+            result["error"] = record["error"]
+        else:
+            result["confidence_score"] = None
+            result["result"] = "SKIPPED"
+        results[position] = result
+
+    return results
+
+
+def _init_worker():
+    telemetry.configure(enabled=False, console_events=False)
+
+
+# ---------------- PIPELINE ----------------
+
+def _summarize(grounding, relevance, counts, elapsed, workers):
+    grounding = np.asarray(grounding, dtype="float64")
+    relevance = np.asarray(relevance, dtype="float64")
+    total = sum(counts.values())
+
+    def stats(values):
+        if not len(values):
+            return None
+        p50, p95 = np.percentile(values, [50, 95])
+        return {"mean": float(values.mean()), "p50": float(p50), "p95": float(p95), "min": float(values.min())}
+
+    graded = counts.get("PASS", 0) + counts.get("FAIL", 0)
+    return {
+        "records": total,
+        "results": counts,
+        # Over graded records only: SKIPPED and ERROR are not verdicts.
+        "pass_rate": counts.get("PASS", 0) / graded if graded else 0.0,
+        "grounding": stats(grounding),
+        "relevance": stats(relevance),
+        "seconds": elapsed,
+        "records_per_sec": total / elapsed if elapsed else 0.0,
+        "workers": workers,
+    }
+
+
+def evaluate_log(log_path, output_path=None, workers=EVAL_WORKERS, batch_size=BATCH_SIZE,
+                 k=REFERENCES_K, threshold=GROUNDING_THRESHOLD):
+    """
+    Evaluates a JSONL log of agent interactions. Batches are read lazily
+    and at most two per worker are in flight; beyond that only the scores
+    are kept, for the percentiles. Per-record results go to
+    ``output_path`` (JSONL, in input order); returns the aggregate summary.
+    """
+    if workers > 1 and not rag_engine.READ_ONLY_INDEX:
+        # Sync the index once; workers then only load it.
+        error = rag_engine.prepare_read_only_index()
+        if error is not None:
+            raise RuntimeError(f"index preparation failed: {error}")
+
+    counts = {}
+    grounding = []
+    relevance = []
+    started = time.perf_counter()
+    output = open(output_path, "w") if output_path else None
+
+    def collect(results):
+        for result in results:
+            counts[result["result"]] = counts.get(result["result"], 0) + 1
+            if result["grounding"] is not None:
+                grounding.append(result["grounding"])
+            if result["relevance"] is not None:
+                relevance.append(result["relevance"])
+            if output is not None:
+                output.write(json.dumps(result) + "\n")
+
+    try:
+        with open(log_path) as handle:
+            batches = read_batches(handle, batch_size)
+            if workers <= 1:
+                for batch in batches:
+                    collect(evaluate_batch(batch, k, threshold))
+            else:
+                with ProcessPoolExecutor(max_workers=workers, initializer=_init_worker) as pool:
+                    pending = deque()
+                    for batch in batches:
+                        pending.append(pool.submit(evaluate_batch, batch, k, threshold))
+                        if len(pending) >= workers * 2:
+                            collect(pending.popleft().result())
+                    while pending:
+                        collect(pending.popleft().result())
+    finally:
+        if output is not None:
+            output.close()
+
+    return _summarize(grounding, relevance, counts, time.perf_counter() - started, workers)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Offline grounding evaluation over a JSONL interaction log")
+    parser.add_argument("log", help="JSONL log, one interaction per line")
+    parser.add_argument("--output", help="write per-record results to this JSONL file")
+    parser.add_argument("--summary", help="write the aggregate summary to this JSON file")
+    parser.add_argument("--workers", type=int, default=EVAL_WORKERS)
+    parser.add_argument("--batch-size", type=int, default=BATCH_SIZE)
+    parser.add_argument("--k", type=int, default=REFERENCES_K)
+    parser.add_argument("--threshold", type=float, default=GROUNDING_THRESHOLD)
+    args = parser.parse_args()
+
+    telemetry.configure(enabled=False, console_events=False)
+    summary = evaluate_log(args.log, args.output, args.workers, args.batch_size, args.k, args.threshold)
+
+    if args.summary:
+        with open(args.summary, "w") as out:
+            json.dump(summary, out, indent=2)
+    json.dump(summary, sys.stdout, indent=2)
+    print()
+    print(f"{summary['records']} records in {summary['seconds']:.1f} s ({summary['records_per_sec']:.1f} records/s)",
+          file=sys.stderr)
+
+
+if __name__ == "__main__":
+    main()
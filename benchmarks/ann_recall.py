@@ -0,0 +1,113 @@
+"""
+Recall@k vs. latency for the ANN index options in ann_index.
+
+Uses a synthetic clustered corpus (default 100k vectors of MiniLM's 384
+dimensions) so no model download is needed. Ground truth comes from an
+exact flat index; every configuration is built with ann_index.build_index
+exactly as kb_ingest would build it.
+
+    python -m benchmarks.ann_recall --vectors 100000 --queries 500 --k 4
+"""
+
+import argparse
+import json
+import time
+
+import faiss
+import numpy as np
+
+import ann_index
+from benchmarks.metrics import percentile
+
+CONFIGS = [
+    ({"index_type": "flat", "storage": "float32"}, [{}]),
+    ({"index_type": "flat", "storage": "float16"}, [{}]),
+    ({"index_type": "flat", "storage": "int8"}, [{}]),
+    ({"index_type": "ivf", "storage": "float32"}, [{"nprobe": n} for n in (1, 4, 16, 64)]),
+    ({"index_type": "ivf", "storage": "int8"}, [{"nprobe": n} for n in (4, 16, 64)]),
+    ({"index_type": "hnsw", "storage": "float32"}, [{"ef_search": e} for e in (16, 64, 128)]),
+    ({"index_type": "hnsw", "storage": "int8"}, [{"ef_search": e} for e in (64, 128)]),
+    ({"index_type": "ivfpq", "storage": "float32"}, [{"nprobe": n} for n in (8, 32, 128)]),
+]
+
+
+def synthetic_corpus(n_vectors, dimension, n_queries, clusters=1000, seed=0):
+    rng = np.random.default_rng(seed)
+    centers = rng.standard_normal((clusters, dimension)).astype("float32")
+    assignment = rng.integers(0, clusters, n_vectors)
+    corpus = centers[assignment] + 0.3 * rng.standard_normal((n_vectors, dimension)).astype("float32")
+    faiss.normalize_L2(corpus)
+
+    picks = rng.choice(n_vectors, n_queries, replace=False)
+    queries = corpus[picks] + 0.05 * rng.standard_normal((n_queries, dimension)).astype("float32")
+    faiss.normalize_L2(queries)
+
+    return corpus, queries
+
+
+def recall_at_k(found, truth):
+    hits = sum(len(set(f) & set(t)) for f, t in zip(found, truth))
+    return hits / truth.size
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--vectors", type=int, default=100000)
+    parser.add_argument("--dimension", type=int, default=384)
+    parser.add_argument("--queries", type=int, default=500)
+    parser.add_argument("--k", type=int, default=4)
+    parser.add_argument("--json", help="write results to this file")
+    args = parser.parse_args()
+
+    faiss.omp_set_num_threads(1)
+    corpus, queries = synthetic_corpus(args.vectors, args.dimension, args.queries)
+
+    exact = faiss.IndexFlatL2(args.dimension)
+    exact.add(corpus)
+    _, truth = exact.search(queries, args.k)
+
+    rows = []
+    for base, variants in CONFIGS:
+        spec = dict(nlist=0, hnsw_m=32, pq_m=16, **base)
+
+        started = time.perf_counter()
+        index = ann_index.build_index(spec, corpus)
+        index.add(corpus)
+        build_seconds = time.perf_counter() - started
+        memory_mb = ann_index.index_memory_bytes(index) / (1024 * 1024)
+
+        for params in variants:
+            ann_index.apply_search_params(index, **params)
+
+            latencies = []
+            found = []
+            for query in queries:
+                t0 = time.perf_counter()
+                _, ids = index.search(query[None, :], args.k)
+                latencies.append((time.perf_counter() - t0) * 1000)
+                found.append(ids[0])
+
+            rows.append({
+                "index": ann_index.factory_string(spec, args.vectors),
+                "params": params,
+                "build_seconds": build_seconds,
+                "memory_mb": memory_mb,
+                f"recall@{args.k}": recall_at_k(found, truth),
+                "p50_ms": percentile(latencies, 50),
+                "p99_ms": percentile(latencies, 99)
+            })
+            row = rows[-1]
+            print(
+                f"{row['index']:<22} {json.dumps(params):<20} "
+                f"recall@{args.k}={row[f'recall@{args.k}']:.3f}  "
+                f"p50={row['p50_ms']:.3f} ms  p99={row['p99_ms']:.3f} ms  "
+                f"mem={memory_mb:.1f} MB  build={build_seconds:.1f} s"
+            )
+
+    if args.json:
+        with open(args.json, "w") as out:
+            json.dump(rows, out, indent=2)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,86 @@
+"""
+Load test: sequential sync agent vs. the asyncio agent runtime.
+
+Both run the same mixed calendar workload against FakeCalendarBackend
+with simulated network latency, and report requests/sec and p50/p99.
+
+    python -m benchmarks.async_load --requests 200 --latency 0.05
+"""
+
+import argparse
+import asyncio
+import contextlib
+import io
+import time
+
+import async_agent
+import calendar_client
+import calendar_service
+import google_calendar_server
+from benchmarks.fake_calendar import FakeCalendarBackend
+from benchmarks.metrics import latency_summary, print_summary
+
+WORKLOAD = [
+    "Search for project events",
+    "Show my calendar events",
+    "Find the design review meeting",
+    "List my events",
+]
+
+
+def run_sync(queries):
+    latencies = []
+    started = time.perf_counter()
+
+    for query in queries:
+        t0 = time.perf_counter()
+        calendar_client.agent_decide_and_act(query)
+        latencies.append((time.perf_counter() - t0) * 1000)
+
+    return latency_summary(latencies, time.perf_counter() - started)
+
+
+async def run_async(queries, concurrency):
+    latencies = []
+    semaphore = asyncio.Semaphore(concurrency)
+
+    async def timed(query):
+        async with semaphore:
+            t0 = time.perf_counter()
+            await async_agent.agent_decide_and_act(query)
+            latencies.append((time.perf_counter() - t0) * 1000)
+
+    started = time.perf_counter()
+    await asyncio.gather(*(timed(query) for query in queries))
+    return latency_summary(latencies, time.perf_counter() - started)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--requests", type=int, default=200)
+    parser.add_argument("--latency", type=float, default=0.05)
+    parser.add_argument("--events", type=int, default=500)
+    parser.add_argument("--concurrency", type=int, default=async_agent.MAX_WORKERS)
+    args = parser.parse_args()
+
+    backend = FakeCalendarBackend(event_count=args.events, latency=args.latency)
+    calendar_service.set_service_manager(backend.manager(pool_size=args.concurrency))
+
+    queries = [WORKLOAD[i % len(WORKLOAD)] for i in range(args.requests)]
+
+    with contextlib.redirect_stdout(io.StringIO()):
+        google_calendar_server.get_event_cache().invalidate()
+        sync_summary = run_sync(queries)
+
+        google_calendar_server.get_event_cache().invalidate()
+        async_summary = asyncio.run(run_async(queries, args.concurrency))
+
+    async_agent.shutdown_executor()
+
+    print_summary("sync", sync_summary)
+    print_summary("async", async_summary)
+    print(f"backend requests: {backend.request_count}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,179 @@
+"""
+Embedding backends side by side: sentence-transformers on PyTorch vs the
+ONNX export (fp32 and int8).
+
+Each backend runs in a fresh interpreter so load time and resident memory
+aren't hidden by an earlier backend. Per backend: load time, RSS, single
+query latency, throughput of concurrent embed_query callers with and
+without dynamic batching, and how often its top-k chunks over a generated
+knowledge base match the first backend's.
+
+    python embedding_backends.py export          # once, for the onnx backends
+    python -m benchmarks.embeddings --backends huggingface onnx onnx-int8 --threads 4
+    python -m benchmarks.embeddings --backends hashing   # dry run, no model
+"""
+
+import argparse
+import json
+import random
+import subprocess
+import sys
+import threading
+import time
+
+from benchmarks.fake_calendar import SUMMARIES
+from benchmarks.metrics import latency_summary
+from benchmarks.suite import KB_TOPICS, knowledge_queries
+
+
+def corpus(documents, seed):
+    """
+    Chunks shaped like the knowledge base's: one per topic paragraph.
+    """
+    rng = random.Random(seed)
+    words = " ".join(KB_TOPICS + SUMMARIES).lower().split()
+    return [
+        f"{KB_TOPICS[i % len(KB_TOPICS)].title()}: " + " ".join(rng.choices(words, k=60))
+        for i in range(documents)
+    ]
+
+
+def load(backend, threads, batching):
+    if backend == "hashing":
+        from benchmarks.fake_embeddings import HashingEmbeddings
+        from embedding_backends import BatchingEmbeddings
+
+        embeddings = HashingEmbeddings()
+        return BatchingEmbeddings(embeddings) if batching else embeddings
+
+    from embedding_backends import create_embeddings
+
+    return create_embeddings(backend, threads=threads, batching=batching)
+
+
+def concurrent_rate(embeddings, queries, callers):
+    """
+    Queries per second with ``callers`` threads issuing embed_query.
+    """
+    chunks = [queries[i::callers] for i in range(callers)]
+    workers = [
+        threading.Thread(target=lambda chunk=chunk: [embeddings.embed_query(q) for q in chunk])
+        for chunk in chunks
+    ]
+    started = time.perf_counter()
+    for worker in workers:
+        worker.start()
+    for worker in workers:
+        worker.join()
+    return len(queries) / (time.perf_counter() - started)
+
+
+def probe(args):
+    import numpy as np
+
+    import rag_engine
+    from embedding_backends import EMBEDDING_STATS, BatchingEmbeddings
+
+    started = time.perf_counter()
+    embeddings = load(args.probe, args.threads, batching=False)
+    embeddings.embed_query("warm up")
+    load_seconds = time.perf_counter() - started
+
+    documents = corpus(args.documents, args.seed)
+    queries = knowledge_queries(args.queries, args.seed)
+
+    started = time.perf_counter()
+    doc_vectors = np.asarray(embeddings.embed_documents(documents), dtype="float32")
+    index_seconds = time.perf_counter() - started
+
+    latencies = []
+    query_vectors = []
+    started = time.perf_counter()
+    for query in queries:
+        t0 = time.perf_counter()
+        query_vectors.append(embeddings.embed_query(query))
+        latencies.append((time.perf_counter() - t0) * 1000)
+    single = latency_summary(latencies, time.perf_counter() - started)
+
+    scores = np.asarray(query_vectors, dtype="float32") @ doc_vectors.T
+    top = np.argsort(-scores, axis=1)[:, :args.k]
+
+    batched = BatchingEmbeddings(embeddings)
+    return {
+        "backend": args.probe,
+        "load_seconds": load_seconds,
+        "rss_mb": rag_engine.current_rss_mb(),
+        "index_docs_per_sec": len(documents) / index_seconds,
+        "p50_ms": single["p50_ms"],
+        "p99_ms": single["p99_ms"],
+        "sequential_qps": single["requests_per_sec"],
+        "concurrent_qps": concurrent_rate(embeddings, queries, args.callers),
+        "batched_qps": concurrent_rate(batched, queries, args.callers),
+        "mean_batch": EMBEDDING_STATS["queries"] / max(EMBEDDING_STATS["batches"], 1),
+        "top": top.tolist(),
+    }
+
+
+def run_probe(backend, args):
+    command = [
+        sys.executable, "-m", "benchmarks.embeddings", "--probe", backend,
+        "--threads", str(args.threads), "--documents", str(args.documents),
+        "--queries", str(args.queries), "--callers", str(args.callers),
+        "--k", str(args.k), "--seed", str(args.seed),
+    ]
+    completed = subprocess.run(command, capture_output=True, text=True)
+    if completed.returncode != 0:
+        error = (completed.stderr.strip().splitlines() or ["failed"])[-1]
+        print(f"{backend:<12} skipped: {error}")
+        return None
+    return json.loads(completed.stdout.strip().splitlines()[-1])
+
+
+def agreement(top, reference):
+    """
+    (mean overlap of the top-k sets, share of queries with the same top-1).
+    """
+    overlap = [len(set(mine) & set(theirs)) / len(theirs) for mine, theirs in zip(top, reference)]
+    same_first = [mine[0] == theirs[0] for mine, theirs in zip(top, reference)]
+    return sum(overlap) / len(overlap), sum(same_first) / len(same_first)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--backends", nargs="+", default=["huggingface", "onnx", "onnx-int8"],
+                        help="the first one is the reference for retrieval agreement")
+    parser.add_argument("--threads", type=int, default=0, help="inference threads (0 = runtime default)")
+    parser.add_argument("--documents", type=int, default=500, help="knowledge base chunks")
+    parser.add_argument("--queries", type=int, default=200)
+    parser.add_argument("--callers", type=int, default=8, help="concurrent embed_query threads")
+    parser.add_argument("--k", type=int, default=4)
+    parser.add_argument("--seed", type=int, default=7)
+    parser.add_argument("--probe", help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.probe:
+        print(json.dumps(probe(args)))
+        return
+
+    results = [result for result in (run_probe(backend, args) for backend in args.backends) if result]
+    if not results:
+        return
+
+    print(
+        f"{'backend':<12} {'load s':>7} {'RSS MB':>7} {'docs/s':>8} {'p50 ms':>7} {'p99 ms':>7} "
+        f"{'seq q/s':>8} {'conc q/s':>9} {'batched':>8} {'batch':>6} {'top-k':>6} {'top-1':>6}"
+    )
+    reference = results[0]["top"]
+    for result in results:
+        overlap, first = agreement(result["top"], reference)
+        print(
+            f"{result['backend']:<12} {result['load_seconds']:7.2f} {result['rss_mb']:7.0f} {result['index_docs_per_sec']:8.1f} "
+            f"{result['p50_ms']:7.2f} {result['p99_ms']:7.2f} {result['sequential_qps']:8.1f} "
+            f"{result['concurrent_qps']:9.1f} {result['batched_qps']:8.1f} {result['mean_batch']:6.1f} "
+            f"{overlap:6.1%} {first:6.1%}"
+        )
+    print(f"agreement is against {results[0]['backend']} over top-{args.k}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,126 @@
+"""
+Raw Calendar resources vs event_model.Event records.
+
+Builds N events the way the API returns them (full resources: etag,
+htmlLink, creator, organizer, reminders, ...) and the same events as
+Event records built from the fields-masked response, then compares the
+memory they hold and the cost of the operations the tools run on them:
+sorting by start, filtering to a window and filtering by title.
+
+    python -m benchmarks.event_model --events 100000
+"""
+
+import argparse
+import gc
+import json
+import random
+import time
+import tracemalloc
+from datetime import datetime, timedelta, timezone
+
+from benchmarks.fake_calendar import SUMMARIES, _masked, _parse_fields
+from event_cache import event_bounds
+from event_model import Event, items_fields
+from google_calendar_server import TIMEZONE
+
+START = datetime(2026, 1, 1, tzinfo=TIMEZONE)
+
+
+def api_resource(i, rng):
+    begin = START + timedelta(minutes=30 * rng.randrange(0, 17520))
+    owner = {"email": "me@example.com", "self": True}
+    return {
+        "kind": "calendar#event",
+        "etag": f'"{3400000000000000 + i}"',
+        "id": f"evt{i:08d}",
+        "status": "confirmed",
+        "htmlLink": f"https://www.google.com/calendar/event?eid=ZXZ0{i:08d}",
+        "created": "2025-12-01T10:00:00.000Z",
+        "updated": "2025-12-02T10:00:00.000Z",
+        "summary": rng.choice(SUMMARIES),
+        "description": f"Generated event {i}",
+        "location": f"Room {i % 12}",
+        "creator": owner,
+        "organizer": owner,
+        "start": {"dateTime": begin.isoformat(), "timeZone": "Asia/Kolkata"},
+        "end": {"dateTime": (begin + timedelta(minutes=30 * (1 + i % 4))).isoformat(), "timeZone": "Asia/Kolkata"},
+        "iCalUID": f"evt{i:08d}@google.com",
+        "sequence": 0,
+        "attendees": [{"email": f"person{(i + n) % 50}@example.com", "responseStatus": "accepted"}
+                      for n in range(i % 4)],
+        "reminders": {"useDefault": True},
+        "eventType": "default",
+    }
+
+
+def measure(build):
+    """
+    (result, bytes held by it) for ``build()``.
+    """
+    gc.collect()
+    tracemalloc.start()
+    result = build()
+    current, _ = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return result, current
+
+
+def timed(fn, repeat):
+    best = float("inf")
+    for _ in range(repeat):
+        started = time.perf_counter()
+        fn()
+        best = min(best, time.perf_counter() - started)
+    return best * 1000
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--events", type=int, default=100000)
+    parser.add_argument("--repeat", type=int, default=3)
+    parser.add_argument("--seed", type=int, default=7)
+    args = parser.parse_args()
+
+    rng = random.Random(args.seed)
+    payload = json.dumps({"items": [api_resource(i, rng) for i in range(args.events)]})
+    mask = _parse_fields(items_fields())
+
+    raw, raw_bytes = measure(lambda: json.loads(payload)["items"])
+    records, record_bytes = measure(
+        lambda: [Event.from_api(item, "primary", TIMEZONE) for item in _masked(json.loads(payload), mask)["items"]]
+    )
+
+    per_100k = 100000 / args.events / 1024 / 1024
+    print(f"raw dicts      {raw_bytes * per_100k:8.1f} MB per 100k events")
+    print(f"Event records  {record_bytes * per_100k:8.1f} MB per 100k events")
+
+    lo = int((START + timedelta(days=30)).timestamp())
+    hi = int((START + timedelta(days=60)).timestamp())
+    window = datetime.fromtimestamp(lo, timezone.utc), datetime.fromtimestamp(hi, timezone.utc)
+
+    operations = {
+        "sort by start": (
+            lambda: sorted(raw, key=lambda e: event_bounds(e, TIMEZONE)[0]),
+            lambda: sorted(records, key=lambda e: e.start),
+        ),
+        "filter window": (
+            lambda: [e for e in raw
+                     if datetime.fromisoformat(e["end"]["dateTime"]) > window[0]
+                     and datetime.fromisoformat(e["start"]["dateTime"]) < window[1]],
+            lambda: [e for e in records if e.end > lo and e.start < hi],
+        ),
+        "filter title": (
+            lambda: [e for e in raw if "review" in e.get("summary", "").lower()],
+            lambda: [e for e in records if e.summary and "review" in e.summary.lower()],
+        ),
+    }
+
+    for name, (on_raw, on_records) in operations.items():
+        raw_ms, record_ms = timed(on_raw, args.repeat), timed(on_records, args.repeat)
+        print(f"{name:<14} raw {raw_ms:9.1f} ms   records {record_ms:9.1f} ms   x{raw_ms / record_ms:5.1f}")
+
+    assert [e["id"] for e in operations["filter window"][0]()] == [e.id for e in operations["filter window"][1]()]
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,477 @@
+"""
+In-process stand-in for the Calendar v3 REST API.
+
+FakeCalendarBackend holds the event data; ``backend.http()`` returns an
+httplib2-compatible transport that can be handed to CalendarServiceManager
+as its ``http_factory``, so the real tool code runs unchanged against it.
+"""
+
+import json
+import random
+import threading
+import time
+from datetime import datetime, timedelta, timezone
+from urllib.parse import parse_qs, unquote, urlparse
+from zoneinfo import ZoneInfo
+
+import httplib2
+from dateutil import rrule
+
+from calendar_service import CalendarServiceManager
+
+# name -> (HTTP status, error reason). Pick with ``faults={"name": weight}``.
+FAULTS = {
+    "backendError": (503, "backendError"),
+    "internalError": (500, "internalError"),
+    "rateLimitExceeded": (403, "rateLimitExceeded"),
+    "userRateLimitExceeded": (403, "userRateLimitExceeded"),
+    "tooManyRequests": (429, "rateLimitExceeded"),
+    "forbidden": (403, "forbidden")
+}
+
+SUMMARIES = [
+    "Project sync", "Team standup", "1:1 with manager", "Design review",
+    "Lunch", "Customer call", "Sprint planning", "Gym", "Study session"
+]
+
+# (summary, recurrence, minutes) for ``recurring=N`` generated series.
+RECURRING_SERIES = [
+    ("Team standup", "RRULE:FREQ=WEEKLY;BYDAY=MO,TU,WE,TH,FR", 15),
+    ("Daily check-in", "RRULE:FREQ=DAILY", 15),
+    ("1:1 with manager", "RRULE:FREQ=WEEKLY", 30),
+    ("Sprint planning", "RRULE:FREQ=WEEKLY;INTERVAL=2;BYDAY=MO", 60),
+    ("Monthly review", "RRULE:FREQ=MONTHLY;BYDAY=1TH", 60),
+]
+# How far ahead the fake server expands open-ended series.
+EXPANSION_HORIZON_DAYS = 730
+
+
+def _parse_ts(value):
+    dt = datetime.fromisoformat(value.replace("Z", "+00:00"))
+    if dt.tzinfo is None:
+        dt = dt.replace(tzinfo=timezone.utc)
+    return dt.timestamp()
+
+
+def _parse_fields(text):
+    """
+    A partial-response mask ("items(id,start,attendees(email))") as a
+    tree of dicts; {} means the whole value.
+    """
+    root = {}
+    stack = [root]
+    name = ""
+    for char in text:
+        if char in ",()":
+            if name.strip():
+                stack[-1][name.strip()] = {}
+            if char == "(":
+                stack.append(stack[-1][name.strip()])
+            elif char == ")":
+                stack.pop()
+            name = ""
+        else:
+            name += char
+    if name.strip():
+        stack[-1][name.strip()] = {}
+    return root
+
+
+def _masked(value, tree):
+    if not tree:
+        return value
+    if isinstance(value, list):
+        return [_masked(item, tree) for item in value]
+    if isinstance(value, dict):
+        return {key: _masked(value[key], sub) for key, sub in tree.items() if key in value}
+    return value
+
+
+class FakeCalendarBackend:
+    """
+    Fault injection: ``error_rate`` of requests fail with a fault drawn
+    from ``faults`` (weights over FAULTS, default all backendError), and
+    with ``quota_per_second`` set, requests beyond it in any one-second
+    window get 403 rateLimitExceeded like the real per-user quota.
+    ``retry_after`` adds a Retry-After header to 429 answers.
+
+    ``recurring`` adds that many recurring series (from RECURRING_SERIES).
+    Like the real API, singleEvents=true expands them server-side and
+    singleEvents=false returns the masters.
+
+    List and instances responses honor ``fields`` masks, so bytes_sent
+    reflects partial responses.
+    """
+
+    def __init__(self, event_count=500, latency=0.0, error_rate=0.0, seed=7,
+                 start=datetime(2026, 1, 1, tzinfo=timezone.utc),
+                 faults=None, quota_per_second=None, retry_after=None, recurring=0):
+        self.latency = latency
+        self.error_rate = error_rate
+        self.faults = faults or {"backendError": 1}
+        self.quota_per_second = quota_per_second
+        self.retry_after = retry_after
+        self._window = (0, 0)
+        self._random = random.Random(seed)
+        self._lock = threading.Lock()
+        self._seq = 0
+        self.calendars = {}
+        self.request_count = 0
+        self.bytes_sent = 0
+        self.faults_injected = 0
+        self.quota_rejections = 0
+        self._horizon = (start - timedelta(days=EXPANSION_HORIZON_DAYS)).timestamp(), \
+            (start + timedelta(days=EXPANSION_HORIZON_DAYS)).timestamp()
+
+        rng = random.Random(seed)
+        for i in range(event_count):
+            begin = start + timedelta(hours=rng.randrange(0, 24 * 365))
+            self.add_event("primary", {
+                "summary": SUMMARIES[i % len(SUMMARIES)],
+                "description": f"Generated event {i}",
+                "location": "Room " + str(i % 12),
+                "start": {"dateTime": begin.isoformat()},
+                "end": {"dateTime": (begin + timedelta(minutes=30 * (1 + i % 4))).isoformat()}
+            })
+
+        for i in range(recurring):
+            summary, rule, minutes = RECURRING_SERIES[i % len(RECURRING_SERIES)]
+            begin = start.replace(tzinfo=None) + timedelta(days=i % 7, hours=9 + i % 8)
+            self.add_event("primary", {
+                "summary": f"{summary} {i}",
+                "description": f"Recurring series {i}: agenda, notes and the video link live in the doc.",
+                "location": "Room " + str(i % 12),
+                "attendees": [{"email": f"person{i + n}@example.com", "responseStatus": "accepted"} for n in range(4)],
+                "start": {"dateTime": begin.isoformat(), "timeZone": "Asia/Kolkata"},
+                "end": {"dateTime": (begin + timedelta(minutes=minutes)).isoformat(), "timeZone": "Asia/Kolkata"},
+                "recurrence": [rule]
+            })
+
+    # ---------- data ----------
+
+    def add_event(self, calendar_id, event):
+        with self._lock:
+            self._seq += 1
+            stored = dict(event)
+            stored.setdefault("id", f"evt{self._seq}")
+            stored.setdefault("status", "confirmed")
+            stored["etag"] = f'"{self._seq}"'
+            stored["_seq"] = self._seq
+            self.calendars.setdefault(calendar_id, {})[stored["id"]] = stored
+            return stored
+
+    @staticmethod
+    def _public(event):
+        return {k: v for k, v in event.items() if not k.startswith("_")}
+
+    def _expand(self, events, lo=None, hi=None):
+        """
+        Server-side expansion (singleEvents=true): masters become their
+        instances in [lo, hi), bounded by the horizon when open-ended.
+        """
+        lo = self._horizon[0] if lo is None else lo
+        hi = self._horizon[1] if hi is None else hi
+        masters = [e for e in events if e.get("recurrence")]
+        if not masters:
+            return events
+
+        expanded = [e for e in events if not e.get("recurrence")]
+        for master in masters:
+            overridden = {
+                _parse_ts(e["originalStartTime"]["dateTime"])
+                for e in events
+                if e.get("recurringEventId") == master["id"]
+            }
+            expanded.extend(
+                dict(instance, _seq=master["_seq"])
+                for instance in self._instances_of(master, lo, hi)
+                if _parse_ts(instance["originalStartTime"]["dateTime"]) not in overridden
+            )
+        return expanded
+
+    @staticmethod
+    def _instances_of(master, lo, hi):
+        """
+        Expanded straight from rrulestr into plain dicts, without
+        recurrence.py's instance, exception and UNTIL handling, which the
+        parity check in benchmarks.recurrence exercises. Occurrences keep
+        their wall-clock time in the event's time zone.
+        """
+        zone = ZoneInfo(master["start"].get("timeZone") or "UTC")
+        start = datetime.fromisoformat(master["start"]["dateTime"].replace("Z", "+00:00"))
+        start = start.replace(tzinfo=zone) if start.tzinfo is None else start.astimezone(zone)
+        end = start + timedelta(seconds=_parse_ts(master["end"]["dateTime"]) - start.timestamp())
+        duration = end - start
+
+        try:
+            rules = rrule.rrulestr("\n".join(master["recurrence"]), dtstart=start, forceset=True)
+        except ValueError:
+            # Anything dateutil cannot parse stands for its first occurrence.
+            rules = [start]
+
+        after = datetime.fromtimestamp(lo, timezone.utc) - duration
+        before = datetime.fromtimestamp(hi, timezone.utc)
+        for begin in rules:
+            if begin >= before:
+                break
+            if begin <= after:
+                continue
+            utc = begin.astimezone(timezone.utc)
+            when = {"dateTime": begin.isoformat(), "timeZone": zone.key}
+            instance = {k: v for k, v in master.items() if k != "recurrence"}
+            instance.update({
+                "id": f"{master['id']}_{utc:%Y%m%dT%H%M%SZ}",
+                "recurringEventId": master["id"],
+                "originalStartTime": when,
+                "start": when,
+                "end": {"dateTime": (begin + duration).isoformat(), "timeZone": zone.key}
+            })
+            yield instance
+
+    def _overlaps(self, event, lo, hi):
+        if event.get("recurrence"):
+            return next(self._instances_of(event, lo, hi), None) is not None
+        return _parse_ts(event["end"]["dateTime"]) > lo and _parse_ts(event["start"]["dateTime"]) < hi
+
+    # ---------- transport ----------
+
+    def http(self, creds=None):
+        return FakeHttp(self)
+
+    def manager(self, pool_size=8):
+        return CalendarServiceManager(
+            credentials_loader=lambda: None,
+            http_factory=self.http,
+            pool_size=pool_size
+        )
+
+    def _fault(self):
+        """
+        The fault to inject for the current request, or None.
+        """
+        if self.quota_per_second:
+            second = int(time.monotonic())
+            start, used = self._window
+            if second != start:
+                start, used = second, 0
+            self._window = (start, used + 1)
+            if used >= self.quota_per_second:
+                self.quota_rejections += 1
+                return "rateLimitExceeded"
+
+        if self.error_rate and self._random.random() < self.error_rate:
+            self.faults_injected += 1
+            names = list(self.faults)
+            return self._random.choices(names, weights=[self.faults[n] for n in names])[0]
+
+        return None
+
+    @staticmethod
+    def _error(name):
+        status, reason = FAULTS[name]
+        return status, {"error": {"code": status, "message": reason,
+                                  "errors": [{"domain": "global", "reason": reason}]}}
+
+    def handle(self, uri, method, body):
+        with self._lock:
+            self.request_count += 1
+            fault = self._fault()
+
+        if self.latency:
+            time.sleep(self.latency)
+
+        if fault:
+            return self._error(fault)
+
+        parsed = urlparse(uri)
+        parts = [unquote(p) for p in parsed.path.split("/") if p]
+        query = {k: v[-1] for k, v in parse_qs(parsed.query).items()}
+
+        if parts[-1] == "freeBusy" and method == "POST":
+            return 200, self._freebusy(json.loads(body))
+
+        if "calendars" not in parts or "events" not in parts:
+            return 404, {"error": {"code": 404, "message": "Not Found"}}
+
+        calendar_id = parts[parts.index("calendars") + 1]
+
+        if parts[-2] == "events" and method == "GET":
+            with self._lock:
+                event = self.calendars.get(calendar_id, {}).get(parts[-1])
+            if event is None:
+                return 404, {"error": {"code": 404, "message": "Not Found", "errors": [{"reason": "notFound"}]}}
+            return 200, self._public(event)
+
+        if parts[-1] == "instances":
+            status, payload = self._instances(calendar_id, parts[-2], query)
+            return status, _masked(payload, _parse_fields(query.get("fields", "")))
+
+        if method == "POST":
+            return 200, self._public(self.add_event(calendar_id, json.loads(body)))
+
+        if calendar_id not in self.calendars:
+            return 404, {"error": {"code": 404, "message": "Not Found",
+                                   "errors": [{"reason": "notFound"}]}}
+
+        return 200, _masked(self._list(calendar_id, query), _parse_fields(query.get("fields", "")))
+
+    def _list(self, calendar_id, query):
+        with self._lock:
+            events = list(self.calendars.get(calendar_id, {}).values())
+            current = self._seq
+
+        single = query.get("singleEvents") == "true"
+        lo = _parse_ts(query["timeMin"]) if "timeMin" in query else None
+        hi = _parse_ts(query["timeMax"]) if "timeMax" in query else None
+
+        if "syncToken" in query:
+            since = int(query["syncToken"])
+            events = [e for e in events if e["_seq"] > since]
+            if single:
+                events = self._expand(events)
+        else:
+            if lo is not None or hi is not None:
+                window = (self._horizon[0] if lo is None else lo, self._horizon[1] if hi is None else hi)
+                events = [e for e in events if self._overlaps(e, *window)]
+            if single:
+                events = self._expand(events, lo, hi)
+            if "q" in query:
+                needle = query["q"].lower()
+                events = [
+                    e for e in events
+                    if needle in e.get("summary", "").lower()
+                    or needle in e.get("description", "").lower()
+                ]
+
+        events.sort(key=lambda e: _parse_ts(e["start"]["dateTime"]))
+        # Like the real API: no sync token for time-bounded or q= lists.
+        return self._page(events, query, current, sync=not {"timeMin", "timeMax", "q"} & query.keys())
+
+    def _instances(self, calendar_id, event_id, query):
+        with self._lock:
+            master = self.calendars.get(calendar_id, {}).get(event_id)
+            current = self._seq
+
+        if master is None:
+            return 404, {"error": {"code": 404, "message": "Not Found", "errors": [{"reason": "notFound"}]}}
+
+        lo = _parse_ts(query["timeMin"]) if "timeMin" in query else None
+        hi = _parse_ts(query["timeMax"]) if "timeMax" in query else None
+        return 200, self._page(self._expand([master], lo, hi), query, current, sync=False)
+
+    def _page(self, events, query, current, sync=True):
+        offset = int(query.get("pageToken", 0))
+        size = int(query.get("maxResults", 250))
+        page = events[offset:offset + size]
+
+        response = {
+            "kind": "calendar#events",
+            "items": [self._public(e) for e in page]
+        }
+        if offset + size < len(events):
+            response["nextPageToken"] = str(offset + size)
+        elif sync:
+            response["nextSyncToken"] = str(current)
+        return response
+
+    def _freebusy(self, body):
+        lo, hi = _parse_ts(body["timeMin"]), _parse_ts(body["timeMax"])
+        calendars = {}
+
+        for item in body.get("items", []):
+            with self._lock:
+                events = self.calendars.get(item["id"])
+                events = None if events is None else list(events.values())
+
+            if events is None:
+                calendars[item["id"]] = {"busy": [], "errors": [{"domain": "global", "reason": "notFound"}]}
+                continue
+            events = self._expand(events, lo, hi)
+
+            busy = sorted(
+                (e["start"]["dateTime"], e["end"]["dateTime"])
+                for e in events
+                if e.get("transparency") != "transparent"
+                and _parse_ts(e["end"]["dateTime"]) > lo
+                and _parse_ts(e["start"]["dateTime"]) < hi
+            )
+            calendars[item["id"]] = {"busy": [{"start": start, "end": end} for start, end in busy]}
+
+        return {"kind": "calendar#freeBusy", "timeMin": body["timeMin"], "timeMax": body["timeMax"],
+                "calendars": calendars}
+
+    def handle_batch(self, body, content_type):
+        """
+        Splits a multipart/mixed batch, runs each embedded request through
+        handle() and returns (content_type, multipart response body).
+        """
+        boundary = content_type.split("boundary=")[1].strip('"')
+        parts = [part for part in body.split("--" + boundary) if part.strip() not in ("", "--")]
+        out_boundary = "batch_fake_response"
+        chunks = []
+
+        for part in parts:
+            outer_headers, _, inner = part.strip("\r\n").partition("\n\n")
+            if not inner:
+                outer_headers, _, inner = part.strip("\r\n").partition("\r\n\r\n")
+            content_id = ""
+            for line in outer_headers.splitlines():
+                if line.lower().startswith("content-id:"):
+                    content_id = line.split(":", 1)[1].strip().strip("<>")
+
+            inner = inner.replace("\r\n", "\n")
+            request_head, _, request_body = inner.partition("\n\n")
+            method, path, _ = request_head.splitlines()[0].split(" ", 2)
+
+            status, payload = self.handle("https://www.googleapis.com" + path, method, request_body.strip() or None)
+            chunks.append(
+                f"--{out_boundary}\r\n"
+                "Content-Type: application/http\r\n"
+                f"Content-ID: <response-{content_id}>\r\n\r\n"
+                f"HTTP/1.1 {status} {'OK' if status == 200 else 'Error'}\r\n"
+                "Content-Type: application/json; charset=UTF-8\r\n\r\n"
+                f"{json.dumps(payload)}\r\n"
+            )
+
+        chunks.append(f"--{out_boundary}--")
+        return f"multipart/mixed; boundary={out_boundary}", "".join(chunks)
+
+
+class FakeHttp:
+    """
+    httplib2.Http look-alike that routes requests to a FakeCalendarBackend.
+    """
+
+    def __init__(self, backend):
+        self.backend = backend
+
+    def request(self, uri, method="GET", body=None, headers=None,
+                redirections=1, connection_type=None):
+        if isinstance(body, bytes):
+            body = body.decode("utf-8")
+
+        if "/batch/" in uri:
+            content_type, content = self.backend.handle_batch(body, (headers or {}).get("content-type", ""))
+            content = content.encode("utf-8")
+            # request_count already counted each inner request, as the quota does.
+            with self.backend._lock:
+                self.backend.bytes_sent += len(content)
+            return httplib2.Response({"status": "200", "content-type": content_type}), content
+
+        status, payload = self.backend.handle(uri, method, body)
+        content = json.dumps(payload).encode("utf-8")
+
+        with self.backend._lock:
+            self.backend.bytes_sent += len(content)
+
+        headers = {
+            "status": str(status),
+            "content-type": "application/json; charset=UTF-8"
+        }
+        if status == 429 and self.backend.retry_after is not None:
+            headers["retry-after"] = str(self.backend.retry_after)
+
+        return httplib2.Response(headers), content
+
+    def close(self):
+        return None
@@ -0,0 +1,37 @@
+"""
+Deterministic, model-free embeddings for offline RAG benchmarks.
+
+Tokens are hashed into a fixed number of dimensions (the "hashing trick")
+and the vector is L2-normalized, so texts sharing words land close
+together. Retrieval quality is nothing like MiniLM's, but the FAISS,
+ingest and cache code paths run unchanged and timings are reproducible.
+"""
+
+import hashlib
+import math
+import re
+
+from langchain_core.embeddings import Embeddings
+
+TOKEN = re.compile(r"[a-z0-9]+")
+
+
+class HashingEmbeddings(Embeddings):
+    def __init__(self, size=384):
+        self.size = size
+
+    def _embed(self, text):
+        vector = [0.0] * self.size
+        for token in TOKEN.findall(text.lower()):
+            digest = hashlib.blake2b(token.encode("utf-8"), digest_size=8).digest()
+            bucket = int.from_bytes(digest[:4], "little") % self.size
+            vector[bucket] += 1.0 if digest[4] & 1 else -1.0
+
+        norm = math.sqrt(sum(value * value for value in vector)) or 1.0
+        return [value / norm for value in vector]
+
+    def embed_documents(self, texts):
+        return [self._embed(text) for text in texts]
+
+    def embed_query(self, text):
+        return self._embed(text)
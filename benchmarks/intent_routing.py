@@ -0,0 +1,131 @@
+"""
+Throughput of intent routing: the old chained substring scans plus
+per-call regex parsing vs. intent_router.route, on a synthetic corpus.
+
+    python -m benchmarks.intent_routing --queries 200000
+"""
+
+import argparse
+import random
+import re
+import time
+from datetime import date, datetime
+
+from intent_router import _route, route
+
+TEMPLATES = [
+    "Show my events for {month}",
+    "What meetings do I have next week",
+    "List my calendar events today",
+    "Search for {topic} events",
+    "Find the {topic} meeting",
+    "Create a meeting called {topic} on {month} {day} from {start} AM to {end} AM",
+    "Schedule a {topic} meeting on {month} {day} from {start} PM to {end} PM",
+    "Explain what the Agentic Calendar Assistant does",
+    "How do I create recurring reminders?",
+    "whatever, I'll prevent the overlap myself",
+]
+TOPICS = ["project", "design review", "standup", "budget", "hiring", "roadmap"]
+MONTHS = ["january", "february", "march", "april", "june", "october"]
+
+# Substring false positives the old scans fall for ("what" in "whatever",
+# "event" in "prevent", "how" in "show", "create" in "recreate").
+ADVERSARIAL = {
+    "whatever happens, prevent it": None,
+    "somehow I recreated the problem": None,
+    "the showroom is free": None,
+}
+
+
+def legacy_parse_date_time(user_query):
+    date_match = re.search(
+        r"(january|february|march|april|may|june|july|august|september|october|november|december)\s+(\d{1,2})",
+        user_query,
+        re.IGNORECASE
+    )
+    time_match = re.search(
+        r"(\d{1,2})\s*(am|pm)\s*to\s*(\d{1,2})\s*(am|pm)",
+        user_query,
+        re.IGNORECASE
+    )
+
+    if not date_match or not time_match:
+        return None
+
+    month, day = date_match.groups()
+    sh, s_ampm, eh, e_ampm = time_match.groups()
+
+    return {
+        "date": datetime.strptime(f"{day} {month} 2026", "%d %B %Y").strftime("%Y-%m-%d"),
+        "start_time": datetime.strptime(f"{sh} {s_ampm}", "%I %p").strftime("%H:%M"),
+        "end_time": datetime.strptime(f"{eh} {e_ampm}", "%I %p").strftime("%H:%M")
+    }
+
+
+def legacy_route(user_query):
+    """
+    The routing and parsing agent_decide_and_act did before intent_router.
+    """
+    query = user_query.lower()
+
+    if any(word in query for word in ["event", "events", "calendar", "meeting", "schedule", "create"]):
+        if any(word in query for word in ["list", "show", "what"]):
+            return "list"
+        if any(word in query for word in ["search", "find"]):
+            return "search"
+        if any(word in query for word in ["create", "schedule"]):
+            legacy_parse_date_time(user_query)
+            return "create"
+
+    if any(word in query for word in ["what", "explain", "how"]):
+        return "knowledge"
+
+    return None
+
+
+def synthetic_queries(count, seed=0):
+    rng = random.Random(seed)
+    return [
+        rng.choice(TEMPLATES).format(
+            month=rng.choice(MONTHS),
+            day=rng.randint(1, 28),
+            topic=rng.choice(TOPICS),
+            start=rng.randint(1, 10),
+            end=rng.randint(1, 10) + 1
+        )
+        for _ in range(count)
+    ]
+
+
+def throughput(fn, queries):
+    started = time.perf_counter()
+    for query in queries:
+        fn(query)
+    return len(queries) / (time.perf_counter() - started)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--queries", type=int, default=200000)
+    args = parser.parse_args()
+
+    queries = synthetic_queries(args.queries)
+
+    legacy_qps = throughput(legacy_route, queries)
+    today = date.today()
+    uncached_qps = throughput(lambda query: _route(query, today), queries)
+    router_qps = throughput(route, queries)
+
+    print(f"legacy scans   {legacy_qps:12,.0f} queries/s  (intent + create date/time)")
+    print(f"intent_router  {uncached_qps:12,.0f} queries/s  (intent + all slots, no memo)")
+    print(f"intent_router  {router_qps:12,.0f} queries/s  (intent + all slots, memoized)")
+
+    for query, expected in ADVERSARIAL.items():
+        print(
+            f"{query!r:40} legacy={legacy_route(query)!s:<9} "
+            f"router={route(query)['intent']!s:<9} expected={expected}"
+        )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,31 @@
+import statistics
+
+
+def percentile(values, pct):
+    """
+    Nearest-rank percentile of an unsorted sequence.
+    """
+    if not values:
+        return 0.0
+
+    ordered = sorted(values)
+    rank = max(0, min(len(ordered) - 1, round(pct / 100 * len(ordered)) - 1))
+    return ordered[rank]
+
+
+def latency_summary(latencies_ms, elapsed_s):
+    return {
+        "requests": len(latencies_ms),
+        "requests_per_sec": len(latencies_ms) / elapsed_s if elapsed_s else 0.0,
+        "mean_ms": statistics.mean(latencies_ms) if latencies_ms else 0.0,
+        "p50_ms": percentile(latencies_ms, 50),
+        "p95_ms": percentile(latencies_ms, 95),
+        "p99_ms": percentile(latencies_ms, 99)
+    }
+
+
+def print_summary(label, summary):
+    print(
+        f"{label:<10} {summary['requests_per_sec']:9.1f} req/s  "
+        f"p50={summary['p50_ms']:8.2f} ms  p99={summary['p99_ms']:8.2f} ms"
+    )
@@ -0,0 +1,132 @@
+"""
+Predictive prefetching of list_events windows.
+
+Replays browsing sessions against a FakeCalendarBackend with per-request
+latency, each with a fresh event cache, once with the prefetcher and once
+without. Sessions follow common patterns (week after week, a week then
+the next month, month after month) plus random jumps, which no predictor
+can follow and which show what prefetching wastes.
+
+Reported per mode: latency of the follow-up queries (the first query of
+a session is always cold), API requests per session, and the
+prefetcher's hit rate, used and wasted windows.
+
+    python -m benchmarks.prefetch --sessions 20 --latency 0.05 --think 0.2
+"""
+
+import argparse
+import random
+import time
+from datetime import date, timedelta
+
+import calendar_service
+import google_calendar_server
+import request_scheduler
+from benchmarks.fake_calendar import FakeCalendarBackend
+from benchmarks.metrics import latency_summary, print_summary
+
+
+def _weeks(first, count, step=1):
+    return [(first + timedelta(weeks=i * step), first + timedelta(weeks=i * step + 1)) for i in range(count)]
+
+
+def _month(year, month):
+    start = date(year, month, 1)
+    return start, date(year + month // 12, month % 12 + 1, 1)
+
+
+def sessions(count, seed):
+    """
+    (pattern, [(start, end), ...]) browsing sessions in 2026.
+    """
+    rng = random.Random(seed)
+    patterns = ["weeks forward", "weeks back", "week then month", "months", "random jumps"]
+    result = []
+
+    for i in range(count):
+        pattern = patterns[i % len(patterns)]
+        monday = date(2026, 1, 5) + timedelta(weeks=rng.randrange(0, 40))
+        month = rng.randrange(1, 10)
+
+        if pattern == "weeks forward":
+            windows = _weeks(monday, 4)
+        elif pattern == "weeks back":
+            windows = _weeks(monday, 4, step=-1)
+        elif pattern == "week then month":
+            windows = _weeks(monday, 2) + [_month(2026, monday.month % 12 + 1)]
+        elif pattern == "months":
+            windows = [_month(2026, month + n) for n in range(3)]
+        else:
+            windows = [_weeks(date(2026, 1, 5) + timedelta(weeks=rng.randrange(0, 50)), 1)[0] for _ in range(4)]
+
+        result.append((pattern, [(start.isoformat(), end.isoformat()) for start, end in windows]))
+    return result
+
+
+def run(backend, browsing, think, prefetch):
+    google_calendar_server.PREFETCH_ENABLED = prefetch
+    requests_before = backend.request_count
+    follow_ups = []
+    totals = {}
+    started = time.perf_counter()
+
+    for _, windows in browsing:
+        calendar_service.set_service_manager(backend.manager())
+        for position, (start, end) in enumerate(windows):
+            t0 = time.perf_counter()
+            google_calendar_server.list_events(start, end)
+            if position:
+                follow_ups.append((time.perf_counter() - t0) * 1000)
+            time.sleep(think)
+
+        prefetcher = calendar_service.get_service_manager().get_scoped("prefetcher")
+        if prefetcher is not None:
+            prefetcher.close()
+            for name, value in prefetcher.stats.items():
+                totals[name] = totals.get(name, 0) + value
+
+    summary = latency_summary(follow_ups, time.perf_counter() - started)
+    requests = (backend.request_count - requests_before) / len(browsing)
+    return summary, requests, totals
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--sessions", type=int, default=20)
+    parser.add_argument("--events", type=int, default=2000, help="events on the calendar")
+    parser.add_argument("--latency", type=float, default=0.05, help="backend latency per request (s)")
+    parser.add_argument("--think", type=float, default=0.2, help="pause between a session's queries (s)")
+    parser.add_argument("--seed", type=int, default=7)
+    args = parser.parse_args()
+
+    backend = FakeCalendarBackend(event_count=args.events, latency=args.latency)
+    request_scheduler.set_scheduler(request_scheduler.RequestScheduler(
+        limiter=request_scheduler.TokenBucket(rate=1e9, capacity=1e9)
+    ))
+    browsing = sessions(args.sessions, args.seed)
+
+    for label, prefetch in (("off", False), ("prefetch", True)):
+        summary, requests, totals = run(backend, browsing, args.think, prefetch)
+        print_summary(label, summary)
+        line = f"{'':<10} requests/session={requests:5.2f}"
+        if totals:
+            settled = totals["used"] + totals["wasted"]
+            line += (
+                f"  hit rate={totals['hits'] / totals['observed']:6.1%}"
+                f"  issued={totals['issued']}  used={totals['used']}  wasted={totals['wasted']}"
+                f"  accuracy={totals['used'] / settled if settled else 0.0:6.1%}"
+            )
+        print(line)
+
+    print("--- by pattern (prefetch) ---")
+    for pattern in dict.fromkeys(pattern for pattern, _ in browsing):
+        subset = [session for session in browsing if session[0] == pattern]
+        summary, requests, totals = run(backend, subset, args.think, True)
+        print(
+            f"{pattern:<16} follow-up p50={summary['p50_ms']:7.2f} ms  "
+            f"hit rate={totals['hits'] / totals['observed']:6.1%}  wasted={totals['wasted']}"
+        )
+
+
+if __name__ == "__main__":
+    main()
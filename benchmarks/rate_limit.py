@@ -0,0 +1,96 @@
+"""
+Fault-injection run for request_scheduler.
+
+Many threads issue list/search calls (with a lot of duplicates) against
+a FakeCalendarBackend that enforces a per-second quota and fails a share
+of requests with 5xx/429/403. The same workload runs twice: once with a
+pass-through scheduler (no limiting, retries or coalescing) and once with
+the real one.
+
+    python -m benchmarks.rate_limit --calls 400 --threads 32 --error-rate 0.1
+"""
+
+import argparse
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import calendar_service
+import google_calendar_server
+import request_scheduler
+from benchmarks.fake_calendar import FakeCalendarBackend
+from benchmarks.metrics import latency_summary, print_summary
+
+KEYWORDS = ["Project", "Design", "Lunch", "Customer", "Sprint", "Gym"]
+RANGES = [("2026-01-01", "2026-01-31"), ("2026-02-01", "2026-02-28"), ("2026-03-01", "2026-03-31")]
+
+
+def call(index):
+    if index % 2:
+        return google_calendar_server.search_events(KEYWORDS[index % len(KEYWORDS)])
+    start, end = RANGES[index % len(RANGES)]
+    return google_calendar_server.list_events(start, end, use_cache=False)
+
+
+def run(label, backend, scheduler, calls, threads):
+    request_scheduler.set_scheduler(scheduler)
+    backend.request_count = 0
+    latencies = []
+    failures = {}
+
+    def timed(index):
+        t0 = time.perf_counter()
+        try:
+            call(index)
+        except Exception as exc:
+            name = type(exc).__name__
+            failures[name] = failures.get(name, 0) + 1
+        latencies.append((time.perf_counter() - t0) * 1000)
+
+    started = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=threads) as pool:
+        list(pool.map(timed, range(calls)))
+    summary = latency_summary(latencies, time.perf_counter() - started)
+
+    print_summary(label, summary)
+    print(
+        f"{'':<10} ok={calls - sum(failures.values())}/{calls}  failures={failures}  "
+        f"backend requests={backend.request_count}"
+    )
+    print(f"{'':<10} scheduler={scheduler.stats}  breaker trips={scheduler.breaker.trips}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--calls", type=int, default=400)
+    parser.add_argument("--threads", type=int, default=32)
+    parser.add_argument("--latency", type=float, default=0.02)
+    parser.add_argument("--error-rate", type=float, default=0.1)
+    parser.add_argument("--quota", type=int, default=100, help="backend requests/second")
+    parser.add_argument("--backoff-base", type=float, default=0.05)
+    args = parser.parse_args()
+
+    backend = FakeCalendarBackend(
+        latency=args.latency,
+        error_rate=args.error_rate,
+        faults={"backendError": 2, "internalError": 1, "tooManyRequests": 1, "rateLimitExceeded": 1},
+        quota_per_second=args.quota
+    )
+    calendar_service.set_service_manager(backend.manager(pool_size=args.threads))
+
+    passthrough = request_scheduler.RequestScheduler(
+        limiter=request_scheduler.TokenBucket(rate=1e9, capacity=1e9),
+        breaker=request_scheduler.CircuitBreaker(threshold=10 ** 9),
+        max_retries=0,
+        coalesce=False
+    )
+    scheduled = request_scheduler.RequestScheduler(
+        limiter=request_scheduler.TokenBucket(rate=args.quota * 0.9, capacity=args.quota // 4),
+        backoff_base=args.backoff_base
+    )
+
+    run("direct", backend, passthrough, args.calls, args.threads)
+    run("scheduled", backend, scheduled, args.calls, args.threads)
+
+
+if __name__ == "__main__":
+    main()
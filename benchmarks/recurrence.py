@@ -0,0 +1,94 @@
+"""
+Server-side vs local expansion of recurring events.
+
+A FakeCalendarBackend holds one-off events plus recurring series (daily
+check-ins, weekday standups, weekly 1:1s...). The same windows are listed
+with singleEvents=True, where the server sends every instance as a full
+copy of the series, and with local expansion, where only the masters
+travel and recurrence.expand_events builds the instances. Both sides
+expand rules with dateutil.rrule, so "same events" checks the local
+instance, exception and time zone handling against the fake server's.
+
+    python -m benchmarks.recurrence --series 40 --events 300 --latency 0.01
+"""
+
+import argparse
+import time
+import tracemalloc
+
+import calendar_service
+import google_calendar_server
+import request_scheduler
+from benchmarks.fake_calendar import FakeCalendarBackend
+from benchmarks.metrics import latency_summary, print_summary
+from recurrence import parse_when
+
+WINDOWS = {
+    "week": [(f"2026-{m:02d}-01", f"2026-{m:02d}-08") for m in range(1, 13)],
+    "month": [(f"2026-{m:02d}-01", f"2026-{m + 1:02d}-01") for m in range(1, 12)],
+    "year": [("2026-01-01", "2027-01-01")],
+}
+
+
+def signature(events):
+    # Events starting at the same time may come back in either order.
+    return sorted((parse_when(event["start"]).timestamp(), event["id"]) for event in events)
+
+
+def run(label, backend, windows, repeat, local):
+    requests_before, bytes_before = backend.request_count, backend.bytes_sent
+    latencies = []
+    results = []
+
+    started = time.perf_counter()
+    for _ in range(repeat):
+        for start, end in windows:
+            t0 = time.perf_counter()
+            results.append(google_calendar_server.list_events(start, end, use_cache=False, local_recurrence=local))
+            latencies.append((time.perf_counter() - t0) * 1000)
+    summary = latency_summary(latencies, time.perf_counter() - started)
+    requests = (backend.request_count - requests_before) / len(latencies)
+    sent = (backend.bytes_sent - bytes_before) / len(latencies)
+
+    tracemalloc.start()
+    kept = [google_calendar_server.list_events(start, end, use_cache=False, local_recurrence=local)
+            for start, end in windows]
+    _, peak = tracemalloc.get_traced_memory()
+    # googleapiclient keeps per-request bookkeeping (method docstrings)
+    # alive; only count what the returned events hold on to.
+    snapshot = tracemalloc.take_snapshot().filter_traces([tracemalloc.Filter(False, "*googleapiclient*")])
+    retained = sum(stat.size for stat in snapshot.statistics("filename"))
+    tracemalloc.stop()
+
+    print_summary(label, summary)
+    print(
+        f"{'':<10} events/call={sum(map(len, kept)) / len(kept):8.1f}  "
+        f"requests/call={requests:5.2f}  KB/call={sent / 1024:8.1f}  "
+        f"result KB={retained / 1024:8.1f}  peak KB={peak / 1024:8.1f}"
+    )
+    return [signature(events) for events in results[:len(windows)]]
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--series", type=int, default=40, help="recurring series on the calendar")
+    parser.add_argument("--events", type=int, default=300, help="one-off events on the calendar")
+    parser.add_argument("--latency", type=float, default=0.01, help="backend latency per request (s)")
+    parser.add_argument("--repeat", type=int, default=3)
+    args = parser.parse_args()
+
+    backend = FakeCalendarBackend(event_count=args.events, latency=args.latency, recurring=args.series)
+    calendar_service.set_service_manager(backend.manager())
+    request_scheduler.set_scheduler(request_scheduler.RequestScheduler(
+        limiter=request_scheduler.TokenBucket(rate=1e9, capacity=1e9)
+    ))
+
+    for name, windows in WINDOWS.items():
+        print(f"--- {name} windows ({len(windows)}) ---")
+        server = run("server", backend, windows, args.repeat, local=False)
+        local = run("local", backend, windows, args.repeat, local=True)
+        print(f"{'':<10} same events: {server == local}")
+
+
+if __name__ == "__main__":
+    main()
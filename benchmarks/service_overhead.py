@@ -0,0 +1,109 @@
+"""
+Per-call overhead of obtaining the Calendar service, before and after pooling.
+
+Both paths talk to an HttpMock stand-in, so the numbers only contain the
+client-side cost (token unpickling, discovery parsing, transport setup)
+and no network time.
+
+    python -m benchmarks.service_overhead --calls 200
+"""
+
+import argparse
+import json
+import os
+import pickle
+import statistics
+import tempfile
+import time
+from datetime import datetime, timedelta
+
+from google.oauth2.credentials import Credentials
+from googleapiclient.discovery import build
+from googleapiclient.http import HttpMock
+
+from calendar_service import CalendarServiceManager
+
+EVENTS_PAYLOAD = json.dumps({
+    "kind": "calendar#events",
+    "items": [
+        {"id": f"evt{i}", "summary": f"Event {i}"} for i in range(10)
+    ]
+}).encode("utf-8")
+
+
+def mock_http():
+    http = HttpMock(headers={"status": "200"})
+    http.data = EVENTS_PAYLOAD
+    return http
+
+
+def fake_credentials():
+    return Credentials(
+        token="fake-token",
+        refresh_token="fake-refresh",
+        expiry=datetime.utcnow() + timedelta(hours=1)
+    )
+
+
+def legacy_call(token_file):
+    """
+    What every tool call used to do: unpickle the token and build a new
+    resource from discovery before issuing the request.
+    """
+    with open(token_file, "rb") as token:
+        pickle.load(token)
+
+    service = build("calendar", "v3", http=mock_http(), static_discovery=True)
+    return service.events().list(calendarId="primary").execute()
+
+
+def pooled_call(manager):
+    service = manager.service()
+    return manager.execute(service.events().list(calendarId="primary"))
+
+
+def measure(fn, calls):
+    timings = []
+    for _ in range(calls):
+        started = time.perf_counter()
+        fn()
+        timings.append((time.perf_counter() - started) * 1000)
+    return timings
+
+
+def summarize(label, timings):
+    timings = sorted(timings)
+    p99 = timings[min(len(timings) - 1, int(len(timings) * 0.99))]
+    print(
+        f"{label:<8} mean={statistics.mean(timings):8.3f} ms  "
+        f"p50={statistics.median(timings):8.3f} ms  p99={p99:8.3f} ms"
+    )
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--calls", type=int, default=200)
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        token_file = os.path.join(tmp, "token.pickle")
+        with open(token_file, "wb") as token:
+            pickle.dump(fake_credentials(), token)
+
+        before = measure(lambda: legacy_call(token_file), args.calls)
+
+    manager = CalendarServiceManager(
+        credentials_loader=fake_credentials,
+        http_factory=lambda creds: mock_http()
+    )
+    pooled_call(manager)
+    after = measure(lambda: pooled_call(manager), args.calls)
+    manager.close()
+
+    summarize("before", before)
+    summarize("after", after)
+    print(f"speedup  {statistics.mean(before) / statistics.mean(after):.1f}x")
+
+
+if __name__ == "__main__":
+    main()
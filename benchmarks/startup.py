@@ -0,0 +1,57 @@
+"""
+Startup cost of the assistant: import time, resident memory and whether
+the heavy ML stack (torch / sentence-transformers) was pulled in.
+
+Each phase runs in a fresh interpreter so earlier imports don't hide cost.
+
+    python -m benchmarks.startup
+    python -m benchmarks.startup --knowledge   # also time the first RAG query
+"""
+
+import argparse
+import json
+import subprocess
+import sys
+
+PROBE = r"""
+import json, sys, time
+started = time.perf_counter()
+import calendar_client
+import rag_engine
+result = {
+    "import_seconds": time.perf_counter() - started,
+    "rss_mb": rag_engine.current_rss_mb(),
+    "torch_loaded": "torch" in sys.modules,
+    "sentence_transformers_loaded": "sentence_transformers" in sys.modules,
+}
+if KNOWLEDGE:
+    started = time.perf_counter()
+    rag_engine.retrieve_context("What can the assistant do?")
+    result["first_query_seconds"] = time.perf_counter() - started
+    result["rss_after_query_mb"] = rag_engine.current_rss_mb()
+    result["rag"] = rag_engine.RAG_STATS
+print(json.dumps(result))
+"""
+
+
+def probe(knowledge):
+    code = PROBE.replace("KNOWLEDGE", "True" if knowledge else "False")
+    output = subprocess.run(
+        [sys.executable, "-c", code],
+        check=True,
+        capture_output=True,
+        text=True
+    ).stdout
+    return json.loads(output.strip().splitlines()[-1])
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--knowledge", action="store_true")
+    args = parser.parse_args()
+
+    print(json.dumps(probe(args.knowledge), indent=2))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,298 @@
+"""
+Offline benchmark suite: the agent, the calendar tools and retrieval,
+against FakeCalendarBackend and a generated knowledge base.
+
+Every scenario reports throughput, latency percentiles, allocations
+(tracemalloc peak and retained memory per op, measured in a separate
+pass) and RSS, plus the backend requests and bytes it caused. Results
+are written as JSON so two runs can be diffed:
+
+    python -m benchmarks.suite --events 2000 --latency 0.01 --output base.json
+    python -m benchmarks.suite --events 2000 --latency 0.01 --output new.json
+    python -m benchmarks.suite --compare base.json new.json
+
+Retrieval uses HashingEmbeddings unless --embeddings model is given, so
+no model download is needed and timings are reproducible.
+"""
+
+import argparse
+import json
+import os
+import platform
+import random
+import resource
+import subprocess
+import sys
+import tempfile
+import time
+import tracemalloc
+
+import calendar_client
+import calendar_service
+import google_calendar_server
+import rag_engine
+import request_scheduler
+import telemetry
+from benchmarks.fake_calendar import SUMMARIES, FakeCalendarBackend
+from benchmarks.fake_embeddings import HashingEmbeddings
+from benchmarks.metrics import latency_summary
+
+AGENT_WORKLOAD = [
+    "Show my calendar events",
+    "What meetings do I have next week",
+    "Search for project events",
+    "Find the design review meeting",
+    "Create a meeting called Sync on March 3 from 10 AM to 11 AM",
+    "How do I create recurring reminders?",
+    "Explain what the Agentic Calendar Assistant does",
+]
+MONTHS = [(f"2026-{m:02d}-01", f"2026-{m + 1:02d}-01") for m in range(1, 12)]
+KB_TOPICS = [
+    "creating events", "recurring reminders", "time zones", "search tips",
+    "calendar sharing", "notifications", "availability", "privacy",
+]
+
+
+# ---------------- FIXTURES ----------------
+
+def write_knowledge_base(directory, documents, seed):
+    rng = random.Random(seed)
+    words = " ".join(KB_TOPICS + SUMMARIES).lower().split()
+
+    for i in range(documents):
+        topic = KB_TOPICS[i % len(KB_TOPICS)]
+        paragraphs = [
+            f"# {topic.title()} {i}",
+            f"This guide explains {topic} in the Agentic Calendar Assistant."
+        ]
+        paragraphs += [" ".join(rng.choices(words, k=60)) for _ in range(4)]
+        with open(os.path.join(directory, f"doc_{i:04d}.md"), "w") as out:
+            out.write("\n\n".join(paragraphs))
+
+
+def knowledge_queries(count, seed):
+    rng = random.Random(seed)
+    return [
+        f"How do I manage {rng.choice(KB_TOPICS)} for {rng.choice(SUMMARIES).lower()} {i}?"
+        for i in range(count)
+    ]
+
+
+# ---------------- SCENARIOS ----------------
+
+def scenarios(args):
+    rng = random.Random(args.seed)
+    queries = knowledge_queries(args.ops * 2, args.seed)
+
+    def agent(i):
+        calendar_client.agent_decide_and_act(AGENT_WORKLOAD[i % len(AGENT_WORKLOAD)])
+
+    def list_cached(i):
+        google_calendar_server.list_events(*MONTHS[i % len(MONTHS)])
+
+    def list_uncached(i):
+        google_calendar_server.list_events(*MONTHS[i % len(MONTHS)], use_cache=False)
+
+    def search(i):
+        google_calendar_server.search_events(SUMMARIES[i % len(SUMMARIES)].split()[0])
+
+    def create(i):
+        google_calendar_server.create_event(
+            title=f"Bench {i}",
+            date=f"2026-{rng.randint(1, 12):02d}-{rng.randint(1, 28):02d}",
+            start_time="10:00",
+            end_time="11:00"
+        )
+
+    def retrieve_miss(i):
+        rag_engine.retrieve_context(queries[i % len(queries)])
+
+    def retrieve_hit(i):
+        rag_engine.retrieve_context(queries[i % 8])
+
+    return {
+        "agent_mixed": agent,
+        "list_events_cached": list_cached,
+        "list_events_uncached": list_uncached,
+        "search_events": search,
+        "create_event": create,
+        "retrieve_context_miss": retrieve_miss,
+        "retrieve_context_hit": retrieve_hit,
+    }
+
+
+def run_scenario(op, backend, ops, warmup, alloc_ops):
+    for i in range(warmup):
+        op(i)
+
+    requests_before, bytes_before = backend.request_count, backend.bytes_sent
+    latencies = []
+    errors = 0
+
+    started = time.perf_counter()
+    for i in range(ops):
+        t0 = time.perf_counter()
+        try:
+            op(warmup + i)
+        except Exception:
+            errors += 1
+        latencies.append((time.perf_counter() - t0) * 1000)
+    result = latency_summary(latencies, time.perf_counter() - started)
+
+    result["errors"] = errors
+    result["backend_requests_per_op"] = (backend.request_count - requests_before) / ops
+    result["backend_bytes_per_op"] = (backend.bytes_sent - bytes_before) / ops
+
+    # Allocations are measured separately: tracemalloc slows everything down.
+    tracemalloc.start()
+    baseline, _ = tracemalloc.get_traced_memory()
+    tracemalloc.reset_peak()
+    for i in range(alloc_ops):
+        try:
+            op(warmup + ops + i)
+        except Exception:
+            pass
+    current, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+
+    result["alloc_peak_kb"] = (peak - baseline) / 1024
+    result["alloc_retained_kb_per_op"] = (current - baseline) / 1024 / max(alloc_ops, 1)
+    result["rss_mb"] = rag_engine.current_rss_mb()
+    return result
+
+
+def git_revision():
+    try:
+        return subprocess.run(
+            ["git", "rev-parse", "--short", "HEAD"],
+            capture_output=True, text=True, check=True
+        ).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def run_suite(args):
+    telemetry.configure(enabled=False, console_events=False)
+
+    backend = FakeCalendarBackend(
+        event_count=args.events,
+        latency=args.latency,
+        error_rate=args.error_rate,
+        seed=args.seed
+    )
+    calendar_service.set_service_manager(backend.manager())
+    request_scheduler.set_scheduler(request_scheduler.RequestScheduler(
+        limiter=request_scheduler.TokenBucket(rate=1e9, capacity=1e9),
+        backoff_base=args.backoff_base
+    ))
+
+    workdir = tempfile.mkdtemp(prefix="calendar-bench-")
+    kb_dir = os.path.join(workdir, "knowledge_base")
+    os.makedirs(kb_dir)
+    write_knowledge_base(kb_dir, args.documents, args.seed)
+    rag_engine.KNOWLEDGE_BASE_PATH = kb_dir
+    rag_engine.INDEX_DIR = os.path.join(workdir, "vector_index")
+    if args.embeddings == "hashing":
+        rag_engine.make_embeddings = HashingEmbeddings
+
+    started = time.perf_counter()
+    rag_engine.get_vector_store()
+    rag_load_seconds = time.perf_counter() - started
+
+    selected = scenarios(args)
+    if args.only:
+        selected = {name: op for name, op in selected.items() if name in args.only}
+
+    results = {}
+    for name, op in selected.items():
+        results[name] = run_scenario(op, backend, args.ops, args.warmup, args.alloc_ops)
+        row = results[name]
+        print(
+            f"{name:<24} {row['requests_per_sec']:9.1f} ops/s  "
+            f"p50={row['p50_ms']:8.3f} ms  p99={row['p99_ms']:8.3f} ms  "
+            f"alloc peak={row['alloc_peak_kb']:9.1f} KB  errors={row['errors']}"
+        )
+
+    return {
+        "meta": {
+            "revision": git_revision(),
+            "python": sys.version.split()[0],
+            "platform": platform.platform(),
+            "timestamp": time.strftime("%Y-%m-%dT%H:%M:%SZ", time.gmtime()),
+            "rag_load_seconds": rag_load_seconds,
+            "peak_rss_mb": resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024
+        },
+        "config": {key: value for key, value in vars(args).items() if key not in ("output", "compare")},
+        "scenarios": results
+    }
+
+
+# ---------------- COMPARE ----------------
+
+# metric -> True when higher is better
+COMPARED_METRICS = {
+    "requests_per_sec": True,
+    "p50_ms": False,
+    "p99_ms": False,
+    "alloc_peak_kb": False,
+    "backend_requests_per_op": False,
+}
+
+
+def compare(base_path, new_path, threshold):
+    with open(base_path) as handle:
+        base = json.load(handle)
+    with open(new_path) as handle:
+        new = json.load(handle)
+
+    print(f"{base['meta'].get('revision')} -> {new['meta'].get('revision')}")
+    regressions = 0
+
+    for name, new_row in new["scenarios"].items():
+        base_row = base["scenarios"].get(name)
+        if base_row is None:
+            continue
+        for metric, higher_is_better in COMPARED_METRICS.items():
+            old, current = base_row.get(metric), new_row.get(metric)
+            if not old or current is None:
+                continue
+            change = (current - old) / old * 100
+            worse = change < -threshold if higher_is_better else change > threshold
+            regressions += worse
+            flag = "  REGRESSION" if worse else ""
+            print(f"{name:<24} {metric:<24} {old:12.3f} -> {current:12.3f}  {change:+7.1f}%{flag}")
+
+    return regressions
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--events", type=int, default=2000)
+    parser.add_argument("--latency", type=float, default=0.01, help="backend latency per request (s)")
+    parser.add_argument("--error-rate", type=float, default=0.0)
+    parser.add_argument("--backoff-base", type=float, default=0.01)
+    parser.add_argument("--documents", type=int, default=200)
+    parser.add_argument("--embeddings", choices=("hashing", "model"), default="hashing")
+    parser.add_argument("--ops", type=int, default=200)
+    parser.add_argument("--warmup", type=int, default=10)
+    parser.add_argument("--alloc-ops", type=int, default=20)
+    parser.add_argument("--seed", type=int, default=7)
+    parser.add_argument("--only", nargs="*", help="run only these scenarios")
+    parser.add_argument("--output", help="write results to this JSON file")
+    parser.add_argument("--compare", nargs=2, metavar=("BASE", "NEW"), help="diff two result files")
+    parser.add_argument("--threshold", type=float, default=10.0, help="regression threshold in percent")
+    args = parser.parse_args()
+
+    if args.compare:
+        sys.exit(1 if compare(*args.compare, args.threshold) else 0)
+
+    results = run_suite(args)
+
+    if args.output:
+        with open(args.output, "w") as out:
+            json.dump(results, out, indent=2)
+        print(f"results written to {args.output}")
+
+
+if __name__ == "__main__":
+    main()
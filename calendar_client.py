@@ -1,73 +1,92 @@
-import re
-from datetime import datetime
+import os
 
+import answer_cache
+import telemetry
 from google_calendar_server import (
     list_events,
     search_events,
     create_event
 )
 
-from rag_engine import retrieve_context
+from rag_engine import retrieve_context, warm_up
 from agent_evaluator import evaluate_response
+from intent_router import (
+    DEFAULT_SEARCH_KEYWORD,
+    DEFAULT_TITLE,
+    default_list_range,
+    route
+)
 
 
 # ---------------- HELPER FUNCTIONS ----------------
 
-def parse_date_time(user_query: str):
+def parse_date_time(user_query: str, slots=None):
     """
     Very simple parser for queries like:
     'Create a meeting on January 21st from 10 AM to 11 AM'
     """
+    if slots is None:
+        slots = route(user_query)["slots"]
 
-    # Extract date
-    date_match = re.search(
-        r"(january|february|march|april|may|june|july|august|september|october|november|december)\s+(\d{1,2})",
-        user_query,
-        re.IGNORECASE
-    )
-
-    # Extract time
-    time_match = re.search(
-        r"(\d{1,2})\s*(am|pm)\s*to\s*(\d{1,2})\s*(am|pm)",
-        user_query,
-        re.IGNORECASE
-    )
-
-    if not date_match or not time_match:
+    if not slots["date"] or not slots["start_time"]:
         return None
 
-    month, day = date_match.groups()
-    sh, s_ampm, eh, e_ampm = time_match.groups()
-
-    year = 2026  # demo year
-
-    start_time = datetime.strptime(f"{sh} {s_ampm}", "%I %p").strftime("%H:%M")
-    end_time = datetime.strptime(f"{eh} {e_ampm}", "%I %p").strftime("%H:%M")
-
-    date_obj = datetime.strptime(f"{day} {month} {year}", "%d %B %Y")
-
     return {
-        "date": date_obj.strftime("%Y-%m-%d"),
-        "start_time": start_time,
-        "end_time": end_time
+        "date": slots["date"],
+        "start_time": slots["start_time"],
+        "end_time": slots["end_time"]
     }
 
 
 # ---------------- AGENT ----------------
 
+@telemetry.traced("agent.query")
 def agent_decide_and_act(user_query: str):
-    query = user_query.lower()
-    print(f"[Agent] Received query: {user_query}")
+    telemetry.event("agent.query", f"Received query: {user_query}", query=user_query)
+    with telemetry.span("agent.route"):
+        routed = route(user_query)
+    telemetry.current_span().set(intent=routed["intent"])
+
+    cached, ticket = answer_cache.lookup(user_query, routed)
+    if cached is not None:
+        telemetry.event("agent.reasoning", "Answered this question before; reusing the answer")
+        return cached
+
+    result = _act(user_query, routed["intent"], routed["slots"])
+    answer_cache.store(ticket, result)
+    return result
+
+
+# Tools the dispatch below can call, by name. async_agent passes its own
+# awaitable versions of the same tools.
+TOOLS = {
+    "list_events": list_events,
+    "search_events": search_events,
+    "create_event": create_event,
+    "retrieve_context": retrieve_context
+}
 
+
+def intent_steps(user_query, intent, slots):
+    """
+    The intent dispatch shared by the sync and async agents. A generator:
+    it yields (tool name, args, kwargs) for every tool call, is sent the
+    tool's result and returns the response, so the same steps run with
+    plain or awaitable tools (see _act here and in async_agent).
+    """
     # 🔹 CALENDAR INTENTS
-    if any(word in query for word in ["event", "events", "calendar", "meeting", "schedule", "create"]):
+    if intent in ("list", "search", "create"):
 
         # LIST EVENTS
-        if any(word in query for word in ["list", "show", "what"]):
-            print("[Agent Reasoning] User wants to see events")
-            print("[Agent Action] Calling list_events tool")
+        if intent == "list":
+            telemetry.event("agent.reasoning", "User wants to see events")
+            telemetry.event("agent.action", "Calling list_events tool", tool="list_events")
 
-            events = list_events("2026-01-01", "2026-01-31")
+            default_start, default_end = default_list_range()
+            events = yield "list_events", (
+                slots["start_date"] or default_start,
+                slots["end_date"] or default_end
+            ), {}
 
             evaluation = evaluate_response(
                 user_query=user_query,
@@ -79,11 +98,11 @@ def agent_decide_and_act(user_query: str):
             return {"response": events, "evaluation": evaluation}
 
         # SEARCH EVENTS
-        if any(word in query for word in ["search", "find"]):
-            print("[Agent Reasoning] User wants to search events")
-            print("[Agent Action] Calling search_events tool")
+        if intent == "search":
+            telemetry.event("agent.reasoning", "User wants to search events")
+            telemetry.event("agent.action", "Calling search_events tool", tool="search_events")
 
-            events = search_events("Project")
+            events = yield "search_events", (slots["keyword"] or DEFAULT_SEARCH_KEYWORD,), {}
 
             evaluation = evaluate_response(
                 user_query=user_query,
@@ -95,10 +114,10 @@ def agent_decide_and_act(user_query: str):
             return {"response": events, "evaluation": evaluation}
 
         # CREATE EVENT
-        if any(word in query for word in ["create", "schedule"]):
-            print("[Agent Reasoning] User wants to create an event")
+        if intent == "create":
+            telemetry.event("agent.reasoning", "User wants to create an event")
 
-            parsed = parse_date_time(user_query)
+            parsed = parse_date_time(user_query, slots)
 
             if not parsed:
                 return {
@@ -108,16 +127,16 @@ def agent_decide_and_act(user_query: str):
                     "evaluation": {"status": "failed"}
                 }
 
-            print("[Agent Action] Calling create_event tool")
+            telemetry.event("agent.action", "Calling create_event tool", tool="create_event")
 
-            result = create_event(
-                title="Meeting",
-                date=parsed["date"],
-                start_time=parsed["start_time"],
-                end_time=parsed["end_time"],
-                description="Created by Agentic Calendar Assistant",
-                location="Home"
-            )
+            result = yield "create_event", (), {
+                "title": slots["title"] or DEFAULT_TITLE,
+                "date": parsed["date"],
+                "start_time": parsed["start_time"],
+                "end_time": parsed["end_time"],
+                "description": "Created by Agentic Calendar Assistant",
+                "location": "Home"
+            }
 
             evaluation = evaluate_response(
                 user_query=user_query,
@@ -129,10 +148,10 @@ def agent_decide_and_act(user_query: str):
             return {"response": result, "evaluation": evaluation}
 
     # 🔹 KNOWLEDGE (RAG)
-    if any(word in query for word in ["what", "explain", "how"]):
-        print("[Agent Reasoning] Knowledge-based question detected")
+    if intent == "knowledge":
+        telemetry.event("agent.reasoning", "Knowledge-based question detected")
 
-        context = retrieve_context(user_query)
+        context = yield "retrieve_context", (user_query,), {}
 
         response = {"answer": context, "source": "knowledge_base"}
 
@@ -151,9 +170,26 @@ def agent_decide_and_act(user_query: str):
     }
 
 
+def _act(user_query, intent, slots, tools=TOOLS):
+    steps = intent_steps(user_query, intent, slots)
+    try:
+        name, args, kwargs = next(steps)
+        while True:
+            name, args, kwargs = steps.send(tools[name](*args, **kwargs))
+    except StopIteration as done:
+        return done.value
+
+
 # ---------------- INTERACTIVE MODE ----------------
 
 if __name__ == "__main__":
+    telemetry.configure_from_env()
+
+    # Opt-in: load the embedding model while the user types, at the cost
+    # of torch being resident even for calendar-only sessions.
+    if os.environ.get("RAG_WARMUP") == "1":
+        warm_up(background=True)
+
     print("=== Agentic Calendar Assistant ===")
     print("Type your query below (type 'exit' to quit)\n")
 
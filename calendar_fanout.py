@@ -0,0 +1,155 @@
+import contextvars
+import heapq
+import os
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor, wait
+
+import telemetry
+from event_cache import event_bounds
+from event_model import Event
+
+FANOUT_MAX_WORKERS = int(os.environ.get("CALENDAR_FANOUT_WORKERS", "8"))
+FANOUT_TIMEOUT_SECONDS = float(os.environ.get("CALENDAR_FANOUT_TIMEOUT", "10"))
+
+_EXECUTOR = None
+
+# Timed-out fetches can't be interrupted mid-request; they stop at their
+# deadline between pages (see _timed_fetch) and are counted here until
+# they release their pool thread.
+FANOUT_STATS = {"timeouts": 0, "abandoned_running": 0}
+_STATS_LOCK = threading.Lock()
+
+
+# ---------------- EXECUTOR ----------------
+
+def get_executor():
+    """
+    Bounded pool shared by every fan-out, so a request naming many
+    calendars queues here instead of opening one connection per calendar.
+    """
+    global _EXECUTOR
+
+    if _EXECUTOR is None:
+        _EXECUTOR = ThreadPoolExecutor(
+            max_workers=FANOUT_MAX_WORKERS,
+            thread_name_prefix="calendar-fanout"
+        )
+    return _EXECUTOR
+
+
+def shutdown_executor():
+    global _EXECUTOR
+
+    if _EXECUTOR is not None:
+        _EXECUTOR.shutdown(wait=True)
+        _EXECUTOR = None
+
+
+# ---------------- FAN-OUT ----------------
+
+def _timed_fetch(fetch, calendar_id, deadline):
+    started = time.perf_counter()
+    events = []
+    try:
+        # Streaming fetches request pages lazily; past the deadline nobody
+        # reads the result, so stop before asking for the next one.
+        for event in fetch(calendar_id):
+            events.append(event)
+            if time.perf_counter() > deadline:
+                raise TimeoutError(f"calendar {calendar_id!r} passed its deadline")
+        return events, time.perf_counter() - started, None
+    except Exception as exc:
+        return [], time.perf_counter() - started, exc
+
+
+def _abandoned_done(future):
+    with _STATS_LOCK:
+        FANOUT_STATS["abandoned_running"] -= 1
+
+
+def fan_out(calendar_ids, fetch, timeout=FANOUT_TIMEOUT_SECONDS, tz=None):
+    """
+    Runs ``fetch(calendar_id)`` for every calendar on the shared pool and
+    returns (merged, report).
+
+    ``fetch`` must yield a calendar's events in start-time order. ``merged``
+    is a lazy k-way heap merge of those streams, so the combined result is
+    never concatenated and re-sorted. Each event comes back with a
+    "calendarId" key.
+
+    ``report`` maps calendar id to {"status", "count", "seconds", "error"}.
+    A calendar that raises is reported as "error" and one still running
+    after ``timeout`` seconds as "timeout"; both are left out of the merge
+    without holding back the others.
+    """
+    calendar_ids = list(dict.fromkeys(calendar_ids))
+    started = time.perf_counter()
+    deadline = started + timeout
+
+    futures = {
+        # Each fetch runs in a copy of the caller's context, so it uses the
+        # caller's Calendar account and nests under the caller's span.
+        get_executor().submit(contextvars.copy_context().run, _timed_fetch, fetch, calendar_id, deadline): calendar_id
+        for calendar_id in calendar_ids
+    }
+    done, pending = wait(futures, timeout=timeout)
+
+    report = {}
+    streams = []
+
+    for future, calendar_id in futures.items():
+        if future in pending:
+            # Queued fetches are dropped; running ones finish (or hit the
+            # deadline) in the background.
+            cancelled = future.cancel()
+            with _STATS_LOCK:
+                FANOUT_STATS["timeouts"] += 1
+                if not cancelled:
+                    FANOUT_STATS["abandoned_running"] += 1
+            if not cancelled:
+                future.add_done_callback(_abandoned_done)
+            report[calendar_id] = {
+                "status": "timeout",
+                "count": 0,
+                "seconds": time.perf_counter() - started,
+                "error": f"no response after {timeout} s"
+            }
+            continue
+
+        events, seconds, error = future.result()
+        if error is not None:
+            report[calendar_id] = {
+                "status": "error",
+                "count": 0,
+                "seconds": seconds,
+                "error": str(error)
+            }
+            continue
+
+        report[calendar_id] = {
+            "status": "ok",
+            "count": len(events),
+            "seconds": seconds,
+            "error": None
+        }
+        streams.append(_tagged(calendar_id, events, tz))
+
+    merged = (event for _, event in heapq.merge(*streams, key=lambda item: item[0]))
+    return merged, report
+
+
+def _tagged(calendar_id, events, tz):
+    """
+    (start_ts, event) pairs for one calendar; events without a usable
+    start sort first, as the API itself would return them. Event records
+    already carry their calendar; plain dicts get a tagged copy.
+    """
+    for event in events:
+        bounds = event_bounds(event, tz)
+        if not isinstance(event, Event):
+            event = dict(event, calendarId=calendar_id)
+        yield (bounds[0] if bounds else float("-inf")), event
+
+
+telemetry.register_collector(lambda: {f"calendar.fanout.{name}": value for name, value in FANOUT_STATS.items()})
@@ -0,0 +1,258 @@
+import contextvars
+import queue
+import threading
+from contextlib import contextmanager
+
+import httplib2
+from google_auth_httplib2 import AuthorizedHttp
+from google_auth_oauthlib.flow import InstalledAppFlow
+from googleapiclient.discovery import build, build_from_document
+from googleapiclient.discovery_cache import get_static_doc
+
+from credential_store import DEFAULT_USER, get_credential_store
+
+SCOPES = ["https://www.googleapis.com/auth/calendar"]
+TOKEN_FILE = "token.pickle"
+CLIENT_SECRETS_FILE = "credentials.json"
+
+DEFAULT_POOL_SIZE = 8
+HTTP_TIMEOUT_SECONDS = 30
+
+
+# ================= CREDENTIALS =================
+
+def load_credentials(user_id=DEFAULT_USER, client_secrets_file=CLIENT_SECRETS_FILE, token_file=TOKEN_FILE):
+    """
+    Loads the user's OAuth credentials from the credential store, importing
+    a legacy token file once, refreshing or running the consent flow when
+    needed.
+    """
+    store = get_credential_store()
+    creds = store.get(user_id) or store.import_pickle(user_id, token_file)
+
+    if not creds or not creds.valid:
+        if creds and creds.expired and creds.refresh_token:
+            store.refresh(user_id, force=True)
+        else:
+            flow = InstalledAppFlow.from_client_secrets_file(
+                client_secrets_file, SCOPES
+            )
+
+            auth_url, _ = flow.authorization_url(prompt="consent")
+
+            print("\nAUTHORIZE THIS APP")
+            print(auth_url)
+            print("\nPaste the authorization code here:")
+
+            code = input("> ").strip()
+            flow.fetch_token(code=code)
+            store.put(user_id, flow.credentials)
+            creds = store.get(user_id)
+
+    return creds
+
+
+def _authorized_http(creds):
+    return AuthorizedHttp(creds, http=httplib2.Http(timeout=HTTP_TIMEOUT_SECONDS))
+
+
+# ================= DISCOVERY =================
+
+_DISCOVERY_DOCS = {}
+_DISCOVERY_LOCK = threading.Lock()
+
+
+def get_discovery_document(service_name="calendar", version="v3"):
+    """
+    Returns the bundled discovery document, read from disk once per process.
+    """
+    key = (service_name, version)
+
+    with _DISCOVERY_LOCK:
+        if key not in _DISCOVERY_DOCS:
+            _DISCOVERY_DOCS[key] = get_static_doc(service_name, version)
+        return _DISCOVERY_DOCS[key]
+
+
+def build_calendar_resource(http):
+    doc = get_discovery_document()
+
+    if doc is None:
+        return build("calendar", "v3", http=http, cache_discovery=False)
+
+    return build_from_document(doc, http=http)
+
+
+# ================= SERVICE MANAGER =================
+
+class CalendarServiceManager:
+    """
+    Long-lived, thread-safe owner of the Calendar credentials and API resource.
+
+    The discovery-built resource is created once and shared. httplib2
+    transports are not thread-safe, so each request borrows an authorized
+    transport from a bounded pool and returns it after the round-trip.
+    Tokens are refreshed ahead of expiry by the credential store, and
+    every pooled transport wraps the same credentials object.
+    """
+
+    def __init__(
+        self,
+        credentials_loader=load_credentials,
+        http_factory=_authorized_http,
+        pool_size=DEFAULT_POOL_SIZE
+    ):
+        self._credentials_loader = credentials_loader
+        self._http_factory = http_factory
+        self._pool_size = pool_size
+
+        self._lock = threading.RLock()
+        self._creds = None
+        self._service = None
+        self._pool = queue.LifoQueue()
+        self._created = 0
+        self._scoped = {}
+
+    # ---------- credentials ----------
+
+    def credentials(self):
+        if self._creds is None:
+            with self._lock:
+                if self._creds is None:
+                    self._creds = self._credentials_loader()
+        return self._creds
+
+    # ---------- service + transports ----------
+
+    def service(self):
+        if self._service is None:
+            with self._lock:
+                if self._service is None:
+                    self._service = build_calendar_resource(
+                        self._http_factory(self.credentials())
+                    )
+        return self._service
+
+    @contextmanager
+    def http(self):
+        """
+        Borrows an authorized transport from the pool.
+        """
+        http = self._acquire()
+        try:
+            yield http
+        finally:
+            self._pool.put(http)
+
+    def _acquire(self):
+        try:
+            return self._pool.get_nowait()
+        except queue.Empty:
+            pass
+
+        with self._lock:
+            if self._created < self._pool_size:
+                self._created += 1
+                create = True
+            else:
+                create = False
+
+        if create:
+            try:
+                return self._http_factory(self.credentials())
+            except Exception:
+                with self._lock:
+                    self._created -= 1
+                raise
+
+        return self._pool.get()
+
+    def execute(self, request):
+        """
+        Executes a googleapiclient HttpRequest on a pooled transport.
+        """
+        with self.http() as http:
+            return request.execute(http=http)
+
+    def get_scoped(self, key, factory=None):
+        """
+        Per-account state kept on this manager (event cache, scheduler, ...),
+        created with ``factory()`` on first use. Without a factory, returns
+        None when it does not exist yet. Keeping it here means two accounts
+        never share cached events or in-flight requests.
+        """
+        value = self._scoped.get(key)
+        if value is None and factory is not None:
+            with self._lock:
+                value = self._scoped.get(key)
+                if value is None:
+                    value = self._scoped[key] = factory()
+        return value
+
+    def close(self):
+        while True:
+            try:
+                http = self._pool.get_nowait()
+            except queue.Empty:
+                break
+            close = getattr(http, "close", None)
+            if close:
+                close()
+
+        for value in self._scoped.values():
+            close = getattr(value, "close", None)
+            if close:
+                close()
+
+
+_DEFAULT_MANAGER = None
+_DEFAULT_MANAGER_LOCK = threading.Lock()
+_ACTIVE_MANAGER = contextvars.ContextVar("calendar_service_manager", default=None)
+
+
+def get_service_manager():
+    """
+    The manager installed for the current context with
+    use_service_manager(), else the process-wide one.
+    """
+    global _DEFAULT_MANAGER
+
+    active = _ACTIVE_MANAGER.get()
+    if active is not None:
+        return active
+
+    if _DEFAULT_MANAGER is None:
+        with _DEFAULT_MANAGER_LOCK:
+            if _DEFAULT_MANAGER is None:
+                _DEFAULT_MANAGER = CalendarServiceManager()
+    return _DEFAULT_MANAGER
+
+
+def set_service_manager(manager):
+    """
+    Replaces the process-wide manager (used by benchmarks and fake backends).
+    """
+    global _DEFAULT_MANAGER
+
+    with _DEFAULT_MANAGER_LOCK:
+        previous = _DEFAULT_MANAGER
+        _DEFAULT_MANAGER = manager
+    return previous
+
+
+def using_default_manager():
+    return _ACTIVE_MANAGER.get() is None
+
+
+@contextmanager
+def use_service_manager(manager):
+    """
+    Routes every Calendar call made in this context (thread or asyncio
+    task) through ``manager``: how service mode serves one user's request
+    with that user's credentials and caches.
+    """
+    token = _ACTIVE_MANAGER.set(manager)
+    try:
+        yield manager
+    finally:
+        _ACTIVE_MANAGER.reset(token)
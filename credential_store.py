@@ -0,0 +1,410 @@
+import json
+import os
+import pickle
+import sqlite3
+import tempfile
+import threading
+import time
+from contextlib import contextmanager
+from datetime import timezone
+
+from cryptography.fernet import Fernet, InvalidToken
+from google.auth.transport.requests import Request
+from google.oauth2.credentials import Credentials
+
+import telemetry
+
+CREDENTIAL_DB = os.environ.get("CALENDAR_CREDENTIAL_DB", "credentials.db")
+CREDENTIAL_KEY_FILE = os.environ.get("CALENDAR_CREDENTIAL_KEY_FILE", "credentials.key")
+DEFAULT_USER = "default"
+
+REFRESH_MARGIN_SECONDS = 300
+REFRESH_RETRY_SECONDS = 30
+# How long a process waits for another one holding the database lock
+# (for instance while it refreshes the same user's token).
+LOCK_TIMEOUT_SECONDS = 30
+# A secret file found empty or short is re-read this often before giving
+# up (a process from before atomic writes may still be writing it).
+SECRET_READ_ATTEMPTS = 5
+SECRET_READ_DELAY_SECONDS = 0.1
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS credentials (
+    user_id TEXT PRIMARY KEY,
+    payload BLOB NOT NULL,
+    expiry REAL,
+    updated REAL NOT NULL
+)
+"""
+
+
+# ================= ENCRYPTION =================
+
+def load_or_create_secret(path, generate, min_length):
+    """
+    The secret stored in ``path``, created with ``generate()`` (bytes) on
+    first use. A new secret is written to a private (0600) temp file and
+    published with a hard link, which is atomic and never replaces an
+    existing file: readers never see a partial file, and when several
+    processes start at once the first to publish wins and every other
+    one reads its value. Raises ValueError when the file holds fewer
+    than ``min_length`` bytes.
+    """
+    if not os.path.exists(path):
+        fd, temp = tempfile.mkstemp(prefix=".secret-", dir=os.path.dirname(os.path.abspath(path)))
+        try:
+            with os.fdopen(fd, "wb") as handle:
+                handle.write(generate())
+                handle.flush()
+                os.fsync(handle.fileno())
+            try:
+                os.link(temp, path)
+            except FileExistsError:
+                pass
+        finally:
+            os.unlink(temp)
+
+    for _ in range(SECRET_READ_ATTEMPTS):
+        with open(path, "rb") as handle:
+            secret = handle.read().strip()
+        if len(secret) >= min_length:
+            return secret
+        time.sleep(SECRET_READ_DELAY_SECONDS)
+
+    raise ValueError(f"{path} holds an empty or truncated secret; delete it or set the secret explicitly")
+
+
+def load_key(key_file=CREDENTIAL_KEY_FILE):
+    """
+    The Fernet key from CALENDAR_CREDENTIAL_KEY, else from ``key_file``,
+    created on first use by load_or_create_secret(), so concurrent first
+    starts agree on a single key.
+    """
+    key = os.environ.get("CALENDAR_CREDENTIAL_KEY")
+    if key:
+        return key.encode("ascii")
+
+    return load_or_create_secret(key_file, Fernet.generate_key, min_length=44)
+
+
+def _expiry_ts(creds):
+    if creds.expiry is None:
+        return None
+    return creds.expiry.replace(tzinfo=timezone.utc).timestamp()
+
+
+def seconds_until_due(creds, margin, now=None):
+    """
+    Seconds until ``creds`` should be refreshed (negative when overdue),
+    or None when they carry no expiry.
+    """
+    expiry = _expiry_ts(creds)
+    if expiry is None:
+        return None
+    return expiry - margin - (time.time() if now is None else now)
+
+
+# ================= STORE =================
+
+class CredentialStore:
+    """
+    Per-user OAuth credentials: an in-memory hot tier in front of an
+    encrypted SQLite file.
+
+    get() reads the database once per user and process; after that the
+    same Credentials object is returned from memory, so every transport
+    built on it sees refreshes without touching disk. A background thread
+    refreshes tokens ``refresh_margin`` seconds before they expire.
+
+    The token endpoint is called without holding the database lock; the
+    new token is then written back with a compare-and-swap on the stored
+    one. A process that finds a newer token already stored (another one
+    refreshed first) adopts it instead of writing its own.
+    """
+
+    def __init__(self, path=CREDENTIAL_DB, key=None, refresh_margin=REFRESH_MARGIN_SECONDS,
+                 background_refresh=True, refresh=None):
+        self.path = path
+        self.refresh_margin = refresh_margin
+        self._fernet = Fernet(key or load_key())
+        self._refresh = refresh or (lambda creds: creds.refresh(Request()))
+        self._background_refresh = background_refresh
+
+        if path != ":memory:" and not os.path.exists(path):
+            os.close(os.open(path, os.O_WRONLY | os.O_CREAT, 0o600))
+
+        self._db_lock = threading.Lock()
+        self._db = sqlite3.connect(path, timeout=LOCK_TIMEOUT_SECONDS, check_same_thread=False,
+                                   isolation_level=None)
+        with self._db_lock:
+            if path != ":memory:":
+                self._db.execute("PRAGMA journal_mode=WAL")
+            self._db.execute(SCHEMA)
+
+        self._lock = threading.Lock()
+        self._hot = {}
+        self._user_locks = {}
+        self._retry_at = {}
+
+        self._stop = threading.Event()
+        self._wake = threading.Event()
+        self._refresher = None
+
+        self.stats = {"hot_hits": 0, "cold_loads": 0, "refreshes": 0, "adopted": 0, "refresh_failures": 0}
+
+    # ---------- serialization ----------
+
+    def _encrypt(self, creds):
+        return self._fernet.encrypt(creds.to_json().encode("utf-8"))
+
+    def _decrypt(self, payload):
+        try:
+            info = json.loads(self._fernet.decrypt(payload))
+        except InvalidToken:
+            raise ValueError("stored credentials cannot be decrypted with this key")
+        return Credentials.from_authorized_user_info(info)
+
+    # ---------- cold tier ----------
+
+    @contextmanager
+    def _transaction(self):
+        """
+        BEGIN IMMEDIATE takes SQLite's write lock up front: other processes
+        block here (up to LOCK_TIMEOUT_SECONDS) until we commit.
+        """
+        with self._db_lock:
+            self._db.execute("BEGIN IMMEDIATE")
+            try:
+                yield self._db
+            except BaseException:
+                self._db.execute("ROLLBACK")
+                raise
+            self._db.execute("COMMIT")
+
+    def _read(self, conn, user_id):
+        row = conn.execute("SELECT payload FROM credentials WHERE user_id = ?", (user_id,)).fetchone()
+        return self._decrypt(row[0]) if row else None
+
+    def _write(self, conn, user_id, creds):
+        conn.execute(
+            "INSERT OR REPLACE INTO credentials (user_id, payload, expiry, updated) VALUES (?, ?, ?, ?)",
+            (user_id, self._encrypt(creds), _expiry_ts(creds), time.time())
+        )
+
+    # ---------- hot tier ----------
+
+    def _user_lock(self, user_id):
+        with self._lock:
+            lock = self._user_locks.get(user_id)
+            if lock is None:
+                lock = self._user_locks[user_id] = threading.Lock()
+            return lock
+
+    def get(self, user_id=DEFAULT_USER):
+        """
+        The user's credentials, or None when nothing is stored.
+        """
+        creds = self._hot.get(user_id)
+        if creds is not None:
+            self.stats["hot_hits"] += 1
+            return creds
+
+        with self._user_lock(user_id):
+            creds = self._hot.get(user_id)
+            if creds is None:
+                with self._db_lock:
+                    creds = self._read(self._db, user_id)
+                if creds is None:
+                    return None
+                self.stats["cold_loads"] += 1
+                self._remember(user_id, creds)
+        return creds
+
+    def put(self, user_id, creds):
+        """
+        Stores new credentials (after a consent flow, or a refresh done
+        outside the store). A hot object already handed out is updated in
+        place so transports built on it pick up the new token.
+        """
+        with self._user_lock(user_id):
+            with self._transaction() as conn:
+                self._write(conn, user_id, creds)
+            current = self._hot.get(user_id)
+            if current is not None and current is not creds:
+                self._adopt(current, creds)
+            else:
+                self._remember(user_id, creds)
+
+    def delete(self, user_id):
+        with self._user_lock(user_id):
+            with self._transaction() as conn:
+                conn.execute("DELETE FROM credentials WHERE user_id = ?", (user_id,))
+            with self._lock:
+                self._hot.pop(user_id, None)
+                self._retry_at.pop(user_id, None)
+
+    def users(self):
+        with self._db_lock:
+            return [row[0] for row in self._db.execute("SELECT user_id FROM credentials ORDER BY user_id")]
+
+    def import_pickle(self, user_id, token_file):
+        """
+        Moves a legacy token.pickle into the store: once the credentials
+        are stored encrypted, the plaintext file is deleted. Returns the
+        imported credentials, or None when the file does not exist.
+        """
+        if not os.path.exists(token_file):
+            return None
+        with open(token_file, "rb") as token:
+            creds = pickle.load(token)
+        self.put(user_id, creds)
+        try:
+            os.remove(token_file)
+        except FileNotFoundError:
+            pass
+        return self._hot[user_id]
+
+    def _remember(self, user_id, creds):
+        with self._lock:
+            self._hot[user_id] = creds
+        if self._background_refresh:
+            self._start_refresher()
+            self._wake.set()
+
+    @staticmethod
+    def _adopt(target, source):
+        target.token = source.token
+        target.expiry = source.expiry
+
+    # ---------- refresh ----------
+
+    def _is_due(self, creds):
+        remaining = seconds_until_due(creds, self.refresh_margin)
+        return not creds.valid or (remaining is not None and remaining <= 0)
+
+    def refresh(self, user_id=DEFAULT_USER, force=False):
+        """
+        Refreshes the user's token when it is due (or ``force``). Returns
+        True when the hot credentials changed.
+        """
+        creds = self.get(user_id)
+        if creds is None or not creds.refresh_token:
+            return False
+
+        with self._user_lock(user_id):
+            if not force and not self._is_due(creds):
+                return False
+
+            with self._db_lock:
+                stored = self._read(self._db, user_id)
+            if stored is not None and stored.token != creds.token and not self._is_due(stored):
+                # Another process refreshed it already.
+                self._adopt(creds, stored)
+                self.stats["adopted"] += 1
+                return True
+
+            # Network round trip on a copy, outside every lock other users
+            # (and other processes) need.
+            expected = stored.token if stored is not None else None
+            fresh = Credentials.from_authorized_user_info(json.loads(creds.to_json()))
+            self._refresh(fresh)
+
+            with self._transaction() as conn:
+                current = self._read(conn, user_id)
+                if current is not None and current.token != expected:
+                    # Lost the race: keep the token that is already stored.
+                    self._adopt(creds, current)
+                    self.stats["adopted"] += 1
+                    return True
+                self._write(conn, user_id, fresh)
+
+            self._adopt(creds, fresh)
+            self.stats["refreshes"] += 1
+            return True
+
+    def _start_refresher(self):
+        with self._lock:
+            if self._refresher is not None or self._stop.is_set():
+                return
+            self._refresher = threading.Thread(
+                target=self._refresh_loop,
+                name="credential-store-refresher",
+                daemon=True
+            )
+            self._refresher.start()
+
+    def _refresh_due(self):
+        """
+        Refreshes every hot user that is due and returns the seconds until
+        the next one is.
+        """
+        now = time.time()
+        wait = 3600.0
+
+        with self._lock:
+            hot = list(self._hot.items())
+
+        for user_id, creds in hot:
+            retry_at = self._retry_at.get(user_id, 0)
+            if retry_at > now:
+                wait = min(wait, retry_at - now)
+                continue
+
+            if creds.refresh_token and self._is_due(creds):
+                try:
+                    self.refresh(user_id)
+                except Exception as exc:
+                    self.stats["refresh_failures"] += 1
+                    self._retry_at[user_id] = now + REFRESH_RETRY_SECONDS
+                    telemetry.event("credentials.warning", f"Background refresh for {user_id!r} failed: {exc}",
+                                    user=user_id)
+                    wait = min(wait, REFRESH_RETRY_SECONDS)
+                    continue
+                self._retry_at.pop(user_id, None)
+
+            # Still due right after a refresh means the token lives shorter
+            # than the margin; retry later rather than spin.
+            remaining = seconds_until_due(creds, self.refresh_margin)
+            if remaining is not None:
+                wait = min(wait, remaining if remaining > 0 else REFRESH_RETRY_SECONDS)
+
+        return wait
+
+    def _refresh_loop(self):
+        while not self._stop.is_set():
+            self._wake.clear()
+            self._wake.wait(self._refresh_due())
+
+    def close(self):
+        self._stop.set()
+        self._wake.set()
+        if self._refresher is not None:
+            self._refresher.join(timeout=1)
+            self._refresher = None
+        with self._db_lock:
+            self._db.close()
+
+
+_DEFAULT_STORE = None
+_DEFAULT_STORE_LOCK = threading.Lock()
+
+
+def get_credential_store():
+    global _DEFAULT_STORE
+
+    if _DEFAULT_STORE is None:
+        with _DEFAULT_STORE_LOCK:
+            if _DEFAULT_STORE is None:
+                _DEFAULT_STORE = CredentialStore()
+    return _DEFAULT_STORE
+
+
+def set_credential_store(store):
+    """
+    Replaces the process-wide store. Returns the previous one.
+    """
+    global _DEFAULT_STORE
+
+    with _DEFAULT_STORE_LOCK:
+        previous, _DEFAULT_STORE = _DEFAULT_STORE, store
+    return previous
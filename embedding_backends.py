@@ -0,0 +1,258 @@
+import os
+import queue
+import threading
+import time
+from concurrent.futures import Future
+
+from langchain_core.embeddings import Embeddings
+
+import telemetry
+
+# "huggingface" (sentence-transformers on PyTorch), "onnx" (the same model
+# exported to ONNX, fp32) or "onnx-int8" (dynamically quantized weights).
+EMBEDDING_BACKEND = os.environ.get("RAG_EMBEDDING_BACKEND", "huggingface")
+ONNX_MODEL_DIR = os.environ.get("RAG_ONNX_MODEL_DIR", "models/all-MiniLM-L6-v2-onnx")
+# Intra-op threads for inference; 0 keeps the runtime's default (one per core).
+EMBEDDING_THREADS = int(os.environ.get("RAG_EMBEDDING_THREADS", "0"))
+# Concurrent embed_query calls share one forward pass, up to
+# EMBEDDING_MAX_BATCH texts. With a window > 0 the first query of a batch
+# also waits that long for company; at 0 only queries that queued up
+# while the previous batch ran are grouped, which costs idle callers nothing.
+EMBEDDING_BATCHING = os.environ.get("RAG_EMBEDDING_BATCHING", "1") == "1"
+EMBEDDING_BATCH_WINDOW_MS = float(os.environ.get("RAG_EMBEDDING_BATCH_WINDOW_MS", "0"))
+EMBEDDING_MAX_BATCH = int(os.environ.get("RAG_EMBEDDING_MAX_BATCH", "32"))
+
+ONNX_FILES = {"onnx": "model.onnx", "onnx-int8": "model_int8.onnx"}
+# all-MiniLM-L6-v2 truncates at 256 word pieces.
+MAX_SEQUENCE_LENGTH = 256
+
+EMBEDDING_STATS = {"queries": 0, "batches": 0, "batched_queries": 0, "max_batch": 0}
+_STATS_LOCK = threading.Lock()
+
+
+# ================= ONNX =================
+
+class OnnxEmbeddings(Embeddings):
+    """
+    Sentence embeddings from an ONNX export of the sentence-transformers
+    model: tokenize, one onnxruntime forward pass per batch, mean pooling
+    over the attention mask and L2 normalization, matching the model's
+    own pipeline (Transformer -> Pooling -> Normalize).
+
+    Needs only onnxruntime, tokenizers and numpy at run time; torch is
+    used once, by export_model().
+    """
+
+    def __init__(self, model_dir=ONNX_MODEL_DIR, quantized=False, threads=EMBEDDING_THREADS):
+        import onnxruntime
+        from tokenizers import Tokenizer
+
+        path = os.path.join(model_dir, ONNX_FILES["onnx-int8" if quantized else "onnx"])
+        if not os.path.exists(path):
+            raise FileNotFoundError(
+                f"{path} not found; create it with: python embedding_backends.py export --output {model_dir}"
+            )
+
+        options = onnxruntime.SessionOptions()
+        if threads:
+            options.intra_op_num_threads = threads
+            options.inter_op_num_threads = 1
+        options.graph_optimization_level = onnxruntime.GraphOptimizationLevel.ORT_ENABLE_ALL
+
+        self._session = onnxruntime.InferenceSession(path, options, providers=["CPUExecutionProvider"])
+        self._inputs = {node.name for node in self._session.get_inputs()}
+
+        self._tokenizer = Tokenizer.from_file(os.path.join(model_dir, "tokenizer.json"))
+        self._tokenizer.enable_truncation(MAX_SEQUENCE_LENGTH)
+        self._tokenizer.enable_padding()
+
+    def _embed(self, texts):
+        import numpy as np
+
+        encodings = self._tokenizer.encode_batch(list(texts))
+        ids = np.array([encoding.ids for encoding in encodings], dtype="int64")
+        mask = np.array([encoding.attention_mask for encoding in encodings], dtype="int64")
+
+        feed = {"input_ids": ids, "attention_mask": mask}
+        if "token_type_ids" in self._inputs:
+            feed["token_type_ids"] = np.zeros_like(ids)
+
+        hidden = self._session.run(None, feed)[0]
+        weights = mask[:, :, None].astype("float32")
+        pooled = (hidden * weights).sum(axis=1) / np.clip(weights.sum(axis=1), 1e-9, None)
+        pooled /= np.clip(np.linalg.norm(pooled, axis=1, keepdims=True), 1e-12, None)
+        return pooled.tolist()
+
+    def embed_documents(self, texts):
+        return self._embed(texts) if texts else []
+
+    def embed_query(self, text):
+        return self._embed([text])[0]
+
+
+def export_model(output_dir=ONNX_MODEL_DIR, model_name=None, quantize=True):
+    """
+    Exports the sentence-transformers model's encoder to
+    ``output_dir``/model.onnx with its tokenizer, plus an int8 copy
+    (dynamic quantization of the weights) when ``quantize`` is set.
+    """
+    import torch
+    from transformers import AutoModel, AutoTokenizer
+
+    from rag_engine import MODEL_NAME
+
+    model_name = model_name or MODEL_NAME
+    os.makedirs(output_dir, exist_ok=True)
+
+    tokenizer = AutoTokenizer.from_pretrained(model_name)
+    model = AutoModel.from_pretrained(model_name).eval()
+    tokenizer.save_pretrained(output_dir)
+
+    sample = tokenizer(["export sample"], return_tensors="pt")
+    names = [name for name in ("input_ids", "attention_mask", "token_type_ids") if name in sample]
+    axes = {name: {0: "batch", 1: "sequence"} for name in names}
+    axes["last_hidden_state"] = {0: "batch", 1: "sequence"}
+
+    path = os.path.join(output_dir, ONNX_FILES["onnx"])
+    with torch.no_grad():
+        torch.onnx.export(
+            model,
+            tuple(sample[name] for name in names),
+            path,
+            input_names=names,
+            output_names=["last_hidden_state"],
+            dynamic_axes=axes,
+            opset_version=14
+        )
+
+    if quantize:
+        from onnxruntime.quantization import QuantType, quantize_dynamic
+
+        quantize_dynamic(path, os.path.join(output_dir, ONNX_FILES["onnx-int8"]), weight_type=QuantType.QInt8)
+    return output_dir
+
+
+# ================= DYNAMIC BATCHING =================
+
+class BatchingEmbeddings(Embeddings):
+    """
+    Wraps an embeddings object so concurrent embed_query calls (service
+    threads, the async agent's pool) are grouped into one
+    embed_documents call; see EMBEDDING_BATCH_WINDOW_MS. embed_documents
+    calls pass straight through.
+    """
+
+    def __init__(self, inner, window_ms=EMBEDDING_BATCH_WINDOW_MS, max_batch=EMBEDDING_MAX_BATCH):
+        self.inner = inner
+        self._window = window_ms / 1000
+        self._max_batch = max_batch
+        self._lock = threading.Lock()
+        self._pid = None
+        self._queue = None
+
+    def _ensure_worker(self):
+        # The batcher thread does not survive fork(); a forked worker
+        # (service, batch_evaluator) starts its own on first use.
+        if self._pid == os.getpid():
+            return
+        with self._lock:
+            if self._pid != os.getpid():
+                self._queue = queue.Queue()
+                threading.Thread(target=self._run, args=(self._queue,), name="embedding-batcher", daemon=True).start()
+                self._pid = os.getpid()
+
+    def __getattr__(self, name):
+        # model_name, client, ... of the wrapped object.
+        if name == "inner":
+            raise AttributeError(name)
+        return getattr(self.inner, name)
+
+    def embed_documents(self, texts):
+        return self.inner.embed_documents(texts)
+
+    def embed_query(self, text):
+        self._ensure_worker()
+        future = Future()
+        self._queue.put((text, future))
+        return future.result()
+
+    def _run(self, requests):
+        while True:
+            batch = [requests.get()]
+            deadline = time.monotonic() + self._window
+
+            while len(batch) < self._max_batch:
+                remaining = deadline - time.monotonic()
+                try:
+                    batch.append(requests.get(timeout=remaining) if remaining > 0 else requests.get_nowait())
+                except queue.Empty:
+                    break
+
+            texts = [text for text, _ in batch]
+            try:
+                vectors = list(self.inner.embed_documents(texts))
+                if len(vectors) != len(batch):
+                    raise ValueError(f"embedding backend returned {len(vectors)} vectors for {len(batch)} texts")
+            except Exception as exc:
+                # Every caller is blocked on its future; none may be left hanging.
+                for _, future in batch:
+                    future.set_exception(exc)
+                continue
+
+            with _STATS_LOCK:
+                EMBEDDING_STATS["queries"] += len(batch)
+                EMBEDDING_STATS["batches"] += 1
+                if len(batch) > 1:
+                    EMBEDDING_STATS["batched_queries"] += len(batch)
+                EMBEDDING_STATS["max_batch"] = max(EMBEDDING_STATS["max_batch"], len(batch))
+
+            for (_, future), vector in zip(batch, vectors):
+                future.set_result(vector)
+
+
+# ================= FACTORY =================
+
+def create_embeddings(backend=EMBEDDING_BACKEND, model_name=None, threads=EMBEDDING_THREADS,
+                      batching=EMBEDDING_BATCHING, batch_window_ms=EMBEDDING_BATCH_WINDOW_MS):
+    """
+    The embeddings object for ``backend``, wrapped in BatchingEmbeddings
+    when ``batching`` is set.
+    """
+    if backend == "huggingface":
+        from langchain_community.embeddings import HuggingFaceEmbeddings
+
+        from rag_engine import MODEL_NAME
+
+        if threads:
+            import torch
+
+            torch.set_num_threads(threads)
+        embeddings = HuggingFaceEmbeddings(model_name=model_name or MODEL_NAME)
+    elif backend in ONNX_FILES:
+        embeddings = OnnxEmbeddings(quantized=backend == "onnx-int8", threads=threads)
+    else:
+        raise ValueError(f"unknown embedding backend {backend!r} (huggingface, onnx, onnx-int8)")
+
+    if batching:
+        embeddings = BatchingEmbeddings(embeddings, window_ms=batch_window_ms)
+    return embeddings
+
+
+telemetry.register_collector(lambda: {f"rag.embeddings.{name}": value for name, value in EMBEDDING_STATS.items()})
+
+
+def main():
+    import argparse
+
+    parser = argparse.ArgumentParser(description="Export the embedding model for the ONNX backends")
+    parser.add_argument("command", choices=["export"])
+    parser.add_argument("--output", default=ONNX_MODEL_DIR)
+    parser.add_argument("--model", default=None)
+    parser.add_argument("--no-int8", action="store_true", help="skip the quantized copy")
+    args = parser.parse_args()
+
+    print(f"exported to {export_model(args.output, args.model, quantize=not args.no_int8)}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,689 @@
+import bisect
+import itertools
+import json
+import sqlite3
+import threading
+import time
+from collections import deque
+from datetime import datetime, timezone
+
+from event_model import Event, as_event, items_fields, to_epoch
+
+DEFAULT_MAX_AGE_SECONDS = 60
+SYNC_PAGE_SIZE = 2500
+# Recent changes (version, event ids) kept per calendar, so a prefill can
+# tell whether events changed under it while it fetched.
+CHANGE_LOG_SIZE = 64
+# Synced windows kept per calendar after merging overlapping and adjacent
+# ones; past this the least recently used window and its events go.
+MAX_WINDOWS = 32
+
+# Window bounds meaning "the whole calendar": synced without timeMin/timeMax.
+MIN_TS = -(2 ** 62)
+MAX_TS = 2 ** 62
+ALL_TIME = (MIN_TS, MAX_TS)
+
+
+# ================= EVENT TIMES =================
+
+def event_bounds(event, tz=None):
+    """
+    Returns (start_ts, end_ts) for a Calendar event resource.
+    All-day events use ``date`` instead of ``dateTime``.
+    """
+    if isinstance(event, Event):
+        return None if event.start is None else (event.start, event.end)
+
+    start = event.get("start", {})
+    end = event.get("end", {})
+
+    start_value = start.get("dateTime") or start.get("date")
+    end_value = end.get("dateTime") or end.get("date") or start_value
+
+    if not start_value:
+        return None
+
+    return to_epoch(start_value, tz), to_epoch(end_value, tz)
+
+
+# ================= STORE =================
+
+class SyncExpired(Exception):
+    """
+    Raised by a fetcher when the server rejects a sync token (HTTP 410).
+    """
+
+
+class _Window:
+    __slots__ = ("start", "end", "synced_at", "used_at")
+
+    def __init__(self, start, end, synced_at, used_at=0.0):
+        self.start = start
+        self.end = end
+        self.synced_at = synced_at
+        self.used_at = used_at
+
+    def covers(self, start, end):
+        return self.start <= start and end <= self.end
+
+
+class _CalendarState:
+    def __init__(self):
+        self.events = {}
+        self.index = []
+        self.max_duration = 0
+        # Sorted by start, never overlapping or touching.
+        self.windows = []
+        # One token for the whole calendar, issued no later than any window
+        # was listed, so a single incremental sync refreshes every window.
+        self.sync_token = None
+        self.token_at = 0.0
+        self.version = 0
+        self.changes = deque(maxlen=CHANGE_LOG_SIZE)
+        # Changes up to this version have fallen out of ``changes``.
+        self.changes_floor = 0
+
+
+class EventCache:
+    """
+    Local time-windowed store of Calendar events.
+
+    Queries that fall inside a synced window are answered from memory;
+    once the window is older than ``max_age`` it is brought up to date
+    before being served. Each calendar keeps one sync token covering all
+    of its windows: the API only issues tokens for unbounded listings, so
+    before the first time-bounded listing a token is fetched with a mask
+    that leaves the events out, and later refreshes are a single
+    incremental (``syncToken``) request whose changes are kept where they
+    fall inside a window. Without a token (or after HTTP 410) the window
+    is listed again in full.
+
+    Overlapping and adjacent windows are merged, and at most MAX_WINDOWS
+    are kept per calendar; evicting one drops the events no remaining
+    window overlaps.
+
+    ``fetch_page(calendar_id, params)`` performs one ``events().list`` call
+    and returns the raw response dict, raising SyncExpired on HTTP 410.
+    Requests carry an items_fields() mask and events are kept as
+    event_model.Event records.
+    """
+
+    def __init__(self, fetch_page, max_age=DEFAULT_MAX_AGE_SECONDS, db_path=None, tz=None):
+        self._fetch_page = fetch_page
+        self._max_age = max_age
+        self._tz = tz
+        self._lock = threading.RLock()
+        # Held while a calendar syncs over the network; self._lock only
+        # guards the in-memory state and is never held across a request.
+        self._sync_locks = {}
+        self._calendars = {}
+        self._versions = itertools.count(1)
+        self._listeners = []
+        self._db = None
+        # Bumped by invalidate() so an unlocked prefill can tell its
+        # fetched events are out of date.
+        self._generation = 0
+
+        self.stats = {
+            "hits": 0,
+            "misses": 0,
+            "incremental_syncs": 0,
+            "full_syncs": 0,
+            "expired_tokens": 0,
+            "token_fetches": 0,
+            "windows_evicted": 0,
+            "write_throughs": 0,
+            "prefills": 0,
+            "prefills_discarded": 0,
+            "stale_served": 0,
+            "last_staleness_seconds": 0.0,
+            "max_staleness_seconds": 0.0
+        }
+
+        if db_path:
+            self._open_db(db_path)
+
+    # ---------- public API ----------
+
+    def query(self, calendar_id, start_ts, end_ts, allow_stale=False):
+        """
+        Returns the events overlapping [start_ts, end_ts) ordered by start.
+        """
+        with self._calendar_lock(calendar_id):
+            self.ensure(calendar_id, start_ts, end_ts, allow_stale)
+            with self._lock:
+                return self._range(calendar_id, start_ts, end_ts)
+
+    def ensure(self, calendar_id, start_ts, end_ts, allow_stale=False, fill=True):
+        """
+        Makes sure [start_ts, end_ts) is synced and fresh without reading it.
+        With ``fill=False`` an uncovered range is left alone and False is
+        returned, so callers can choose a cheaper source for cold ranges.
+
+        Syncs hold only the calendar's own lock while they wait on the
+        network, so a slow calendar never holds up queries of another.
+        """
+        return self._ensure(calendar_id, start_ts, end_ts, allow_stale, fill, record=True)
+
+    def refresh(self, calendar_id, start_ts, end_ts, fill=True):
+        """
+        ensure() for callers that check data derived from the cache rather
+        than read events: hits, misses and staleness are left to the reads
+        that follow.
+        """
+        return self._ensure(calendar_id, start_ts, end_ts, False, fill, record=False)
+
+    def _ensure(self, calendar_id, start_ts, end_ts, allow_stale, fill, record):
+        with self._calendar_lock(calendar_id):
+            with self._lock:
+                window = self._covering_window(calendar_id, start_ts, end_ts)
+                if window is None and fill and record:
+                    self.stats["misses"] += 1
+
+            if window is None:
+                if not fill:
+                    return False
+                self._full_sync(calendar_id, start_ts, end_ts)
+                return True
+
+            now = time.time()
+            window.used_at = now
+            age = now - window.synced_at
+            if age > self._max_age and not allow_stale:
+                self._incremental_sync(calendar_id, window)
+                age = 0.0
+
+            if not record:
+                return True
+
+            with self._lock:
+                if age > self._max_age:
+                    self.stats["stale_served"] += 1
+                self.stats["hits"] += 1
+                self.stats["last_staleness_seconds"] = age
+                self.stats["max_staleness_seconds"] = max(
+                    self.stats["max_staleness_seconds"], age
+                )
+
+            return True
+
+    def prefill(self, calendar_id, start_ts, end_ts):
+        """
+        Syncs [start_ts, end_ts) the way a query miss would, but fetches
+        without holding the cache lock so queries are not kept waiting
+        behind it. Returns False, dropping what was fetched, when the
+        range got covered or the cache was invalidated in the meantime,
+        or when the calendar's version moved on because of a change (a
+        sync or write-through) to an event the batch holds or would
+        remove: it may predate that change and would undo it. Changes to
+        other events, like a neighbouring prefill, leave it valid. If the
+        calendar's sync token moved on meanwhile, the earlier token is kept
+        so the next refresh replays whatever the batch may have missed.
+        """
+        if self.is_covered(calendar_id, start_ts, end_ts):
+            return False
+        if (start_ts, end_ts) != ALL_TIME:
+            self._bootstrap_token(calendar_id)
+
+        with self._lock:
+            if self._covering_window(calendar_id, start_ts, end_ts) is not None:
+                return False
+            generation = self._generation
+            version = self._version(calendar_id)
+            state = self._calendars.get(calendar_id)
+            token, token_at = (state.sync_token, state.token_at) if state is not None else (None, 0.0)
+
+        synced_at = time.time()
+        items, sync_token = self._fetch_all(calendar_id, self._window_params(start_ts, end_ts))
+
+        with self._lock:
+            if generation != self._generation or self._covering_window(calendar_id, start_ts, end_ts) is not None:
+                self.stats["prefills_discarded"] += 1
+                return False
+            if version != self._version(calendar_id):
+                changed = self._changed_since(calendar_id, version)
+                touched = {item.get("id") for item in items}
+                touched.update(event.id for event in self._range(calendar_id, start_ts, end_ts))
+                if changed is None or changed & touched:
+                    self.stats["prefills_discarded"] += 1
+                    return False
+            self._adopt_token(calendar_id, token, token_at)
+            self._adopt_token(calendar_id, sync_token, synced_at)
+            self._add_window(calendar_id, start_ts, end_ts, items, synced_at)
+            self.stats["prefills"] += 1
+            return True
+
+    def snapshot(self, calendar_id):
+        """
+        Returns (version, [(start_ts, end_ts, event), ...]) for everything
+        cached for the calendar. The version changes whenever events do.
+        """
+        with self._lock:
+            state = self._calendars.get(calendar_id)
+            if state is None:
+                return 0, []
+            return state.version, [(event.start, event.end, event) for event in state.events.values()]
+
+    def subscribe(self, listener):
+        """
+        Registers an object with ``on_apply(calendar_id, events, removed_ids)``
+        and ``on_invalidate(calendar_id)`` (None for every calendar), called
+        under the cache lock whenever cached events change. Events already
+        cached are replayed to it first.
+        """
+        with self._lock:
+            for calendar_id, state in self._calendars.items():
+                listener.on_apply(calendar_id, list(state.events.values()), [])
+            self._listeners.append(listener)
+
+    def is_covered(self, calendar_id, start_ts, end_ts):
+        with self._lock:
+            return self._covering_window(calendar_id, start_ts, end_ts) is not None
+
+    def upsert(self, calendar_id, event):
+        """
+        Write-through for events created or updated by this process.
+        """
+        with self._lock:
+            self._apply(calendar_id, [event])
+            self.stats["write_throughs"] += 1
+
+    def invalidate(self, calendar_id=None):
+        with self._lock:
+            self._generation += 1
+            if calendar_id is None:
+                self._calendars.clear()
+            else:
+                self._calendars.pop(calendar_id, None)
+
+            for listener in self._listeners:
+                listener.on_invalidate(calendar_id)
+
+            if self._db is not None:
+                if calendar_id is None:
+                    self._db.execute("DELETE FROM events")
+                    self._db.execute("DELETE FROM windows")
+                else:
+                    self._db.execute("DELETE FROM events WHERE calendar_id = ?", (calendar_id,))
+                    self._db.execute("DELETE FROM windows WHERE calendar_id = ?", (calendar_id,))
+                self._db.commit()
+
+    def hit_rate(self):
+        total = self.stats["hits"] + self.stats["misses"]
+        return self.stats["hits"] / total if total else 0.0
+
+    # ---------- sync ----------
+
+    @staticmethod
+    def _window_params(start_ts, end_ts):
+        params = {
+            "singleEvents": True,
+            "maxResults": SYNC_PAGE_SIZE,
+            "fields": items_fields()
+        }
+        if start_ts > MIN_TS:
+            params["timeMin"] = datetime.fromtimestamp(start_ts, timezone.utc).isoformat()
+        if end_ts < MAX_TS:
+            params["timeMax"] = datetime.fromtimestamp(end_ts, timezone.utc).isoformat()
+        return params
+
+    # Called with the calendar's lock held and the cache lock released;
+    # only the bookkeeping after a fetch takes the cache lock.
+
+    def _full_sync(self, calendar_id, start_ts, end_ts):
+        if (start_ts, end_ts) != ALL_TIME:
+            self._bootstrap_token(calendar_id)
+
+        synced_at = time.time()
+        items, sync_token = self._fetch_all(calendar_id, self._window_params(start_ts, end_ts))
+
+        with self._lock:
+            self._adopt_token(calendar_id, sync_token, synced_at)
+            window = self._add_window(calendar_id, start_ts, end_ts, items, synced_at)
+            self.stats["full_syncs"] += 1
+            return window
+
+    def _bootstrap_token(self, calendar_id):
+        """
+        Gives the calendar a sync token before a time-bounded listing,
+        which never comes with one. The mask leaves the events out, so
+        paging through the unbounded listing costs a few small responses.
+        Taken under the calendar's lock so concurrent prefills share it.
+        """
+        with self._calendar_lock(calendar_id):
+            with self._lock:
+                if self._sync_token(calendar_id) is not None:
+                    return
+
+            issued_at = time.time()
+            params = {
+                "singleEvents": True,
+                "maxResults": SYNC_PAGE_SIZE,
+                "fields": "nextPageToken,nextSyncToken"
+            }
+            _, sync_token = self._fetch_all(calendar_id, params)
+
+            with self._lock:
+                self._adopt_token(calendar_id, sync_token, issued_at)
+                self.stats["token_fetches"] += 1
+
+    def _add_window(self, calendar_id, start_ts, end_ts, items, synced_at):
+        """
+        Stores a full listing of [start_ts, end_ts). It replaces what the
+        cache held for the range: cached events overlapping it that the
+        listing lacks were deleted on the server and are removed. The
+        window absorbs the windows it overlaps or touches.
+        """
+        state = self._state(calendar_id)
+        fresh = {item.get("id") for item in items}
+        gone = [event.id for event in self._range(calendar_id, start_ts, end_ts) if event.id not in fresh]
+        self._apply(calendar_id, list(items) + [{"id": event_id, "status": "cancelled"} for event_id in gone])
+
+        windows = state.windows
+        lo = bisect.bisect_left(windows, start_ts, key=lambda window: window.end)
+        hi = bisect.bisect_right(windows, end_ts, key=lambda window: window.start)
+        merged = windows[lo:hi]
+        # Windows inside the listing were just replaced by it; the others
+        # are only as fresh as their last sync.
+        partial = [other.synced_at for other in merged if not (start_ts <= other.start and other.end <= end_ts)]
+
+        window = _Window(
+            min([start_ts] + [other.start for other in merged]),
+            max([end_ts] + [other.end for other in merged]),
+            min([synced_at] + partial),
+            time.time()
+        )
+        windows[lo:hi] = [window]
+
+        if len(windows) > MAX_WINDOWS:
+            evicted = sorted(
+                (other for other in windows if other is not window),
+                key=lambda other: other.used_at
+            )[:len(windows) - MAX_WINDOWS]
+            self.stats["windows_evicted"] += len(evicted)
+            self._drop_windows(calendar_id, evicted)
+        else:
+            self._persist_windows(calendar_id)
+        return window
+
+    def _incremental_sync(self, calendar_id, window):
+        with self._lock:
+            token = self._sync_token(calendar_id)
+
+        if not token:
+            self._full_sync(calendar_id, window.start, window.end)
+            return
+
+        params = {
+            "syncToken": token,
+            "singleEvents": True,
+            "maxResults": SYNC_PAGE_SIZE,
+            "fields": items_fields()
+        }
+
+        synced_at = time.time()
+        try:
+            items, sync_token = self._fetch_all(calendar_id, params)
+        except SyncExpired:
+            with self._lock:
+                self.stats["expired_tokens"] += 1
+                # Nothing brings the other windows up to date any more.
+                state = self._state(calendar_id)
+                state.sync_token = None
+                self._drop_windows(calendar_id, [other for other in state.windows if other is not window])
+            self._full_sync(calendar_id, window.start, window.end)
+            return
+
+        with self._lock:
+            state = self._state(calendar_id)
+            if state.sync_token != token:
+                # Invalidated while the request was in flight.
+                return
+
+            self._apply(calendar_id, self._in_windows(state, items))
+            state.sync_token, state.token_at = sync_token, synced_at
+            for other in state.windows:
+                other.synced_at = synced_at
+            self._persist_windows(calendar_id)
+
+            self.stats["incremental_syncs"] += 1
+
+    def _fetch_all(self, calendar_id, params):
+        items = []
+        page_token = None
+
+        while True:
+            page_params = dict(params)
+            if page_token:
+                page_params["pageToken"] = page_token
+
+            response = self._fetch_page(calendar_id, page_params)
+            items.extend(response.get("items", []))
+
+            page_token = response.get("nextPageToken")
+            if not page_token:
+                return items, response.get("nextSyncToken")
+
+    # ---------- in-memory index ----------
+
+    def _calendar_lock(self, calendar_id):
+        with self._lock:
+            lock = self._sync_locks.get(calendar_id)
+            if lock is None:
+                lock = self._sync_locks[calendar_id] = threading.RLock()
+            return lock
+
+    def _state(self, calendar_id):
+        state = self._calendars.get(calendar_id)
+        if state is None:
+            state = self._calendars[calendar_id] = _CalendarState()
+        return state
+
+    def _covering_window(self, calendar_id, start_ts, end_ts):
+        state = self._calendars.get(calendar_id)
+        if state is None:
+            return None
+
+        position = bisect.bisect_right(state.windows, start_ts, key=lambda window: window.start) - 1
+        if position >= 0 and state.windows[position].covers(start_ts, end_ts):
+            return state.windows[position]
+        return None
+
+    @staticmethod
+    def _overlaps_window(state, start_ts, end_ts):
+        position = bisect.bisect_right(state.windows, start_ts, key=lambda window: window.end)
+        return position < len(state.windows) and state.windows[position].start < end_ts
+
+    def _in_windows(self, state, items):
+        """
+        The part of a calendar-wide change list the cache keeps: changes to
+        events inside a window, and removals of cached events that were
+        cancelled or moved out of every window.
+        """
+        kept = []
+        for item in items:
+            bounds = None if item.get("status") == "cancelled" else event_bounds(item, self._tz)
+            if bounds is None or self._overlaps_window(state, *bounds):
+                kept.append(item)
+            elif item.get("id") in state.events:
+                kept.append({"id": item["id"], "status": "cancelled"})
+        return kept
+
+    def _sync_token(self, calendar_id):
+        state = self._calendars.get(calendar_id)
+        return state.sync_token if state is not None else None
+
+    def _adopt_token(self, calendar_id, sync_token, issued_at):
+        """
+        Keeps the earliest token issued before a listing: replaying changes
+        a window already has is harmless, skipping ones it lacks is not.
+        """
+        state = self._state(calendar_id)
+        if sync_token and (state.sync_token is None or issued_at < state.token_at):
+            state.sync_token, state.token_at = sync_token, issued_at
+
+    def _version(self, calendar_id):
+        state = self._calendars.get(calendar_id)
+        return state.version if state is not None else 0
+
+    def _changed_since(self, calendar_id, version):
+        """
+        Ids of events changed after ``version``, or None when the change
+        log no longer reaches back that far.
+        """
+        state = self._calendars.get(calendar_id)
+        if state is None:
+            return set()
+        if version < state.changes_floor:
+            return None
+        return set().union(*(ids for changed_at, ids in state.changes if changed_at > version))
+
+    def _drop_windows(self, calendar_id, dropped):
+        """
+        Forgets windows and the cached events no remaining window overlaps.
+        """
+        state = self._state(calendar_id)
+        state.windows = [window for window in state.windows if window not in dropped]
+
+        orphans = {
+            event.id
+            for window in dropped
+            for event in self._range(calendar_id, window.start, window.end)
+            if not self._overlaps_window(state, event.start, event.end)
+        }
+        if orphans:
+            self._apply(calendar_id, [{"id": event_id, "status": "cancelled"} for event_id in orphans])
+        self._persist_windows(calendar_id)
+
+    def _apply(self, calendar_id, items, persist=True):
+        state = self._state(calendar_id)
+        # Versions come from one counter so they never repeat after invalidate().
+        # An empty incremental sync changes nothing and keeps the version.
+        if items:
+            state.version = next(self._versions)
+            if len(state.changes) == state.changes.maxlen:
+                state.changes_floor = state.changes[0][0]
+            state.changes.append((state.version, {item.get("id") for item in items}))
+        removed = []
+        stored = []
+
+        for item in items:
+            event_id = item.get("id")
+            if not event_id:
+                continue
+
+            previous = state.events.pop(event_id, None)
+            if previous is not None:
+                self._unindex(state, previous.start, event_id)
+
+            event = None if item.get("status") == "cancelled" else as_event(item, calendar_id, self._tz)
+            if event is None or event.start is None:
+                removed.append(event_id)
+                continue
+
+            state.events[event_id] = event
+            bisect.insort(state.index, (event.start, event_id))
+            state.max_duration = max(state.max_duration, event.end - event.start)
+            stored.append(event)
+
+        for listener in self._listeners:
+            listener.on_apply(calendar_id, stored, removed)
+
+        if persist and self._db is not None:
+            self._db.executemany(
+                "DELETE FROM events WHERE calendar_id = ? AND event_id = ?",
+                [(calendar_id, event_id) for event_id in removed]
+            )
+            self._db.executemany(
+                "INSERT OR REPLACE INTO events VALUES (?, ?, ?, ?, ?)",
+                [
+                    (calendar_id, event.id, event.start, event.end, json.dumps(event.to_dict()))
+                    for event in stored
+                ]
+            )
+            self._db.commit()
+
+    @staticmethod
+    def _unindex(state, start_ts, event_id):
+        position = bisect.bisect_left(state.index, (start_ts, event_id))
+        if position < len(state.index) and state.index[position] == (start_ts, event_id):
+            del state.index[position]
+
+    def _range(self, calendar_id, start_ts, end_ts):
+        state = self._calendars.get(calendar_id)
+        if state is None:
+            return []
+
+        # Anything starting before start_ts - max_duration has already ended.
+        lo = bisect.bisect_left(state.index, (start_ts - state.max_duration,))
+        hi = bisect.bisect_left(state.index, (end_ts,))
+
+        results = []
+        for _, event_id in state.index[lo:hi]:
+            event = state.events[event_id]
+            if event.end > start_ts:
+                results.append(event)
+        return results
+
+    # ---------- SQLite persistence ----------
+
+    def _open_db(self, db_path):
+        self._db = sqlite3.connect(db_path, check_same_thread=False)
+        self._db.execute(
+            "CREATE TABLE IF NOT EXISTS events ("
+            "calendar_id TEXT, event_id TEXT, start_ts INTEGER, end_ts INTEGER, body TEXT, "
+            "PRIMARY KEY (calendar_id, event_id))"
+        )
+        self._db.execute(
+            "CREATE TABLE IF NOT EXISTS windows ("
+            "calendar_id TEXT, start_ts INTEGER, end_ts INTEGER, sync_token TEXT, synced_at REAL, "
+            "PRIMARY KEY (calendar_id, start_ts, end_ts))"
+        )
+        self._db.commit()
+
+        rows = self._db.execute("SELECT calendar_id, body FROM events")
+        by_calendar = {}
+        for calendar_id, body in rows:
+            by_calendar.setdefault(calendar_id, []).append(json.loads(body))
+        for calendar_id, items in by_calendar.items():
+            self._apply(calendar_id, items, persist=False)
+
+        rows = {}
+        for calendar_id, start, end, token, synced_at in self._db.execute(
+            "SELECT calendar_id, start_ts, end_ts, sync_token, synced_at FROM windows ORDER BY start_ts"
+        ):
+            rows.setdefault(calendar_id, []).append((start, end, token, synced_at))
+
+        for calendar_id, windows in rows.items():
+            state = self._state(calendar_id)
+            # Every row carries the calendar's token; rows from before
+            # tokens were shared may disagree, and then none is trusted.
+            tokens = {token for _, _, token, _ in windows}
+            state.sync_token = tokens.pop() if len(tokens) == 1 else None
+            for start, end, _, synced_at in windows:
+                if state.windows and start <= state.windows[-1].end:
+                    last = state.windows[-1]
+                    last.end = max(last.end, end)
+                    last.synced_at = min(last.synced_at, synced_at)
+                else:
+                    state.windows.append(_Window(start, end, synced_at))
+
+    def _persist_windows(self, calendar_id):
+        if self._db is None:
+            return
+
+        state = self._state(calendar_id)
+        self._db.execute("DELETE FROM windows WHERE calendar_id = ?", (calendar_id,))
+        self._db.executemany(
+            "INSERT INTO windows VALUES (?, ?, ?, ?, ?)",
+            [
+                (calendar_id, window.start, window.end, state.sync_token, window.synced_at)
+                for window in state.windows
+            ]
+        )
+        self._db.commit()
+
+    def close(self):
+        if self._db is not None:
+            self._db.close()
+            self._db = None
@@ -0,0 +1,195 @@
+import sys
+from collections.abc import Mapping
+from datetime import datetime, timezone
+from functools import lru_cache
+from zoneinfo import ZoneInfo, ZoneInfoNotFoundError
+
+# What the tools, the caches and the agent read from an event. List and
+# sync requests ask the API for only these (see items_fields()).
+EVENT_FIELDS = (
+    "id,status,summary,description,location,start,end,transparency,"
+    "recurringEventId,attendees(email,displayName)"
+)
+
+
+def items_fields(extra=""):
+    """
+    A partial-response mask for events().list keeping EVENT_FIELDS (plus
+    ``extra``) and the paging and sync tokens.
+    """
+    fields = f"{EVENT_FIELDS},{extra}" if extra else EVENT_FIELDS
+    return f"nextPageToken,nextSyncToken,items({fields})"
+
+
+# ================= EVENT TIMES =================
+
+def to_epoch(value, tz=None):
+    """
+    Converts an RFC 3339 timestamp or a YYYY-MM-DD date to epoch seconds.
+    Naive values are interpreted in ``tz`` (UTC when not given).
+    """
+    dt = datetime.fromisoformat(value.replace("Z", "+00:00"))
+    if dt.tzinfo is None:
+        dt = dt.replace(tzinfo=tz or timezone.utc)
+    return int(dt.timestamp())
+
+
+@lru_cache(maxsize=64)
+def _zone(name):
+    try:
+        return ZoneInfo(name)
+    except (ZoneInfoNotFoundError, ValueError):
+        return timezone.utc
+
+
+def _intern(value):
+    return sys.intern(value) if value else None
+
+
+# ================= EVENT =================
+
+class Event(Mapping):
+    """
+    One calendar event as the assistant uses it: the fields in
+    EVENT_FIELDS, start and end as epoch seconds, and the calendar and
+    time zones as interned strings shared by every event. ``timezone``
+    is the event's own zone; ``display_timezone`` is the zone the
+    request asked for (``tz``), which start/end times are rendered in,
+    like the API does for a list with timeZone set.
+
+    It reads like the API resource (``event["start"]["dateTime"]``,
+    ``event.get("summary")``), rebuilding those dicts on access, so code
+    written against raw events keeps working; hot paths use the
+    attributes instead. to_dict() is the same resource as a plain dict
+    and full() fetches everything else (htmlLink, organizer, ...) from
+    the API.
+    """
+
+    __slots__ = (
+        "id", "calendar_id", "start", "end", "all_day", "timezone", "display_timezone", "status",
+        "summary", "description", "location", "transparency", "recurring_event_id", "attendees"
+    )
+
+    def __init__(self, id, start, end, calendar_id="primary", all_day=False, timezone="UTC", status=None,
+                 summary=None, description=None, location=None, transparency=None, recurring_event_id=None,
+                 attendees=(), display_timezone=None):
+        self.id = id
+        self.calendar_id = _intern(calendar_id)
+        self.start = start
+        self.end = end
+        self.all_day = all_day
+        self.timezone = _intern(timezone)
+        self.display_timezone = _intern(display_timezone or timezone)
+        self.status = _intern(status)
+        self.summary = summary
+        self.description = description
+        self.location = location
+        self.transparency = _intern(transparency)
+        self.recurring_event_id = recurring_event_id
+        self.attendees = attendees
+
+    @classmethod
+    def from_api(cls, item, calendar_id="primary", tz=None):
+        """
+        Builds an Event from an events resource (a dict, or any mapping
+        such as a recurrence.EventInstance). Events without a start
+        (cancellations in an incremental sync) get start and end None.
+        """
+        start = item.get("start") or {}
+        end = item.get("end") or {}
+        start_value = start.get("dateTime") or start.get("date")
+        end_value = end.get("dateTime") or end.get("date") or start_value
+        request_zone = getattr(tz, "key", None)
+
+        return cls(
+            item["id"],
+            to_epoch(start_value, tz) if start_value else None,
+            to_epoch(end_value, tz) if end_value else None,
+            calendar_id=calendar_id,
+            all_day="dateTime" not in start,
+            timezone=start.get("timeZone") or request_zone or "UTC",
+            status=item.get("status"),
+            summary=item.get("summary"),
+            description=item.get("description"),
+            location=item.get("location"),
+            transparency=item.get("transparency"),
+            recurring_event_id=item.get("recurringEventId"),
+            attendees=tuple(
+                (_intern(attendee.get("email")), attendee.get("displayName"))
+                for attendee in item.get("attendees", ())
+            ),
+            display_timezone=request_zone
+        )
+
+    # ---------- API-shaped view ----------
+
+    def _when(self, ts):
+        moment = datetime.fromtimestamp(ts, _zone(self.display_timezone))
+        if self.all_day:
+            return {"date": moment.date().isoformat()}
+        return {"dateTime": moment.isoformat(), "timeZone": self.timezone}
+
+    def __getitem__(self, key):
+        if key == "start" and self.start is not None:
+            return self._when(self.start)
+        if key == "end" and self.end is not None:
+            return self._when(self.end)
+        if key == "attendees" and self.attendees:
+            return [
+                {"email": email, "displayName": name} if name else {"email": email}
+                for email, name in self.attendees
+            ]
+
+        attribute = _API_KEYS.get(key)
+        value = getattr(self, attribute) if attribute else None
+        if value is None:
+            raise KeyError(key)
+        return value
+
+    def __iter__(self):
+        for key, attribute in _ALL_KEYS:
+            value = getattr(self, attribute)
+            if value is not None and value != ():
+                yield key
+
+    def __len__(self):
+        return sum(1 for _ in self)
+
+    def to_dict(self):
+        return {key: self[key] for key in self}
+
+    def full(self):
+        """
+        The complete resource from the API (one request).
+        """
+        from google_calendar_server import get_event
+
+        return get_event(self.id, calendar_id=self.calendar_id)
+
+    def __repr__(self):
+        start = None if self.start is None else self["start"].get("dateTime") or self["start"]["date"]
+        return f"Event(id={self.id!r}, summary={self.summary!r}, start={start!r})"
+
+
+# API key -> attribute for the plain fields; start, end and attendees are
+# rebuilt in __getitem__.
+_API_KEYS = {
+    "id": "id",
+    "calendarId": "calendar_id",
+    "status": "status",
+    "summary": "summary",
+    "description": "description",
+    "location": "location",
+    "transparency": "transparency",
+    "recurringEventId": "recurring_event_id",
+}
+_ALL_KEYS = tuple(_API_KEYS.items()) + (("start", "start"), ("end", "end"), ("attendees", "attendees"))
+
+
+def as_event(item, calendar_id="primary", tz=None):
+    """
+    ``item`` as an Event, converting API dicts and passing Events through.
+    """
+    if isinstance(item, Event):
+        return item
+    return Event.from_api(item, calendar_id, tz)
@@ -0,0 +1,201 @@
+import bisect
+import heapq
+import math
+import re
+import threading
+
+from event_cache import MAX_TS, MIN_TS, event_bounds
+
+TOKEN = re.compile(r"[^\W_]+")
+
+# A match in the title counts for more than one in the description.
+FIELD_WEIGHTS = {
+    "summary": 3.0,
+    "location": 1.5,
+    "attendees": 1.0,
+    "description": 1.0
+}
+PREFIX_MATCH_FACTOR = 0.8
+
+
+def tokenize(text):
+    return TOKEN.findall(text.lower()) if text else []
+
+
+def event_fields(event):
+    """
+    Searchable text per field. Attendees contribute names and email
+    addresses (which tokenize into user and domain parts).
+    """
+    attendees = " ".join(
+        f"{attendee.get('displayName', '')} {attendee.get('email', '')}"
+        for attendee in event.get("attendees", [])
+    )
+    return {
+        "summary": event.get("summary"),
+        "location": event.get("location"),
+        "attendees": attendees,
+        "description": event.get("description")
+    }
+
+
+class _Document:
+    __slots__ = ("start", "end", "event", "weights")
+
+    def __init__(self, start, end, event, weights):
+        self.start = start
+        self.end = end
+        self.event = event
+        self.weights = weights
+
+
+class EventSearchIndex:
+    """
+    In-memory inverted index over cached events.
+
+    Subscribe it to an EventCache and it follows every sync, write-through
+    and invalidation. Each query term matches tokens equal to it or
+    starting with it ("rev" finds "review"); all terms must match. Scores
+    sum field-weighted term frequency times idf, with prefix matches
+    discounted slightly against exact ones.
+    """
+
+    def __init__(self, tz=None):
+        self._tz = tz
+        self._lock = threading.Lock()
+        self._documents = {}
+        self._postings = {}
+        self._vocabulary = []
+        self.stats = {"searches": 0}
+
+    def __len__(self):
+        return len(self._documents)
+
+    # ---------- EventCache listener ----------
+
+    def on_apply(self, calendar_id, events, removed_ids):
+        with self._lock:
+            for event_id in removed_ids:
+                self._remove((calendar_id, event_id))
+            for event in events:
+                self._add(calendar_id, event)
+
+    def on_invalidate(self, calendar_id):
+        with self._lock:
+            if calendar_id is None:
+                self._documents.clear()
+                self._postings.clear()
+                self._vocabulary = []
+                return
+            for key in [key for key in self._documents if key[0] == calendar_id]:
+                self._remove(key)
+
+    # ---------- maintenance ----------
+
+    def _add(self, calendar_id, event):
+        key = (calendar_id, event["id"])
+        self._remove(key)
+
+        bounds = event_bounds(event, self._tz)
+        if bounds is None:
+            return
+
+        weights = {}
+        for field, text in event_fields(event).items():
+            for token in tokenize(text):
+                weights[token] = weights.get(token, 0.0) + FIELD_WEIGHTS[field]
+
+        self._documents[key] = _Document(bounds[0], bounds[1], event, weights)
+
+        for token, weight in weights.items():
+            postings = self._postings.get(token)
+            if postings is None:
+                postings = self._postings[token] = {}
+                bisect.insort(self._vocabulary, token)
+            postings[key] = weight
+
+    def _remove(self, key):
+        document = self._documents.pop(key, None)
+        if document is None:
+            return
+
+        for token in document.weights:
+            postings = self._postings[token]
+            del postings[key]
+            if not postings:
+                del self._postings[token]
+                position = bisect.bisect_left(self._vocabulary, token)
+                del self._vocabulary[position]
+
+    # ---------- queries ----------
+
+    def _expand(self, term):
+        """
+        Vocabulary tokens matched by ``term``: itself and its extensions.
+        """
+        position = bisect.bisect_left(self._vocabulary, term)
+        matches = []
+        while position < len(self._vocabulary) and self._vocabulary[position].startswith(term):
+            matches.append(self._vocabulary[position])
+            position += 1
+        return matches
+
+    def search(self, query, calendar_id=None, start_ts=None, end_ts=None, limit=None, order="relevance"):
+        """
+        Events matching every term of ``query``, optionally restricted to a
+        calendar and to events overlapping [start_ts, end_ts). ``order`` is
+        "relevance" (best first) or "start" (chronological).
+        """
+        terms = list(dict.fromkeys(tokenize(query)))
+        if not terms:
+            return []
+
+        start_ts = MIN_TS if start_ts is None else start_ts
+        end_ts = MAX_TS if end_ts is None else end_ts
+
+        with self._lock:
+            self.stats["searches"] += 1
+            total = len(self._documents)
+
+            # Per term: {key: best score among the tokens it matches}.
+            term_scores = []
+            for term in terms:
+                scores = {}
+                for token in self._expand(term):
+                    postings = self._postings[token]
+                    idf = math.log(1 + total / len(postings))
+                    factor = 1.0 if token == term else PREFIX_MATCH_FACTOR
+                    for key, weight in postings.items():
+                        score = weight * idf * factor
+                        if score > scores.get(key, 0.0):
+                            scores[key] = score
+                if not scores:
+                    return []
+                term_scores.append(scores)
+
+            term_scores.sort(key=len)
+            results = []
+            for key, score in term_scores[0].items():
+                if calendar_id is not None and key[0] != calendar_id:
+                    continue
+                document = self._documents[key]
+                if document.start >= end_ts or document.end <= start_ts:
+                    continue
+
+                for scores in term_scores[1:]:
+                    other = scores.get(key)
+                    if other is None:
+                        break
+                    score += other
+                else:
+                    results.append((score, document))
+
+        if order == "start":
+            results.sort(key=lambda item: (item[1].start, -item[0]))
+            results = results[:limit] if limit is not None else results
+        elif limit is not None:
+            results = heapq.nlargest(limit, results, key=lambda item: item[0])
+        else:
+            results.sort(key=lambda item: item[0], reverse=True)
+
+        return [document.event for _, document in results]
@@ -1,89 +1,374 @@
 import os
-import pickle
+import time
 from datetime import datetime
+from itertools import islice
 from zoneinfo import ZoneInfo
 
-from google_auth_oauthlib.flow import InstalledAppFlow
-from googleapiclient.discovery import build
-from google.auth.transport.requests import Request
+from googleapiclient.errors import HttpError
+
+import recurrence
+import telemetry
+from calendar_fanout import fan_out
+from calendar_service import SCOPES, get_service_manager, using_default_manager
+from availability import AvailabilityEngine, parse_freebusy
+from event_cache import ALL_TIME, EventCache, SyncExpired
+from event_model import Event, items_fields
+from event_search import EventSearchIndex
+from prefetcher import PREFETCH_ENABLED, WindowPrefetcher
+from request_scheduler import backoff_delay, get_scheduler, is_retriable
 
-SCOPES = ["https://www.googleapis.com/auth/calendar"]
 TIMEZONE = ZoneInfo("Asia/Kolkata")
+EVENT_CACHE_DB = os.environ.get("CALENDAR_CACHE_DB")
+SEARCH_INDEX_ENABLED = os.environ.get("CALENDAR_SEARCH_INDEX", "0") == "1"
+# Fetch recurring masters and expand them here instead of singleEvents=True.
+LOCAL_RECURRENCE = os.environ.get("CALENDAR_LOCAL_RECURRENCE", "0") == "1"
 
 
 # ================= AUTH =================
 
 def get_calendar_service():
-    creds = None
+    """
+    Returns the process-wide Calendar resource. Credentials are loaded and
+    discovery is parsed once; see calendar_service.CalendarServiceManager.
+    """
+    with telemetry.span("calendar.service"):
+        return get_service_manager().service()
+
+
+def _execute(request, cost=1, retry=True):
+    """
+    Every API call goes through the request scheduler: quota limiting,
+    retries with backoff, the circuit breaker and coalescing of identical
+    in-flight reads. See request_scheduler.RequestScheduler.
+    """
+    manager = get_service_manager()
+    # Per-account scheduler when one is set: Calendar quotas are per user,
+    # and coalescing must never hand one user's response to another.
+    scheduler = manager.get_scoped("scheduler") or get_scheduler()
+
+    with telemetry.span("calendar.http", method=getattr(request, "method", "BATCH"), cost=cost):
+        return scheduler.execute(request, manager.execute, cost=cost, retry=retry)
+
+
+# ================= EVENT CACHE =================
+
+def _fetch_events_page(calendar_id, params):
+    request = get_calendar_service().events().list(
+        calendarId=calendar_id,
+        timeZone="Asia/Kolkata",
+        **params
+    )
+
+    try:
+        return _execute(request)
+    except HttpError as exc:
+        if exc.resp.status == 410:
+            raise SyncExpired(str(exc)) from exc
+        raise
+
+
+def _new_event_cache():
+    # Only the process-wide account persists to CALENDAR_CACHE_DB;
+    # per-user caches in service mode stay in memory.
+    return EventCache(
+        _fetch_events_page,
+        db_path=EVENT_CACHE_DB if using_default_manager() else None,
+        tz=TIMEZONE
+    )
+
+
+def get_event_cache():
+    """
+    Returns the event cache of the current account. Set CALENDAR_CACHE_DB
+    to a file path to persist the process-wide one in SQLite across
+    restarts.
+    """
+    return get_service_manager().get_scoped("event_cache", _new_event_cache)
+
+
+# ================= PREFETCH =================
+
+def _spare_tokens():
+    scheduler = get_service_manager().get_scoped("scheduler") or get_scheduler()
+    return scheduler.limiter.available()
+
+
+def _new_prefetcher():
+    return WindowPrefetcher(get_event_cache(), tz=TIMEZONE, spare_tokens=_spare_tokens)
+
+
+def get_prefetcher():
+    """
+    Returns the current account's prefetcher: it follows the ranges
+    list_events is asked for and warms the event cache with the windows
+    likely to come next. CALENDAR_PREFETCH=0 turns it off.
+    """
+    return get_service_manager().get_scoped("prefetcher", _new_prefetcher)
+
+
+def observe_read(calendar_id, start_ts, end_ts):
+    """
+    Tells the prefetcher a list_events range is being read, whether from
+    the event cache or from an answer built on it.
+    """
+    if PREFETCH_ENABLED:
+        get_prefetcher().observe(calendar_id, start_ts, end_ts)
+
+
+# ================= SEARCH INDEX =================
+
+SEARCH_STATS = {"local": 0, "api": 0}
+
+
+def _new_search_index():
+    index = EventSearchIndex(tz=TIMEZONE)
+    get_event_cache().subscribe(index)
+    return index
+
+
+def get_search_index():
+    """
+    Returns the full-text index over the current account's event cache,
+    building it from the cached events on first use.
+    """
+    return get_service_manager().get_scoped("search_index", _new_search_index)
+
+
+def _local_search(keyword, calendar_id, start_ts, end_ts, limit, ranked):
+    """
+    Answers a search from the local index when the cache holds the whole
+    range, otherwise returns None. With CALENDAR_SEARCH_INDEX=1 a missing
+    range is synced first, so later searches stay local.
+    """
+    if not get_event_cache().ensure(calendar_id, start_ts, end_ts, fill=SEARCH_INDEX_ENABLED):
+        return None
+
+    SEARCH_STATS["local"] += 1
+    return get_search_index().search(
+        keyword,
+        calendar_id=calendar_id,
+        start_ts=start_ts,
+        end_ts=end_ts,
+        limit=limit,
+        order="relevance" if ranked else "start"
+    )
+
 
-    if os.path.exists("token.pickle"):
-        with open("token.pickle", "rb") as token:
-            creds = pickle.load(token)
+# ================= PAGINATION =================
 
-    if not creds or not creds.valid:
-        if creds and creds.expired and creds.refresh_token:
-            creds.refresh(Request())
-        else:
-            flow = InstalledAppFlow.from_client_secrets_file(
-                "credentials.json", SCOPES
-            )
+DEFAULT_PAGE_SIZE = 250
 
-            auth_url, _ = flow.authorization_url(prompt="consent")
 
-            print("\nAUTHORIZE THIS APP")
-            print(auth_url)
-            print("\nPaste the authorization code here:")
+def _with_page_token(fields):
+    """
+    Partial-response masks must keep nextPageToken or paging stops silently.
+    """
+    if fields and "nextPageToken" not in fields:
+        return f"nextPageToken,{fields}"
+    return fields
 
-            code = input("> ").strip()
-            flow.fetch_token(code=code)
-            creds = flow.credentials
 
-        with open("token.pickle", "wb") as token:
-            pickle.dump(creds, token)
+def _paginate(request, method="list"):
+    """
+    Yields events one page at a time, following nextPageToken. Nothing past
+    the current page is fetched until the consumer asks for it, so breaking
+    out of the loop stops the remaining requests.
+    """
+    next_page = getattr(get_calendar_service().events(), f"{method}_next")
 
-    return build("calendar", "v3", credentials=creds)
+    while request is not None:
+        response = _execute(request)
 
+        yield from response.get("items", [])
+
+        request = next_page(request, response)
+
+
+def _records(items, calendar_id):
+    return (Event.from_api(item, calendar_id, TIMEZONE) for item in items)
+
+
+def _list_request(start_date, end_date, page_size, fields, calendar_id, single_events=True):
+    start_dt = datetime.fromisoformat(start_date).replace(tzinfo=TIMEZONE)
+    end_dt = datetime.fromisoformat(end_date).replace(tzinfo=TIMEZONE)
+
+    params = {
+        "calendarId": calendar_id,
+        "timeMin": start_dt.isoformat(),
+        "timeMax": end_dt.isoformat(),
+        "singleEvents": single_events,
+        "timeZone": "Asia/Kolkata",
+        "maxResults": page_size,
+        "fields": _with_page_token(fields)
+    }
+    if single_events:
+        # The API only orders by start time once series are expanded.
+        params["orderBy"] = "startTime"
+
+    return get_calendar_service().events().list(**params)
+
+
+def stream_list_events(start_date: str, end_date: str, page_size: int = DEFAULT_PAGE_SIZE, fields: str = None,
+                       calendar_id: str = "primary"):
+    """
+    Yields event_model.Event records. Only EVENT_FIELDS are requested
+    unless ``fields`` gives another mask.
+    """
+    request = _list_request(start_date, end_date, page_size, fields or items_fields(), calendar_id)
+    return _records(_paginate(request), calendar_id)
+
+
+def stream_search_events(keyword: str, page_size: int = DEFAULT_PAGE_SIZE, fields: str = None,
+                         calendar_id: str = "primary", start_date: str = None, end_date: str = None):
+    params = {
+        "calendarId": calendar_id,
+        "q": keyword,
+        "singleEvents": True,
+        "orderBy": "startTime",
+        "maxResults": page_size,
+        "fields": _with_page_token(fields or items_fields())
+    }
+    if start_date:
+        params["timeMin"] = datetime.fromisoformat(start_date).replace(tzinfo=TIMEZONE).isoformat()
+    if end_date:
+        params["timeMax"] = datetime.fromisoformat(end_date).replace(tzinfo=TIMEZONE).isoformat()
+
+    return _records(_paginate(get_calendar_service().events().list(**params)), calendar_id)
+
+
+RECURRENCE_STATS = {"local_expansions": 0, "server_expanded": 0}
+
+
+def stream_expanded_events(start_date: str, end_date: str, page_size: int = DEFAULT_PAGE_SIZE,
+                           calendar_id: str = "primary"):
+    """
+    The same events as stream_list_events, but recurring series are
+    fetched once as masters and expanded locally, lazily and only inside
+    the window. Series whose rules dateutil rejects are expanded by the
+    server's instances endpoint instead.
+    """
+    start_dt = datetime.fromisoformat(start_date).replace(tzinfo=TIMEZONE)
+    end_dt = datetime.fromisoformat(end_date).replace(tzinfo=TIMEZONE)
+
+    def fetch_instances(master):
+        RECURRENCE_STATS["server_expanded"] += 1
+        return _paginate(get_calendar_service().events().instances(
+            calendarId=calendar_id,
+            eventId=master["id"],
+            timeMin=start_dt.isoformat(),
+            timeMax=end_dt.isoformat(),
+            timeZone="Asia/Kolkata",
+            maxResults=page_size,
+            fields=items_fields()
+        ), method="instances")
+
+    RECURRENCE_STATS["local_expansions"] += 1
+    masters = _list_request(start_date, end_date, page_size, items_fields("recurrence,originalStartTime"),
+                            calendar_id, single_events=False)
+    return _records(recurrence.expand_events(
+        _paginate(masters),
+        int(start_dt.timestamp()),
+        int(end_dt.timestamp()),
+        TIMEZONE,
+        fetch_instances=fetch_instances
+    ), calendar_id)
 
 
 # ================= MCP TOOLS =================
 
-def list_events(start_date: str, end_date: str):
-    service = get_calendar_service()
+def _fan_out_result(calendar_ids, fetch, limit=None):
+    merged, report = fan_out(calendar_ids, fetch, tz=TIMEZONE)
 
-    start = datetime.fromisoformat(start_date).replace(
-        tzinfo=TIMEZONE
-    ).isoformat()
+    if limit is not None:
+        merged = islice(merged, limit)
 
-    end = datetime.fromisoformat(end_date).replace(
-        tzinfo=TIMEZONE
-    ).isoformat()
+    return {"events": list(merged), "calendars": report}
 
-    events = service.events().list(
-        calendarId="primary",
-        timeMin=start,
-        timeMax=end,
-        singleEvents=True,
-        orderBy="startTime",
-        timeZone="Asia/Kolkata"
-    ).execute()
 
-    return events.get("items", [])
+@telemetry.traced("tool.list_events")
+def list_events(start_date: str, end_date: str, use_cache: bool = True, calendar_ids: list = None,
+                local_recurrence: bool = None):
+    """
+    Events between start_date and end_date on the primary calendar.
 
+    ``local_recurrence`` (default: CALENDAR_LOCAL_RECURRENCE) fetches
+    recurring masters and expands them here; see stream_expanded_events.
+    It bypasses the event cache, which stores server-expanded instances.
+    Cached reads feed the prefetcher (see get_prefetcher), so the next
+    window is often synced before it is asked for.
 
-def search_events(keyword: str):
-    service = get_calendar_service()
-    events = service.events().list(
-        calendarId="primary",
-        q=keyword,
-        singleEvents=True
-    ).execute()
+    With ``calendar_ids`` every listed calendar is fetched in parallel and
+    the result is {"events": [...], "calendars": {id: report}}: one
+    time-ordered list (each event tagged with its calendarId) plus
+    per-calendar status, count and timing. A failing or slow calendar is
+    reported there instead of failing the whole call.
+    """
+    start_dt = datetime.fromisoformat(start_date).replace(tzinfo=TIMEZONE)
+    end_dt = datetime.fromisoformat(end_date).replace(tzinfo=TIMEZONE)
+    if local_recurrence is None:
+        local_recurrence = LOCAL_RECURRENCE
 
-    return events.get("items", [])
+    def fetch(calendar_id):
+        if local_recurrence:
+            return stream_expanded_events(start_date, end_date, calendar_id=calendar_id)
+        if use_cache:
+            start_ts, end_ts = int(start_dt.timestamp()), int(end_dt.timestamp())
+            observe_read(calendar_id, start_ts, end_ts)
+            return get_event_cache().query(calendar_id, start_ts, end_ts)
+        return stream_list_events(start_date, end_date, calendar_id=calendar_id)
 
+    if calendar_ids is not None:
+        return _fan_out_result(calendar_ids, fetch)
 
-def create_event(title, date, start_time, end_time, description="", location=""):
-    service = get_calendar_service()
+    return list(fetch("primary"))
+
+
+@telemetry.traced("tool.search_events")
+def search_events(keyword: str, limit: int = None, calendar_ids: list = None,
+                  start_date: str = None, end_date: str = None, ranked: bool = False):
+    """
+    Events matching ``keyword``, optionally only those overlapping
+    start_date..end_date. ``calendar_ids`` fans the search out the same
+    way as list_events; ``limit`` then applies to the merged result.
+
+    Searches over ranges the event cache fully holds are answered from the
+    local full-text index (prefix and multi-term matching); everything else
+    goes to the API's ``q`` search. Results are chronological unless
+    ``ranked`` is set, which orders local results by relevance.
+    """
+    start_ts = _local_ts(start_date) if start_date else ALL_TIME[0]
+    end_ts = _local_ts(end_date) if end_date else ALL_TIME[1]
+
+    def fetch(calendar_id):
+        local = _local_search(keyword, calendar_id, start_ts, end_ts, limit, ranked and calendar_ids is None)
+        if local is not None:
+            return local
+
+        SEARCH_STATS["api"] += 1
+        events = stream_search_events(keyword, calendar_id=calendar_id, start_date=start_date, end_date=end_date)
+        if limit is not None:
+            # No calendar can contribute more than ``limit`` events.
+            events = islice(events, limit)
+        return events
 
+    if calendar_ids is not None:
+        return _fan_out_result(calendar_ids, fetch, limit)
+
+    return list(fetch("primary"))
+
+
+def get_event(event_id: str, calendar_id: str = "primary"):
+    """
+    The complete events resource, every field included.
+    """
+    return _execute(get_calendar_service().events().get(
+        calendarId=calendar_id,
+        eventId=event_id,
+        timeZone="Asia/Kolkata"
+    ))
+
+
+def _event_body(title, date, start_time, end_time, description="", location=""):
     start_dt = datetime.fromisoformat(
         f"{date}T{start_time}"
     ).replace(tzinfo=TIMEZONE)
@@ -92,7 +377,7 @@ def create_event(title, date, start_time, end_time, description="", location="")
         f"{date}T{end_time}"
     ).replace(tzinfo=TIMEZONE)
 
-    event = {
+    return {
         "summary": title,
         "description": description,
         "location": location,
@@ -106,14 +391,218 @@ def create_event(title, date, start_time, end_time, description="", location="")
         }
     }
 
-    created = service.events().insert(
-        calendarId="primary",
-        body=event
-    ).execute()
 
+def _record_write(created):
+    """
+    Keeps local state consistent with an event this process just wrote.
+    """
+    manager = get_service_manager()
+
+    cache = manager.get_scoped("event_cache")
+    if cache is not None:
+        cache.upsert("primary", created)
+
+    availability = manager.get_scoped("availability")
+    if availability is not None:
+        availability.invalidate_freebusy()
+
+
+def _created_result(created):
     return {
         "status": "created",
         "event_id": created.get("id"),
         "summary": created.get("summary")
     }
 
+
+@telemetry.traced("tool.create_event")
+def create_event(title, date, start_time, end_time, description="", location="", allow_conflicts=True):
+    service = get_calendar_service()
+
+    event = _event_body(title, date, start_time, end_time, description, location)
+
+    if not allow_conflicts:
+        conflicts = find_conflicts(date, start_time, end_time)
+        if conflicts:
+            return {
+                "status": "conflict",
+                "event_id": None,
+                "summary": title,
+                "conflicts": conflicts
+            }
+
+    created = _execute(service.events().insert(
+        calendarId="primary",
+        body=event
+    ))
+
+    _record_write(created)
+
+    return _created_result(created)
+
+
+# ================= BULK CREATE =================
+
+BATCH_LIMIT = 50
+BULK_MAX_RETRIES = 3
+BULK_RETRY_BASE_DELAY = 1.0
+
+
+@telemetry.traced("tool.create_events_bulk")
+def create_events_bulk(events, max_retries: int = BULK_MAX_RETRIES):
+    """
+    Creates many events using Calendar batch requests of up to 50 inserts.
+
+    ``events`` is a list of dicts with the create_event arguments. Returns
+    one result per input, in order, shaped like create_event's result;
+    failures carry status "failed" and an "error" message. Only items that
+    failed with a retriable status are resent, with jittered exponential
+    backoff. A batch is never resent as a whole, since some of its inserts
+    may already have been applied.
+    """
+    service = get_calendar_service()
+
+    bodies = [_event_body(**spec) for spec in events]
+    results = [None] * len(bodies)
+    errors = {}
+    pending = list(range(len(bodies)))
+
+    for attempt in range(max_retries + 1):
+        if attempt:
+            time.sleep(backoff_delay(attempt - 1, base=BULK_RETRY_BASE_DELAY))
+
+        for chunk_start in range(0, len(pending), BATCH_LIMIT):
+            chunk = pending[chunk_start:chunk_start + BATCH_LIMIT]
+
+            def callback(request_id, response, exception):
+                index = int(request_id)
+                if exception is None:
+                    results[index] = _created_result(response)
+                    errors.pop(index, None)
+                    _record_write(response)
+                else:
+                    errors[index] = exception
+
+            batch = service.new_batch_http_request(callback=callback)
+            for index in chunk:
+                batch.add(
+                    service.events().insert(calendarId="primary", body=bodies[index]),
+                    request_id=str(index)
+                )
+            _execute(batch, cost=len(chunk), retry=False)
+
+        pending = [index for index in sorted(errors) if is_retriable(errors[index])]
+        if not pending:
+            break
+
+    for index, exc in errors.items():
+        results[index] = {
+            "status": "failed",
+            "event_id": None,
+            "summary": bodies[index]["summary"],
+            "error": str(exc)
+        }
+
+    return results
+
+
+# ================= AVAILABILITY =================
+
+def _fetch_freebusy(calendar_id, start_ts, end_ts):
+    request = get_calendar_service().freebusy().query(body={
+        "timeMin": datetime.fromtimestamp(start_ts, TIMEZONE).isoformat(),
+        "timeMax": datetime.fromtimestamp(end_ts, TIMEZONE).isoformat(),
+        "timeZone": "Asia/Kolkata",
+        "items": [{"id": calendar_id}]
+    })
+    return parse_freebusy(_execute(request), calendar_id)
+
+
+def get_availability_engine():
+    return get_service_manager().get_scoped(
+        "availability",
+        lambda: AvailabilityEngine(get_event_cache(), _fetch_freebusy, tz=TIMEZONE)
+    )
+
+
+def _local_ts(date, time="00:00"):
+    return int(datetime.fromisoformat(f"{date}T{time}").replace(tzinfo=TIMEZONE).timestamp())
+
+
+def _slot_result(start_ts, end_ts):
+    return {
+        "start": datetime.fromtimestamp(start_ts, TIMEZONE).isoformat(),
+        "end": datetime.fromtimestamp(end_ts, TIMEZONE).isoformat()
+    }
+
+
+@telemetry.traced("tool.find_conflicts")
+def find_conflicts(date, start_time, end_time):
+    """
+    Events overlapping a proposed slot. When the range is not cached the
+    answer comes from freebusy, which only reports the busy blocks
+    themselves.
+    """
+    start_ts, end_ts = _local_ts(date, start_time), _local_ts(date, end_time)
+    conflicts = get_availability_engine().conflicts("primary", start_ts, end_ts)
+
+    return [
+        {"summary": "Busy", **_slot_result(*event)}
+        if isinstance(event, tuple)
+        else {
+            "event_id": event.get("id"),
+            "summary": event.get("summary"),
+            "start": event.get("start"),
+            "end": event.get("end")
+        }
+        for event in conflicts
+    ]
+
+
+@telemetry.traced("tool.check_availability")
+def check_availability(date, start_time, end_time):
+    start_ts, end_ts = _local_ts(date, start_time), _local_ts(date, end_time)
+    free = get_availability_engine().is_free("primary", start_ts, end_ts)
+    return {"free": free, **_slot_result(start_ts, end_ts)}
+
+
+@telemetry.traced("tool.find_free_slots")
+def find_free_slots(start_date, end_date, duration_minutes=60, count=3):
+    """
+    The next ``count`` free slots of ``duration_minutes`` between
+    start_date and end_date (end exclusive).
+    """
+    slots = get_availability_engine().free_slots(
+        "primary",
+        _local_ts(start_date),
+        _local_ts(end_date),
+        duration_minutes * 60,
+        count
+    )
+    return [_slot_result(start, end) for start, end in slots]
+
+
+# ================= METRICS =================
+
+def _collect_metrics():
+    metrics = {f"calendar.search.{source}": value for source, value in SEARCH_STATS.items()}
+    metrics.update((f"calendar.recurrence.{name}", value) for name, value in RECURRENCE_STATS.items())
+    metrics.update(
+        (f"calendar.scheduler.{name}", value)
+        for name, value in get_scheduler().stats.items()
+    )
+    cache = get_service_manager().get_scoped("event_cache")
+    if cache is not None:
+        metrics.update(
+            (f"calendar.event_cache.{name}", value)
+            for name, value in cache.stats.items()
+        )
+    prefetcher = get_service_manager().get_scoped("prefetcher")
+    if prefetcher is not None:
+        metrics.update((f"calendar.prefetch.{name}", value) for name, value in prefetcher.stats.items())
+        metrics["calendar.prefetch.hit_rate"] = prefetcher.hit_rate()
+        metrics["calendar.prefetch.accuracy"] = prefetcher.accuracy()
+    return metrics
+
+
+telemetry.register_collector(_collect_metrics)
@@ -0,0 +1,269 @@
+import re
+from datetime import date, timedelta
+
+from ttl_cache import TTLCache
+
+# ---------------- VOCABULARY ----------------
+
+CALENDAR_WORDS = frozenset({
+    "event", "events", "calendar", "calendars", "meeting", "meetings",
+    "schedule", "scheduled", "create"
+})
+LIST_WORDS = frozenset({"list", "show", "what"})
+SEARCH_WORDS = frozenset({"search", "find"})
+CREATE_WORDS = frozenset({"create", "schedule"})
+KNOWLEDGE_WORDS = frozenset({"what", "explain", "how"})
+HOW_TO_WORDS = frozenset({"explain", "how"})
+
+TITLE_TRIGGERS = frozenset({"called", "titled", "named"})
+FILLER_WORDS = frozenset({
+    "a", "an", "the", "my", "me", "on", "at", "from", "to", "in", "of",
+    "and", "for", "about", "with", "please", "called", "titled", "named",
+    "event", "events", "meeting", "meetings", "calendar"
+})
+
+MONTHS = (
+    "january", "february", "march", "april", "may", "june", "july",
+    "august", "september", "october", "november", "december"
+)
+MONTH_NUMBERS = {name: number for number, name in enumerate(MONTHS, start=1)}
+
+DEFAULT_SEARCH_KEYWORD = "Project"
+DEFAULT_TITLE = "Meeting"
+
+# Compiled once at import. WORDS feeds the token-set intent match;
+# SLOTS only matches the few multi-word spans (quotes, time ranges,
+# dates), so both scans run inside the regex engine.
+WORDS = re.compile(r"[a-z0-9]+")
+TOKENS = re.compile(r"[A-Za-z0-9][A-Za-z0-9'&-]*")
+PRODUCT_NAME = re.compile(r"\bcalendar\s+assistant\b")
+SLOTS = re.compile(
+    r"""
+    (?<![a-z0-9])(?=["'0-9jfmasondt])(?:
+      (?P<quoted>"(?P<dq>[^"]+)"|'(?P<sq>[^']+)')
+    | (?P<time_range>
+          \b(?P<sh>\d{1,2})(?::(?P<sm>\d{2}))?\s*(?P<sa>am|pm)
+          \s*(?:to|-|until|till)\s*
+          (?P<eh>\d{1,2})(?::(?P<em>\d{2}))?\s*(?P<ea>am|pm)\b)
+    | (?P<month_day>\b(?P<month>""" + "|".join(MONTHS) + r""")\b
+          (?:\s+(?P<day>\d{1,2})(?:st|nd|rd|th)?\b)?)
+    | (?P<relative>\b(?:today|tomorrow|(?:this|next)\s+(?:week|month))\b)
+    )""",
+    re.IGNORECASE | re.VERBOSE
+)
+
+# Words that can start a SLOTS match; queries without any of them (and
+# without digits or quotes) skip the slot scan entirely.
+SLOT_HINTS = frozenset(MONTHS) | frozenset({"today", "tomorrow", "this", "next"})
+
+CAPTURE_TRIGGERS = TITLE_TRIGGERS | SEARCH_WORDS
+CAPTURE_STOPS = FILLER_WORDS | SEARCH_WORDS | frozenset(MONTHS) | frozenset({
+    "am", "pm", "today", "tomorrow", "this", "next"
+})
+
+
+# ---------------- SLOT HELPERS ----------------
+
+def _clock(hour, minute, meridiem):
+    hour = int(hour) % 12 + (12 if meridiem.lower() == "pm" else 0)
+    return f"{hour:02d}:{int(minute or 0):02d}"
+
+
+def _month_range(year, month):
+    start = date(year, month, 1)
+    end = date(year + (month == 12), month % 12 + 1, 1)
+    return start, end
+
+
+def named_date(month, day, today):
+    """
+    The next ``month``/``day`` on or after ``today``, for dates named
+    without a year ("January 21st"). None when there is no such day
+    ("February 30"); February 29 waits for the next leap year.
+    """
+    for year in range(today.year, today.year + 9):
+        try:
+            candidate = date(year, month, day)
+        except ValueError:
+            continue
+        if candidate >= today:
+            return candidate
+    return None
+
+
+def relative_range(phrase, today):
+    """
+    Maps "today", "tomorrow", "this/next week" and "this/next month" to a
+    [start, end) date pair relative to ``today``. Weeks start on Monday.
+    """
+    phrase = " ".join(phrase.lower().split())
+
+    if phrase == "today":
+        return today, today + timedelta(days=1)
+    if phrase == "tomorrow":
+        return today + timedelta(days=1), today + timedelta(days=2)
+
+    if phrase.endswith("week"):
+        monday = today - timedelta(days=today.weekday())
+        if phrase.startswith("next"):
+            monday += timedelta(days=7)
+        return monday, monday + timedelta(days=7)
+
+    start, end = _month_range(today.year, today.month)
+    if phrase.startswith("next"):
+        start, end = _month_range(end.year, end.month)
+    return start, end
+
+
+def default_list_range(today=None):
+    """
+    (start_date, end_date) for a list request that names no dates: the
+    current month, end exclusive, worked out when the request is made.
+    """
+    start, end = relative_range("this month", today or date.today())
+    return start.isoformat(), end.isoformat()
+
+
+# ---------------- ROUTER ----------------
+
+_ROUTE_CACHE = TTLCache(maxsize=4096)
+
+
+def route(user_query: str, today: date = None):
+    """
+    Classifies a query and extracts its slots.
+
+    Returns {"intent": "list" | "search" | "create" | "knowledge" | None,
+    "slots": {...}}. Slots that were not mentioned are None: ``date``
+    (YYYY-MM-DD), ``start_date``/``end_date`` (list range, end exclusive),
+    ``start_time``/``end_time`` (HH:MM), ``keyword`` and ``title``.
+    Dates and months named without a year are resolved against
+    ``today`` (default: the current date) to their next occurrence.
+    Words are matched as whole tokens, so "whatever" is not "what".
+    Repeated queries are answered from a small LRU of earlier routes.
+    """
+    key = (user_query, today or date.today())
+    cached = _ROUTE_CACHE.get(key)
+    if cached is not None:
+        return {"intent": cached["intent"], "slots": dict(cached["slots"])}
+
+    routed = _route(user_query, key[1])
+    _ROUTE_CACHE.put(key, routed)
+    return {"intent": routed["intent"], "slots": dict(routed["slots"])}
+
+
+def _route(user_query, today):
+    slots = {
+        "date": None,
+        "start_date": None,
+        "end_date": None,
+        "start_time": None,
+        "end_time": None,
+        "keyword": None,
+        "title": None
+    }
+
+    lowered = user_query.lower()
+    words = set(WORDS.findall(lowered))
+
+    if "calendar" in words and PRODUCT_NAME.search(lowered):
+        # "the Agentic Calendar Assistant" is a name, not a calendar request.
+        words = set(WORDS.findall(PRODUCT_NAME.sub(" ", lowered)))
+
+    has_slots = (
+        words & SLOT_HINTS
+        or '"' in user_query
+        or user_query.count("'") > 1
+        or any(word[0].isdigit() for word in words)
+    )
+
+    for match in SLOTS.finditer(user_query) if has_slots else ():
+        kind = match.lastgroup
+
+        if kind == "quoted":
+            text = match.group("dq") or match.group("sq")
+            slots["title"] = slots["title"] or text
+            slots["keyword"] = slots["keyword"] or text
+
+        elif kind == "time_range":
+            slots["start_time"] = _clock(match.group("sh"), match.group("sm"), match.group("sa"))
+            slots["end_time"] = _clock(match.group("eh"), match.group("em"), match.group("ea"))
+
+        elif kind == "month_day":
+            month = MONTH_NUMBERS[match.group("month").lower()]
+            day = match.group("day")
+            if day:
+                day_date = named_date(month, int(day), today)
+                if day_date is None:
+                    # "february 30": the date slot stays empty
+                    continue
+                slots["date"] = day_date.isoformat()
+                slots["start_date"] = day_date.isoformat()
+                slots["end_date"] = (day_date + timedelta(days=1)).isoformat()
+            else:
+                # A month on its own is this year's, or next year's once it is over.
+                start, end = _month_range(today.year + (month < today.month), month)
+                slots["start_date"], slots["end_date"] = start.isoformat(), end.isoformat()
+
+        elif kind == "relative":
+            start, end = relative_range(match.group("relative"), today)
+            slots["start_date"], slots["end_date"] = start.isoformat(), end.isoformat()
+            if end - start == timedelta(days=1):
+                slots["date"] = start.isoformat()
+
+    if words & CAPTURE_TRIGGERS:
+        _capture_phrases(TOKENS.findall(user_query), slots)
+
+    first = WORDS.search(lowered)
+    first_word = first.group() if first else None
+
+    return {"intent": _classify(words, first_word), "slots": slots}
+
+
+def _capture_phrases(tokens, slots):
+    """
+    Fills ``title`` from the words after "called"/"titled"/"named" and
+    ``keyword`` from the words after "search"/"find", skipping leading
+    filler ("find the design review meeting" -> "design review").
+    """
+    capture = None
+    captured = []
+
+    for token in tokens:
+        word = token.lower()
+
+        if capture:
+            if word in CAPTURE_STOPS:
+                if captured:
+                    slots[capture] = slots[capture] or " ".join(captured)
+                    capture = None
+                continue
+            captured.append(token)
+            continue
+
+        if word in TITLE_TRIGGERS:
+            capture, captured = "title", []
+        elif word in SEARCH_WORDS:
+            capture, captured = "keyword", []
+
+    if capture and captured:
+        slots[capture] = slots[capture] or " ".join(captured)
+
+
+def _classify(words, first_word):
+    # "How do I create ...?" / "Explain ..." are questions about the assistant.
+    if first_word in HOW_TO_WORDS:
+        return "knowledge"
+
+    if words & CALENDAR_WORDS:
+        if words & LIST_WORDS:
+            return "list"
+        if words & SEARCH_WORDS:
+            return "search"
+        if words & CREATE_WORDS:
+            return "create"
+
+    if words & KNOWLEDGE_WORDS:
+        return "knowledge"
+
+    return None
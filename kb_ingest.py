@@ -0,0 +1,370 @@
+import hashlib
+import json
+import os
+import pickle
+import resource
+import shutil
+import tempfile
+import time
+
+import ann_index
+
+INDEX_FILE = "index.faiss"
+DOCSTORE_FILE = "index.pkl"
+MANIFEST_FILE = "manifest.json"
+
+DOCUMENT_EXTENSIONS = (".txt", ".md")
+EMBED_BATCH_SIZE = int(os.environ.get("RAG_EMBED_BATCH_SIZE", "64"))
+# Saved index versions kept next to the index symlink (at least 2, so a
+# concurrent builder's version is never removed before it is installed).
+INDEX_KEEP_VERSIONS = max(int(os.environ.get("RAG_INDEX_KEEP_VERSIONS", "2")), 2)
+
+DEFAULT_INDEX_SPEC = {
+    "index_type": "flat",
+    "storage": "float32",
+    "nlist": 0,
+    "hnsw_m": 32,
+    "pq_m": 16
+}
+
+
+# ---------------- SOURCE FILES ----------------
+
+def discover_documents(source):
+    """
+    Returns {relative_path: absolute_path} for a file or every text/markdown
+    file below a directory.
+    """
+    source = os.path.abspath(source)
+
+    if os.path.isfile(source):
+        return {os.path.basename(source): source}
+
+    found = {}
+    for root, _, files in os.walk(source):
+        for name in sorted(files):
+            if name.endswith(DOCUMENT_EXTENSIONS):
+                path = os.path.join(root, name)
+                found[os.path.relpath(path, source)] = path
+    return found
+
+
+def file_sha256(path):
+    digest = hashlib.sha256()
+    with open(path, "rb") as handle:
+        for block in iter(lambda: handle.read(1 << 16), b""):
+            digest.update(block)
+    return digest.hexdigest()
+
+
+def _file_entry(path, previous):
+    """
+    Size/mtime are checked first so unchanged files are not re-hashed.
+    """
+    stat = os.stat(path)
+
+    if previous and previous["size"] == stat.st_size and previous["mtime"] == stat.st_mtime:
+        return dict(previous)
+
+    sha256 = file_sha256(path)
+    unchanged = previous and previous["sha256"] == sha256
+
+    return {
+        "sha256": sha256,
+        "size": stat.st_size,
+        "mtime": stat.st_mtime,
+        "chunk_ids": list(previous["chunk_ids"]) if unchanged else []
+    }
+
+
+# ---------------- MANIFEST + PERSISTENCE ----------------
+
+def read_manifest(index_dir):
+    path = os.path.join(index_dir, MANIFEST_FILE)
+    if not os.path.exists(path):
+        return None
+    with open(path) as manifest:
+        return json.load(manifest)
+
+
+def write_manifest(manifest, index_dir):
+    path = os.path.join(index_dir, MANIFEST_FILE)
+    temp = f"{path}.{os.getpid()}.tmp"
+    with open(temp, "w") as out:
+        json.dump(manifest, out)
+    os.replace(temp, path)
+
+
+def installed_version(index_dir):
+    """
+    Name of the version directory ``index_dir`` points at. Every save
+    installs a new one, so a different name means the index was rebuilt.
+    """
+    return os.path.basename(os.path.realpath(index_dir))
+
+
+def save_vector_store(store, manifest, index_dir):
+    """
+    Writes the index, chunk metadata and manifest to a new version
+    directory next to ``index_dir``, then atomically repoints the
+    ``index_dir`` symlink at it. Readers see the old or the new index,
+    never a partial or missing one, and concurrent builders each write
+    their own version (the last swap wins). Versions beyond
+    INDEX_KEEP_VERSIONS are removed afterwards. Returns the new
+    version's path.
+    """
+    import faiss
+
+    index_dir = os.path.abspath(index_dir)
+    parent, name = os.path.split(index_dir)
+    os.makedirs(parent, exist_ok=True)
+    staging = tempfile.mkdtemp(prefix=f".{name}-staging-", dir=parent)
+
+    faiss.write_index(store.index, os.path.join(staging, INDEX_FILE))
+
+    with open(os.path.join(staging, DOCSTORE_FILE), "wb") as meta:
+        pickle.dump((store.docstore, store.index_to_docstore_id), meta)
+
+    with open(os.path.join(staging, MANIFEST_FILE), "w") as out:
+        json.dump(dict(manifest, vectors=store.index.ntotal), out)
+
+    version = os.path.join(parent, f".{name}-v{time.time_ns():020d}-{os.getpid()}")
+    os.rename(staging, version)
+
+    link = version + ".link"
+    os.symlink(os.path.basename(version), link)
+    if os.path.isdir(index_dir) and not os.path.islink(index_dir):
+        # An index saved before versioning is a plain directory, which a
+        # symlink cannot replace atomically: move it aside as the oldest
+        # version first.
+        try:
+            os.rename(index_dir, os.path.join(parent, f".{name}-v{0:020d}-{os.getpid()}"))
+        except FileNotFoundError:
+            pass
+    os.replace(link, index_dir)
+
+    _remove_old_versions(index_dir)
+    return version
+
+
+def _remove_old_versions(index_dir, keep=INDEX_KEEP_VERSIONS):
+    parent, name = os.path.split(index_dir)
+    current = os.path.basename(os.path.realpath(index_dir))
+    versions = sorted(
+        entry for entry in os.listdir(parent)
+        if entry.startswith(f".{name}-v") and not entry.endswith(".link") and entry != current
+    )
+    # Readers that memory-mapped a removed version keep their mapping.
+    for entry in versions[:max(len(versions) - (keep - 1), 0)]:
+        shutil.rmtree(os.path.join(parent, entry), ignore_errors=True)
+
+
+def load_vector_store(embeddings, index_dir, writable=False):
+    """
+    Loads a saved store. Read-only loads are memory-mapped where FAISS
+    supports it; ``writable`` loads copy the index into memory so vectors
+    can be added or removed.
+    """
+    import faiss
+    from langchain_community.vectorstores import FAISS
+
+    # Resolve the symlink once so every file comes from the same version.
+    index_dir = os.path.realpath(index_dir)
+    path = os.path.join(index_dir, INDEX_FILE)
+
+    if writable:
+        index = faiss.read_index(path)
+    else:
+        try:
+            index = faiss.read_index(path, faiss.IO_FLAG_MMAP)
+        except RuntimeError:
+            # Not every index type can be memory-mapped.
+            index = faiss.read_index(path)
+
+    with open(os.path.join(index_dir, DOCSTORE_FILE), "rb") as meta:
+        docstore, index_to_docstore_id = pickle.load(meta)
+
+    return FAISS(
+        embedding_function=embeddings,
+        index=index,
+        docstore=docstore,
+        index_to_docstore_id=index_to_docstore_id
+    )
+
+
+def empty_vector_store(embeddings, index):
+    from langchain_community.docstore.in_memory import InMemoryDocstore
+    from langchain_community.vectorstores import FAISS
+
+    return FAISS(
+        embedding_function=embeddings,
+        index=index,
+        docstore=InMemoryDocstore(),
+        index_to_docstore_id={}
+    )
+
+
+# ---------------- INGESTION ----------------
+
+def _peak_rss_mb():
+    return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024
+
+
+def _embedded_batches(embeddings, paths, files, settings, batch_size):
+    """
+    Streams files through the splitter and yields
+    (texts, metadatas, ids, vectors) batches of at most ``batch_size``
+    chunks, so only one batch of vectors is in memory at a time.
+    Records each file's chunk ids in ``files`` as it goes.
+    """
+    import numpy as np
+    from langchain_text_splitters import RecursiveCharacterTextSplitter
+
+    splitter = RecursiveCharacterTextSplitter(
+        chunk_size=settings["chunk_size"],
+        chunk_overlap=settings["chunk_overlap"]
+    )
+
+    pending = []
+
+    def flush():
+        texts = [text for text, _, _ in pending]
+        vectors = np.asarray(embeddings.embed_documents(texts), dtype="float32")
+        batch = (texts, [meta for _, meta, _ in pending], [cid for _, _, cid in pending], vectors)
+        pending.clear()
+        return batch
+
+    for rel, path in paths.items():
+        with open(path, encoding="utf-8") as handle:
+            text = handle.read()
+
+        chunk_ids = []
+        for position, chunk in enumerate(splitter.split_text(text)):
+            chunk_id = f"{rel}#{position}"
+            chunk_ids.append(chunk_id)
+            pending.append((chunk, {"source": rel}, chunk_id))
+            if len(pending) >= batch_size:
+                yield flush()
+
+        files[rel]["chunk_ids"] = chunk_ids
+
+    if pending:
+        yield flush()
+
+
+def ingest(embeddings, source, index_dir, settings, batch_size=EMBED_BATCH_SIZE):
+    """
+    Brings the saved index in ``index_dir`` up to date with ``source``.
+
+    Files are compared with the manifest by size/mtime and SHA-256; only
+    added or changed files are split and embedded, and chunks of changed or
+    deleted files are removed by id. Different ``settings`` (model, chunk
+    size, ...) force a full rebuild. Returns (store, report).
+    """
+    import numpy as np
+
+    started = time.perf_counter()
+    documents = discover_documents(source)
+    # The version that is current now; a concurrent save may repoint
+    # ``index_dir`` while this runs.
+    current = os.path.realpath(index_dir)
+    manifest = read_manifest(current)
+
+    spec = settings.get("index", DEFAULT_INDEX_SPEC)
+
+    if manifest is None or manifest.get("settings") != settings:
+        manifest = {"settings": settings, "files": {}}
+        previous_files = {}
+    else:
+        previous_files = manifest["files"]
+
+    files = {rel: _file_entry(path, previous_files.get(rel)) for rel, path in documents.items()}
+
+    added = [rel for rel in files if rel not in previous_files]
+    changed = [
+        rel for rel in files
+        if rel in previous_files and files[rel]["sha256"] != previous_files[rel]["sha256"]
+    ]
+    removed = [rel for rel in previous_files if rel not in files]
+
+    full_rebuild = not previous_files
+    if previous_files and (added or changed or removed) and not ann_index.supports_incremental(spec):
+        # This index type cannot drop vectors by id: re-embed everything.
+        previous_files = {}
+        added, changed, removed = list(files), [], []
+        full_rebuild = True
+
+    report = {
+        "files_total": len(files),
+        "files_added": len(added),
+        "files_changed": len(changed),
+        "files_removed": len(removed),
+        "chunks_added": 0,
+        "chunks_removed": 0,
+        "seconds": 0.0,
+        "chunks_per_sec": 0.0,
+        "peak_rss_mb": 0.0,
+        "full_rebuild": full_rebuild,
+        "index_version": installed_version(current),
+        "index_type": spec["index_type"],
+        "storage": spec["storage"]
+    }
+
+    up_to_date = not (added or changed or removed) and os.path.exists(os.path.join(current, INDEX_FILE))
+    if up_to_date:
+        if files != previous_files:
+            # Only size/mtime moved; remember them so the next start skips hashing.
+            manifest["files"] = files
+            write_manifest(manifest, current)
+        report["seconds"] = time.perf_counter() - started
+        report["peak_rss_mb"] = _peak_rss_mb()
+        return load_vector_store(embeddings, current), report
+
+    if previous_files:
+        store = load_vector_store(embeddings, current, writable=True)
+    else:
+        store = None
+
+    stale_ids = [cid for rel in changed + removed for cid in previous_files[rel]["chunk_ids"]]
+    if stale_ids:
+        store.delete(ids=stale_ids)
+        report["chunks_removed"] = len(stale_ids)
+
+    batches = _embedded_batches(
+        embeddings,
+        {rel: documents[rel] for rel in added + changed},
+        files,
+        settings,
+        batch_size
+    )
+
+    if store is None and ann_index.needs_training(spec):
+        # IVF/PQ/int8 codes must be trained before anything is added,
+        # so the first build embeds everything up front.
+        batches = list(batches)
+        if batches:
+            index = ann_index.build_index(spec, np.vstack([vectors for *_, vectors in batches]))
+            store = empty_vector_store(embeddings, index)
+
+    for texts, metadatas, ids, vectors in batches:
+        if store is None:
+            store = empty_vector_store(embeddings, ann_index.build_index(spec, vectors))
+
+        store.add_embeddings(zip(texts, vectors), metadatas=metadatas, ids=ids)
+        report["chunks_added"] += len(ids)
+
+    if store is None:
+        # An empty or missing knowledge base: save an empty index of the
+        # configured type so queries find nothing instead of failing.
+        dimension = len(embeddings.embed_query("dimension probe"))
+        store = empty_vector_store(embeddings, ann_index.empty_index(spec, dimension))
+
+    manifest["files"] = files
+    report["index_version"] = installed_version(save_vector_store(store, manifest, index_dir))
+
+    elapsed = time.perf_counter() - started
+    report["seconds"] = elapsed
+    report["chunks_per_sec"] = report["chunks_added"] / elapsed if elapsed else 0.0
+    report["peak_rss_mb"] = _peak_rss_mb()
+
+    return store, report
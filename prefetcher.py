@@ -0,0 +1,302 @@
+import contextvars
+import os
+import threading
+import time
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, timezone
+
+PREFETCH_ENABLED = os.environ.get("CALENDAR_PREFETCH", "1") == "1"
+PREFETCH_WORKERS = int(os.environ.get("CALENDAR_PREFETCH_WORKERS", "2"))
+# Prefetched windows that are in flight or not used yet, per account. No
+# new prefetch starts while the budget is spent.
+PREFETCH_BUDGET = int(os.environ.get("CALENDAR_PREFETCH_BUDGET", "4"))
+PREFETCH_PER_QUERY = int(os.environ.get("CALENDAR_PREFETCH_PER_QUERY", "2"))
+# An unused prefetched window counts as wasted after this long.
+PREFETCH_TTL_SECONDS = float(os.environ.get("CALENDAR_PREFETCH_TTL", "300"))
+# Longer windows (a whole year) are not worth guessing at.
+PREFETCH_MAX_DAYS = int(os.environ.get("CALENDAR_PREFETCH_MAX_DAYS", "62"))
+# Prefetching pauses while fewer quota tokens than this are left, so it
+# never makes a foreground request wait.
+PREFETCH_MIN_SPARE_TOKENS = float(os.environ.get("CALENDAR_PREFETCH_MIN_SPARE", "5"))
+# How long a query waits for an in-flight prefetch of its window before
+# fetching it itself.
+PREFETCH_WAIT_SECONDS = 10.0
+HISTORY_SIZE = 4
+
+_EXECUTOR = None
+
+
+# ---------------- EXECUTOR ----------------
+
+def get_executor():
+    """
+    Small pool shared by every account's prefetcher, so background
+    fetches never take more than PREFETCH_WORKERS connections.
+    """
+    global _EXECUTOR
+
+    if _EXECUTOR is None:
+        _EXECUTOR = ThreadPoolExecutor(
+            max_workers=PREFETCH_WORKERS,
+            thread_name_prefix="calendar-prefetch"
+        )
+    return _EXECUTOR
+
+
+def shutdown_executor():
+    global _EXECUTOR
+
+    if _EXECUTOR is not None:
+        _EXECUTOR.shutdown(wait=True)
+        _EXECUTOR = None
+
+
+# ---------------- WINDOWS ----------------
+
+def _month_start(moment, months=0):
+    index = moment.year * 12 + moment.month - 1 + months
+    return moment.replace(year=index // 12, month=index % 12 + 1, day=1, hour=0, minute=0, second=0, microsecond=0)
+
+
+def _local(ts, tz):
+    return datetime.fromtimestamp(ts, tz or timezone.utc)
+
+
+def is_month(start_ts, end_ts, tz=None):
+    """
+    Whether [start_ts, end_ts) is exactly one calendar month in ``tz``.
+    """
+    start = _local(start_ts, tz)
+    return start == _month_start(start) and _local(end_ts, tz) == _month_start(start, 1)
+
+
+def window_after(start_ts, end_ts, tz=None):
+    """
+    The window of the same shape right after this one: the next calendar
+    month for a month, else the same length starting at ``end_ts``.
+    """
+    if is_month(start_ts, end_ts, tz):
+        start = _month_start(_local(start_ts, tz), 1)
+        return int(start.timestamp()), int(_month_start(start, 1).timestamp())
+    return end_ts, end_ts + (end_ts - start_ts)
+
+
+def window_before(start_ts, end_ts, tz=None):
+    if is_month(start_ts, end_ts, tz):
+        start = _month_start(_local(start_ts, tz), -1)
+        return int(start.timestamp()), start_ts
+    return start_ts - (end_ts - start_ts), start_ts
+
+
+# ---------------- PREFETCHER ----------------
+
+class _Prefetch:
+    __slots__ = ("issued_at", "future", "used")
+
+    def __init__(self, issued_at, future):
+        self.issued_at = issued_at
+        self.future = future
+        self.used = False
+
+    def ready(self):
+        return self.future.done() and self.future.exception() is None and self.future.result()
+
+
+class WindowPrefetcher:
+    """
+    Learns from the list_events ranges of one account and syncs the
+    windows it is likely to ask for next into its EventCache in the
+    background.
+
+    Candidates after each request, most likely first: the last move
+    repeated (this week -> next week -> the week after, or backwards),
+    the window right after the request for every span seen recently (a
+    week after a week, a month after a month), the window right before
+    it and the next calendar month. Up to ``per_query`` that are not
+    cached yet are fetched with EventCache.prefill on the shared pool.
+
+    ``budget`` bounds prefetched windows that are in flight or unused,
+    and ``spare_tokens()`` (the quota bucket) must stay above
+    ``min_spare``. A prefetched window that answers a later request is
+    used; one that expires after ``ttl`` unused, or is invalidated
+    first, is wasted.
+    """
+
+    def __init__(self, cache, tz=None, budget=PREFETCH_BUDGET, per_query=PREFETCH_PER_QUERY,
+                 ttl=PREFETCH_TTL_SECONDS, max_days=PREFETCH_MAX_DAYS, spare_tokens=None,
+                 min_spare=PREFETCH_MIN_SPARE_TOKENS, executor=None, clock=time.monotonic):
+        self._cache = cache
+        self._tz = tz
+        self._budget = budget
+        self._per_query = per_query
+        self._ttl = ttl
+        self._max_span = max_days * 86400
+        self._spare_tokens = spare_tokens
+        self._min_spare = min_spare
+        self._executor = executor
+        self._clock = clock
+        self._lock = threading.RLock()
+        self._history = {}
+        self._windows = {}
+
+        self.stats = {
+            "observed": 0,
+            "hits": 0,
+            "inflight_waits": 0,
+            "issued": 0,
+            "completed": 0,
+            "failed": 0,
+            "redundant": 0,
+            "used": 0,
+            "wasted": 0,
+            "skipped_budget": 0,
+            "skipped_quota": 0
+        }
+
+    # ---------- public API ----------
+
+    def observe(self, calendar_id, start_ts, end_ts):
+        """
+        Called before a list_events range is read from the cache. Waits
+        for an in-flight prefetch that covers it, records whether a
+        prefetched window answers it and schedules the next predictions.
+        """
+        with self._lock:
+            self._expire()
+            self.stats["observed"] += 1
+            covering = [
+                prefetch for (calendar, start, end), prefetch in self._windows.items()
+                if calendar == calendar_id and start <= start_ts and end_ts <= end
+            ]
+            in_flight = [prefetch.future for prefetch in covering if not prefetch.future.done()]
+            if in_flight:
+                self.stats["inflight_waits"] += 1
+
+        if in_flight:
+            try:
+                in_flight[0].result(timeout=PREFETCH_WAIT_SECONDS)
+            except Exception:
+                pass
+
+        with self._lock:
+            ready = [prefetch for prefetch in covering if prefetch.ready()]
+            if ready:
+                self.stats["hits"] += 1
+            for prefetch in ready:
+                if not prefetch.used:
+                    prefetch.used = True
+                    self.stats["used"] += 1
+
+            history = self._history.setdefault(calendar_id, deque(maxlen=HISTORY_SIZE))
+            history.append((start_ts, end_ts))
+            self._schedule(calendar_id, self.predict(history))
+
+    def predict(self, history):
+        """
+        Candidate windows for a history of (start_ts, end_ts) requests,
+        most likely first.
+        """
+        start, end = history[-1]
+        candidates = []
+
+        if len(history) > 1:
+            last_start, last_end = history[-2]
+            if start == last_end:
+                candidates.append(window_after(start, end, self._tz))
+            elif end == last_start:
+                candidates.append(window_before(start, end, self._tz))
+            elif end - start == last_end - last_start and start != last_start:
+                stride = start - last_start
+                candidates.append((start + stride, end + stride))
+
+        candidates.append(window_after(start, end, self._tz))
+        for seen_start, seen_end in reversed(history):
+            if is_month(seen_start, seen_end, self._tz):
+                month = _month_start(_local(start, self._tz), 1)
+                candidates.append((int(month.timestamp()), int(_month_start(month, 1).timestamp())))
+            else:
+                candidates.append((end, end + (seen_end - seen_start)))
+        candidates.append(window_before(start, end, self._tz))
+        # Zooming out: from a week or a few days to the next month.
+        month = _month_start(_local(start, self._tz), 1)
+        candidates.append((int(month.timestamp()), int(_month_start(month, 1).timestamp())))
+
+        return [
+            window for window in dict.fromkeys(candidates)
+            if 0 < window[1] - window[0] <= self._max_span and window != (start, end)
+        ]
+
+    def hit_rate(self):
+        """
+        Share of observed requests answered by a prefetched window.
+        """
+        return self.stats["hits"] / self.stats["observed"] if self.stats["observed"] else 0.0
+
+    def accuracy(self):
+        """
+        Share of settled prefetches (used or wasted) that were used.
+        """
+        settled = self.stats["used"] + self.stats["wasted"]
+        return self.stats["used"] / settled if settled else 0.0
+
+    def close(self):
+        """
+        Counts every unused prefetched window as wasted (end of session).
+        """
+        with self._lock:
+            self._expire(everything=True)
+
+    # ---------- internals ----------
+
+    def _schedule(self, calendar_id, candidates):
+        issued = 0
+        outstanding = sum(1 for prefetch in self._windows.values() if not prefetch.used)
+
+        for start, end in candidates:
+            if issued >= self._per_query:
+                return
+            key = (calendar_id, start, end)
+            if key in self._windows or self._cache.is_covered(calendar_id, start, end):
+                continue
+            if outstanding >= self._budget:
+                self.stats["skipped_budget"] += 1
+                return
+            if self._spare_tokens is not None and self._spare_tokens() < self._min_spare:
+                self.stats["skipped_quota"] += 1
+                return
+
+            executor = self._executor or get_executor()
+            future = executor.submit(contextvars.copy_context().run, self._cache.prefill, calendar_id, start, end)
+            self._windows[key] = _Prefetch(self._clock(), future)
+            future.add_done_callback(lambda done, key=key: self._finished(key, done))
+
+            self.stats["issued"] += 1
+            issued += 1
+            outstanding += 1
+
+    def _finished(self, key, future):
+        with self._lock:
+            if self._windows.get(key) is None or self._windows[key].future is not future:
+                return
+            if future.exception() is not None:
+                self.stats["failed"] += 1
+                del self._windows[key]
+            elif not future.result():
+                # A request (or invalidation) got there first.
+                self.stats["redundant"] += 1
+                del self._windows[key]
+            else:
+                self.stats["completed"] += 1
+
+    def _expire(self, everything=False):
+        now = self._clock()
+        for key, prefetch in list(self._windows.items()):
+            if not prefetch.future.done() and not everything:
+                continue
+            expired = everything or now - prefetch.issued_at > self._ttl
+            if not expired and (prefetch.used or self._cache.is_covered(*key)):
+                continue
+            if not prefetch.used:
+                self.stats["wasted"] += 1
+            del self._windows[key]
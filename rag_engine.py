@@ -1,30 +1,327 @@
-from langchain_community.document_loaders import TextLoader
-# from langchain.text_splitter import RecursiveCharacterTextSplitter
-from langchain_text_splitters import RecursiveCharacterTextSplitter
-from langchain_community.vectorstores import FAISS
-from langchain_community.embeddings import HuggingFaceEmbeddings
+import json
+import os
+import resource
+import subprocess
+import sys
+import threading
+import time
+
+import ann_index
+import kb_ingest
+import telemetry
+from ttl_cache import TTLCache
+
+# faiss, langchain and the embedding model (torch / sentence-transformers)
+# are imported inside the functions that need them, so importing this
+# module, and calendar_client with it, stays cheap until the first
+# knowledge-base query.
+
+KNOWLEDGE_BASE_PATH = os.environ.get("RAG_KNOWLEDGE_BASE", "knowledge_base")
+INDEX_DIR = os.environ.get("RAG_INDEX_DIR", "vector_index")
+# Set by service workers: load the saved index as-is instead of syncing it,
+# so several processes can share one memory-mapped copy.
+READ_ONLY_INDEX = os.environ.get("RAG_INDEX_READ_ONLY") == "1"
+MODEL_NAME = "sentence-transformers/all-MiniLM-L6-v2"
+CHUNK_SIZE = 300
+CHUNK_OVERLAP = 50
+
+RETRIEVAL_CACHE_SIZE = int(os.environ.get("RAG_CACHE_SIZE", "1024"))
+RETRIEVAL_CACHE_TTL = float(os.environ.get("RAG_CACHE_TTL", "3600"))
+
+
+# ---------------- VECTOR STORE ----------------
+
+def index_settings():
+    """
+    Everything besides the documents that changes the chunks or their
+    vectors; a mismatch with the saved manifest forces a full rebuild.
+    """
+    settings = {
+        "model": MODEL_NAME,
+        "chunk_size": CHUNK_SIZE,
+        "chunk_overlap": CHUNK_OVERLAP,
+        "index": ann_index.index_spec_from_env()
+    }
+    # Quantized vectors drift from the PyTorch ones; only non-default
+    # backends are recorded, so existing indexes stay valid.
+    backend = os.environ.get("RAG_EMBEDDING_BACKEND", "huggingface")
+    if backend != "huggingface":
+        settings["embedding_backend"] = backend
+    return settings
+
+
+def make_embeddings():
+    """
+    The backend named by RAG_EMBEDDING_BACKEND; see embedding_backends.
+    """
+    from embedding_backends import create_embeddings
+
+    return create_embeddings()
 
 
 def build_vector_store():
-    loader = TextLoader("knowledge_base/calendar_assistant_docs.txt")
-    documents = loader.load()
+    """
+    Returns (store, version), where version is the
+    kb_ingest.installed_version() the store was loaded or saved as.
+    """
+    embeddings = make_embeddings()
+    current = os.path.realpath(INDEX_DIR)
+
+    if READ_ONLY_INDEX and kb_ingest.read_manifest(current) is not None:
+        store = kb_ingest.load_vector_store(embeddings, current)
+        version = kb_ingest.installed_version(current)
+    else:
+        store, report = kb_ingest.ingest(
+            embeddings,
+            KNOWLEDGE_BASE_PATH,
+            INDEX_DIR,
+            index_settings()
+        )
+        RAG_STATS["ingest"] = report
+        version = report["index_version"]
+        if not report["files_total"]:
+            telemetry.event("rag.warning", f"No documents under {KNOWLEDGE_BASE_PATH!r}; the knowledge base is empty")
+
+    ann_index.apply_search_params(store.index, **ann_index.search_params_from_env())
+
+    return store, version
+
+
+# ---------------- LAZY INITIALIZATION ----------------
+
+_VECTOR_STORE = None
+# The kb_ingest.installed_version() of _VECTOR_STORE.
+_INDEX_VERSION = None
+_VECTOR_STORE_LOCK = threading.Lock()
+_WARMUP_THREAD = None
+
+RAG_STATS = {
+    "state": "cold",
+    "load_seconds": None,
+    "rss_before_mb": None,
+    "rss_after_mb": None,
+    "error": None,
+    "ingest": None
+}
+
+
+def current_rss_mb():
+    """
+    Resident set size of this process in MiB (peak RSS where /proc is missing).
+    """
+    try:
+        with open("/proc/self/statm") as statm:
+            pages = int(statm.read().split()[1])
+        return pages * os.sysconf("SC_PAGE_SIZE") / (1024 * 1024)
+    except (OSError, ValueError):
+        return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024
+
+
+def get_vector_store():
+    """
+    Builds or loads the vector store on first use. Concurrent callers
+    wait for the same initialization instead of loading the model twice.
+    """
+    global _VECTOR_STORE, _INDEX_VERSION
+
+    if _VECTOR_STORE is None:
+        with _VECTOR_STORE_LOCK:
+            if _VECTOR_STORE is None:
+                RAG_STATS["state"] = "loading"
+                RAG_STATS["rss_before_mb"] = current_rss_mb()
+                started = time.perf_counter()
+
+                try:
+                    with telemetry.span("rag.load"):
+                        store, version = build_vector_store()
+                except Exception as exc:
+                    RAG_STATS["state"] = "failed"
+                    RAG_STATS["error"] = str(exc)
+                    raise
+
+                RAG_STATS["load_seconds"] = time.perf_counter() - started
+                RAG_STATS["rss_after_mb"] = current_rss_mb()
+                RAG_STATS["state"] = "ready"
+                RAG_STATS["error"] = None
+                _VECTOR_STORE = store
+                _INDEX_VERSION = version
+                _RETRIEVAL_CACHE.clear()
+
+    return _VECTOR_STORE
+
+
+def _drop_replaced_index():
+    """
+    Forgets the loaded store, and the retrieval cache built from it, once
+    another process has installed a new index version, so the next
+    get_vector_store() loads that one.
+    """
+    global _VECTOR_STORE
+
+    if _VECTOR_STORE is not None and kb_ingest.installed_version(INDEX_DIR) != _INDEX_VERSION:
+        with _VECTOR_STORE_LOCK:
+            if _VECTOR_STORE is not None and kb_ingest.installed_version(INDEX_DIR) != _INDEX_VERSION:
+                _VECTOR_STORE = None
+                RAG_STATS["state"] = "cold"
+                _RETRIEVAL_CACHE.clear()
+
+
+def prepare_read_only_index():
+    """
+    Syncs the saved index with the knowledge base in a child process, then
+    switches this process (and processes it starts) to loading it
+    read-only. Returns None, or the child's error output on failure.
+    """
+    result = subprocess.run([sys.executable, "-m", "rag_engine"], capture_output=True, text=True)
+    if result.returncode != 0:
+        return result.stderr.strip()
+
+    global READ_ONLY_INDEX
+    os.environ["RAG_INDEX_READ_ONLY"] = "1"
+    READ_ONLY_INDEX = True
+    return None
 
-    splitter = RecursiveCharacterTextSplitter(
-        chunk_size=300,
-        chunk_overlap=50
-    )
-    docs = splitter.split_documents(documents)
 
-    embeddings = HuggingFaceEmbeddings(
-        model_name="sentence-transformers/all-MiniLM-L6-v2"
-    )
+def warm_up(background: bool = True):
+    """
+    Loads the RAG stack ahead of the first knowledge query, optionally on a
+    daemon thread so the caller can start serving calendar queries at once.
+    """
+    global _WARMUP_THREAD
 
-    return FAISS.from_documents(docs, embeddings)
+    if not background:
+        return get_vector_store()
 
+    if _WARMUP_THREAD is None and _VECTOR_STORE is None:
+        _WARMUP_THREAD = threading.Thread(
+            target=_warm_up_quietly,
+            name="rag-warmup",
+            daemon=True
+        )
+        _WARMUP_THREAD.start()
+    return _WARMUP_THREAD
 
-VECTOR_STORE = build_vector_store()
+
+def _warm_up_quietly():
+    try:
+        get_vector_store()
+    except Exception as exc:
+        telemetry.event("rag.warning", f"Background warm-up failed: {exc}")
+
+
+def is_ready():
+    return _VECTOR_STORE is not None
+
+
+def index_version():
+    """
+    The installed index version, which changes whenever any process
+    rebuilds the index; a loaded store it no longer matches is dropped.
+    Answers derived from retrieval are only valid for the version they
+    were computed with.
+    """
+    _drop_replaced_index()
+    return kb_ingest.installed_version(INDEX_DIR)
+
+
+def __getattr__(name):
+    # Backwards compatibility for code that read rag_engine.VECTOR_STORE.
+    if name == "VECTOR_STORE":
+        return get_vector_store()
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
+
+
+# ---------------- RETRIEVAL ----------------
+
+_RETRIEVAL_CACHE = TTLCache(maxsize=RETRIEVAL_CACHE_SIZE, ttl=RETRIEVAL_CACHE_TTL)
+
+
+def normalize_query(query: str):
+    """
+    Case- and whitespace-insensitive cache key; trailing punctuation is
+    dropped so "What can it do?" and "what can it do" share an entry.
+    """
+    return " ".join(query.lower().split()).rstrip("?!. ")
 
 
 def retrieve_context(query: str, k: int = 2):
-    results = VECTOR_STORE.similarity_search(query, k=k)
-    return [doc.page_content for doc in results]
+    with telemetry.span("rag.retrieve", k=k) as span:
+        key = (normalize_query(query), k)
+
+        _drop_replaced_index()
+        cached = _RETRIEVAL_CACHE.get(key)
+        span.set(cache_hit=cached is not None)
+        if cached is not None:
+            return list(cached)
+
+        store = get_vector_store()
+        results = store.similarity_search(query, k=k) if store.index.ntotal else []
+        context = [doc.page_content for doc in results]
+
+        _RETRIEVAL_CACHE.put(key, tuple(context))
+        return context
+
+
+def retrieve_context_batch(queries, k: int = 2):
+    """
+    Retrieves context for many queries: cache hits are served directly and
+    all misses are embedded in one model call and searched with a single
+    vectorized FAISS query. Returns one list of chunks per input query.
+    """
+    import faiss
+    import numpy as np
+
+    keys = [(normalize_query(query), k) for query in queries]
+    results = [None] * len(queries)
+    misses = {}
+
+    _drop_replaced_index()
+    for position, key in enumerate(keys):
+        cached = _RETRIEVAL_CACHE.get(key)
+        if cached is not None:
+            results[position] = list(cached)
+        else:
+            misses.setdefault(key, []).append(position)
+
+    if misses:
+        store = get_vector_store()
+        miss_keys = list(misses)
+        texts = [queries[misses[key][0]] for key in miss_keys]
+
+        if store.index.ntotal:
+            vectors = np.asarray(store.embeddings.embed_documents(texts), dtype="float32")
+            if getattr(store, "_normalize_L2", False):
+                faiss.normalize_L2(vectors)
+            _, neighbours = store.index.search(vectors, k)
+        else:
+            # An empty index may be untrained (IVF/PQ/int8), which FAISS refuses to search.
+            neighbours = [[] for _ in miss_keys]
+
+        for key, row in zip(miss_keys, neighbours):
+            context = tuple(
+                store.docstore.search(store.index_to_docstore_id[i]).page_content
+                for i in row
+                if i != -1
+            )
+            _RETRIEVAL_CACHE.put(key, context)
+
+            for position in misses[key]:
+                results[position] = list(context)
+
+    return results
+
+
+def retrieval_cache_stats():
+    return _RETRIEVAL_CACHE.snapshot()
+
+
+telemetry.register_collector(lambda: {
+    f"rag.retrieval_cache.{name}": value
+    for name, value in retrieval_cache_stats().items()
+})
+
+
+if __name__ == "__main__":
+    # Sync the index with the knowledge base and print the ingest report.
+    get_vector_store()
+    print(json.dumps(RAG_STATS["ingest"], indent=2))
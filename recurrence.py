@@ -0,0 +1,279 @@
+import heapq
+import itertools
+from collections.abc import Mapping
+from datetime import date, datetime, time, timezone
+from zoneinfo import ZoneInfo
+
+from dateutil import rrule
+
+
+# ================= PARSING =================
+
+def parse_value(text, zone):
+    """
+    An iCalendar DATE or DATE-TIME: "20260110" -> date, "20260110T090000Z"
+    -> UTC datetime, "20260110T090000" -> datetime in ``zone``.
+    """
+    if "T" not in text:
+        return datetime.strptime(text, "%Y%m%d").date()
+    if text.endswith("Z"):
+        return datetime.strptime(text, "%Y%m%dT%H%M%SZ").replace(tzinfo=timezone.utc)
+    return datetime.strptime(text, "%Y%m%dT%H%M%S").replace(tzinfo=zone)
+
+
+def _date_list(line, zone):
+    head, _, values = line.partition(":")
+    for param in head.split(";")[1:]:
+        if param.startswith("TZID="):
+            zone = ZoneInfo(param[5:])
+    return [parse_value(value, zone) for value in values.split(",") if value]
+
+
+def parse_when(when, tz=None):
+    """
+    A Calendar ``start``/``end`` object as a date (all-day) or an aware
+    datetime in the event's own time zone, so recurrences keep their wall
+    clock time across DST changes.
+    """
+    if "date" in when and "dateTime" not in when:
+        return date.fromisoformat(when["date"])
+
+    value = datetime.fromisoformat(when["dateTime"].replace("Z", "+00:00"))
+    if when.get("timeZone"):
+        zone = ZoneInfo(when["timeZone"])
+        return value.replace(tzinfo=zone) if value.tzinfo is None else value.astimezone(zone)
+    return value if value.tzinfo is not None else value.replace(tzinfo=tz or timezone.utc)
+
+
+def epoch(value, tz=None):
+    if isinstance(value, datetime):
+        return int(value.timestamp())
+    return int(datetime.combine(value, time(), tzinfo=tz or timezone.utc).timestamp())
+
+
+# ================= EXPANSION =================
+
+def _like_start(dtstart, value, until=False):
+    """
+    Converts a parsed DATE/DATE-TIME to the type dateutil compares with
+    DTSTART: aware datetimes for timed events, naive midnights for all-day
+    ones.
+    """
+    if isinstance(dtstart, datetime):
+        if isinstance(value, datetime):
+            return value
+        # A DATE UNTIL on a timed event includes that whole day.
+        moment = time.max if until else dtstart.timetz().replace(tzinfo=None)
+        return datetime.combine(value, moment, tzinfo=dtstart.tzinfo)
+    return datetime.combine(value.date() if isinstance(value, datetime) else value, time())
+
+
+def _rule_line(line, dtstart):
+    """
+    dateutil refuses an UNTIL whose awareness differs from DTSTART's, while
+    Calendar writes UNTIL as a date, a floating time or UTC. Rewrites it
+    as UTC for timed events and as a date for all-day ones.
+    """
+    zone = dtstart.tzinfo if isinstance(dtstart, datetime) else None
+    parts = []
+    for part in line.split(":", 1)[-1].split(";"):
+        name, _, value = part.partition("=")
+        if name.upper() == "UNTIL":
+            until = _like_start(dtstart, parse_value(value, zone), until=True)
+            if zone is not None:
+                value = f"{until.astimezone(timezone.utc):%Y%m%dT%H%M%SZ}"
+            else:
+                value = f"{until:%Y%m%d}"
+        parts.append(f"{name}={value}" if value else name)
+    return "RRULE:" + ";".join(parts)
+
+
+def parse_recurrence(lines, dtstart):
+    """
+    A master's RRULE/RDATE/EXDATE lines as a dateutil rruleset anchored at
+    ``dtstart``. Raises ValueError for lines dateutil cannot expand.
+    """
+    anchor = dtstart if isinstance(dtstart, datetime) else datetime.combine(dtstart, time())
+    zone = dtstart.tzinfo if isinstance(dtstart, datetime) else None
+    rules = rrule.rruleset()
+    has_rule = False
+
+    for line in lines:
+        name = line.split(":", 1)[0].split(";", 1)[0].upper()
+        if name == "RRULE":
+            rules.rrule(rrule.rrulestr(_rule_line(line, dtstart), dtstart=anchor))
+            has_rule = True
+        elif name == "RDATE":
+            for value in _date_list(line, zone):
+                rules.rdate(_like_start(dtstart, value))
+        elif name == "EXDATE":
+            for value in _date_list(line, zone):
+                rules.exdate(_like_start(dtstart, value))
+        else:
+            raise ValueError(f"unsupported recurrence line: {line}")
+
+    if not has_rule:
+        rules.rdate(anchor)
+    return rules
+
+
+def _occurrences(rules, dtstart, after):
+    """
+    Starts after ``after`` (same type as DTSTART), in order, as dates for
+    all-day events.
+    """
+    if isinstance(dtstart, datetime):
+        return rules.xafter(after)
+    return (value.date() for value in rules.xafter(datetime.combine(after, time())))
+
+
+# ================= INSTANCES =================
+
+def instance_id(master_id, start):
+    if isinstance(start, datetime):
+        return f"{master_id}_{start.astimezone(timezone.utc):%Y%m%dT%H%M%SZ}"
+    return f"{master_id}_{start:%Y%m%d}"
+
+
+def _when(value, zone_name):
+    if isinstance(value, datetime):
+        when = {"dateTime": value.isoformat()}
+        if zone_name:
+            when["timeZone"] = zone_name
+        return when
+    return {"date": value.isoformat()}
+
+
+class EventInstance(Mapping):
+    """
+    One occurrence of a recurring event, read-only. Only its own start and
+    end are stored; every other field is read through from the master,
+    so a year of daily instances costs a few objects each instead of a
+    copy of the master's payload. ``dict(instance)`` (or to_dict())
+    gives the same shape as a server-expanded instance.
+    """
+
+    __slots__ = ("master", "start", "end")
+
+    OWN_FIELDS = ("id", "recurringEventId", "originalStartTime", "start", "end")
+
+    def __init__(self, master, start, end):
+        self.master = master
+        self.start = start
+        self.end = end
+
+    def __getitem__(self, key):
+        if key == "id":
+            return instance_id(self.master["id"], self.start)
+        if key == "recurringEventId":
+            return self.master["id"]
+        if key in ("start", "originalStartTime"):
+            return _when(self.start, self.master["start"].get("timeZone"))
+        if key == "end":
+            return _when(self.end, self.master["end"].get("timeZone"))
+        if key == "recurrence":
+            raise KeyError(key)
+        return self.master[key]
+
+    def __iter__(self):
+        yield from self.OWN_FIELDS
+        for key in self.master:
+            if key not in self.OWN_FIELDS and key != "recurrence":
+                yield key
+
+    def __len__(self):
+        return sum(1 for _ in self)
+
+    def to_dict(self):
+        return dict(self)
+
+    def __repr__(self):
+        return repr(self.to_dict())
+
+
+def expand_event(master, start_ts, end_ts, tz=None, overridden=()):
+    """
+    Instances of ``master`` overlapping [start_ts, end_ts), in start order.
+    ``overridden`` holds original starts replaced by exception events.
+    """
+    first = parse_when(master["start"], tz)
+    duration = parse_when(master["end"], tz) - first
+    rules = parse_recurrence(master.get("recurrence", []), first)
+    return (instance for _, instance in _instances(master, rules, first, duration, start_ts, end_ts, tz, overridden))
+
+
+def _instances(master, rules, first, duration, start_ts, end_ts, tz, overridden):
+    if isinstance(first, datetime):
+        after = datetime.fromtimestamp(start_ts, first.tzinfo) - duration
+    else:
+        after = datetime.fromtimestamp(start_ts, tz or timezone.utc).date() - duration
+
+    for start in _occurrences(rules, first, after):
+        begin = epoch(start, tz)
+        if begin >= end_ts:
+            return
+        end = start + duration
+        if epoch(end, tz) > start_ts and start not in overridden:
+            yield begin, EventInstance(master, start, end)
+
+
+def expand_events(items, start_ts, end_ts, tz=None, fetch_instances=None):
+    """
+    Turns an ``events().list(singleEvents=False)`` result into the events
+    overlapping [start_ts, end_ts) in start order, like singleEvents=True
+    would: recurring masters are expanded here, exceptions replace the
+    instances they override and cancelled ones remove them.
+
+    Rules are expanded with dateutil.rrule. Masters it rejects are passed
+    to ``fetch_instances(master)`` (the server's instances endpoint) when
+    given, otherwise its ValueError propagates.
+    """
+    masters = []
+    exceptions = []
+    singles = []
+
+    for event in items:
+        if event.get("recurrence"):
+            masters.append(event)
+        elif event.get("recurringEventId"):
+            exceptions.append(event)
+        elif event.get("status") != "cancelled":
+            singles.append(event)
+
+    streams = []
+    server_expanded = set()
+
+    for master in masters:
+        first = parse_when(master["start"], tz)
+        try:
+            rules = parse_recurrence(master["recurrence"], first)
+        except ValueError:
+            if fetch_instances is None:
+                raise
+            server_expanded.add(master["id"])
+            singles.extend(event for event in fetch_instances(master) if event.get("status") != "cancelled")
+            continue
+
+        overridden = {
+            parse_when(event["originalStartTime"], tz)
+            for event in exceptions
+            if event["recurringEventId"] == master["id"] and "originalStartTime" in event
+        }
+        duration = parse_when(master["end"], tz) - first
+        streams.append(_instances(master, rules, first, duration, start_ts, end_ts, tz, overridden))
+
+    standalone = []
+    for event in singles + [
+        event for event in exceptions
+        if event.get("status") != "cancelled" and event["recurringEventId"] not in server_expanded
+    ]:
+        begin = epoch(parse_when(event["start"], tz), tz)
+        if begin < end_ts and epoch(parse_when(event["end"], tz), tz) > start_ts:
+            standalone.append((begin, event))
+    standalone.sort(key=lambda item: item[0])
+    streams.append(standalone)
+
+    # The counter keeps ties from comparing events.
+    order = itertools.count()
+    merged = heapq.merge(*(((begin, next(order), event) for begin, event in stream) for stream in streams))
+    return (event for _, _, event in merged)
@@ -0,0 +1,384 @@
+import json
+import os
+import random
+import socket
+import threading
+import time
+
+from googleapiclient.errors import HttpError
+
+# Calendar's default per-user quota is 600 requests/minute.
+DEFAULT_QPS = float(os.environ.get("CALENDAR_QPS", "10"))
+DEFAULT_BURST = int(os.environ.get("CALENDAR_BURST", "20"))
+DEFAULT_MAX_RETRIES = int(os.environ.get("CALENDAR_MAX_RETRIES", "5"))
+BACKOFF_BASE_SECONDS = 0.5
+BACKOFF_MAX_SECONDS = 32.0
+BREAKER_THRESHOLD = int(os.environ.get("CALENDAR_BREAKER_THRESHOLD", "5"))
+BREAKER_RESET_SECONDS = float(os.environ.get("CALENDAR_BREAKER_RESET", "30"))
+
+RATE_LIMIT_REASONS = {"rateLimitExceeded", "userRateLimitExceeded"}
+SERVER_ERROR_STATUSES = {500, 502, 503, 504}
+
+
+# ================= ERROR CLASSIFICATION =================
+
+def error_reasons(exc):
+    """
+    The ``reason`` strings of a Calendar API error response.
+    """
+    reasons = set()
+
+    details = getattr(exc, "error_details", None)
+    if isinstance(details, list):
+        reasons.update(detail.get("reason") for detail in details if isinstance(detail, dict))
+
+    try:
+        payload = json.loads(exc.content)
+        reasons.update(error.get("reason") for error in payload["error"].get("errors", []))
+    except (ValueError, KeyError, TypeError, AttributeError):
+        pass
+
+    reasons.discard(None)
+    return reasons
+
+
+def is_rate_limited(exc):
+    if not isinstance(exc, HttpError):
+        return False
+    status = exc.resp.status
+    return status == 429 or (status == 403 and bool(error_reasons(exc) & RATE_LIMIT_REASONS))
+
+
+def is_retriable(exc):
+    """
+    429, 403 rateLimitExceeded/userRateLimitExceeded, 5xx and transport
+    errors are worth retrying. Any other 4xx (including a 403 for missing
+    permissions) is not.
+    """
+    if isinstance(exc, HttpError):
+        return exc.resp.status in SERVER_ERROR_STATUSES or is_rate_limited(exc)
+    return isinstance(exc, (socket.timeout, ConnectionError))
+
+
+def retry_after_seconds(exc):
+    if not isinstance(exc, HttpError):
+        return None
+    value = exc.resp.get("retry-after")
+    try:
+        return float(value) if value is not None else None
+    except ValueError:
+        return None
+
+
+def backoff_delay(attempt, base=BACKOFF_BASE_SECONDS, cap=BACKOFF_MAX_SECONDS, rng=random):
+    """
+    "Full jitter" exponential backoff: uniform in [0, min(cap, base * 2**attempt)].
+    Spreading retries out keeps concurrent callers from retrying in lockstep.
+    """
+    return rng.uniform(0, min(cap, base * (2 ** attempt)))
+
+
+# ================= BUILDING BLOCKS =================
+
+class CircuitOpen(Exception):
+    """
+    Raised without calling the API while the circuit breaker is open.
+    """
+
+
+class TokenBucket:
+    """
+    ``rate`` tokens per second, bursting up to ``capacity``. acquire()
+    blocks until enough tokens are available.
+    """
+
+    def __init__(self, rate=DEFAULT_QPS, capacity=DEFAULT_BURST, clock=time.monotonic, sleep=time.sleep):
+        self.rate = rate
+        self.capacity = capacity
+        self._clock = clock
+        self._sleep = sleep
+        self._lock = threading.Lock()
+        self._tokens = float(capacity)
+        self._updated = clock()
+
+    def _refill(self, now):
+        self._tokens = min(self.capacity, self._tokens + (now - self._updated) * self.rate)
+        self._updated = now
+
+    def acquire(self, tokens=1):
+        """
+        Takes ``tokens`` and returns the seconds spent waiting for them.
+        """
+        tokens = min(tokens, self.capacity)
+        waited = 0.0
+
+        while True:
+            with self._lock:
+                self._refill(self._clock())
+                if self._tokens >= tokens:
+                    self._tokens -= tokens
+                    return waited
+                delay = (tokens - self._tokens) / self.rate
+
+            self._sleep(delay)
+            waited += delay
+
+    def available(self):
+        """
+        Tokens that can be taken right now without waiting.
+        """
+        with self._lock:
+            self._refill(self._clock())
+            return self._tokens
+
+    def drain(self):
+        """
+        Empties the bucket after the server reports a rate limit, so every
+        caller slows down instead of only the one that was rejected.
+        """
+        with self._lock:
+            self._refill(self._clock())
+            self._tokens = min(self._tokens, 0.0)
+
+
+class CircuitBreaker:
+    """
+    Opens after ``threshold`` consecutive failures and rejects calls for
+    ``reset_timeout`` seconds. After that one trial call is let through
+    (half-open); its outcome closes or re-opens the circuit.
+    """
+
+    def __init__(self, threshold=BREAKER_THRESHOLD, reset_timeout=BREAKER_RESET_SECONDS, clock=time.monotonic):
+        self.threshold = threshold
+        self.reset_timeout = reset_timeout
+        self._clock = clock
+        self._lock = threading.Lock()
+        self._failures = 0
+        self._opened_at = None
+        self._trial_running = False
+        self.trips = 0
+
+    @property
+    def state(self):
+        with self._lock:
+            return self._state()
+
+    def _state(self):
+        if self._opened_at is None:
+            return "closed"
+        if self._clock() - self._opened_at >= self.reset_timeout:
+            return "half_open"
+        return "open"
+
+    def before_call(self):
+        with self._lock:
+            state = self._state()
+            if state == "open" or (state == "half_open" and self._trial_running):
+                raise CircuitOpen("Calendar API circuit is open; failing fast")
+            if state == "half_open":
+                self._trial_running = True
+
+    def record_success(self):
+        with self._lock:
+            self._failures = 0
+            self._opened_at = None
+            self._trial_running = False
+
+    def record_failure(self):
+        with self._lock:
+            self._failures += 1
+            if self._trial_running or (self._opened_at is None and self._failures >= self.threshold):
+                self.trips += 1
+                self._opened_at = self._clock()
+            self._trial_running = False
+
+
+class _Flight:
+    __slots__ = ("done", "result", "error", "followers")
+
+    def __init__(self):
+        self.done = threading.Event()
+        self.result = None
+        self.error = None
+        self.followers = 0
+
+
+class SingleFlight:
+    """
+    Collapses concurrent calls with the same key into one: the first
+    caller runs ``fn`` and everyone who arrives while it is in flight
+    gets the same result (or exception).
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._flights = {}
+
+    def do(self, key, fn):
+        """
+        Returns (result, shared) where ``shared`` is True for followers.
+        """
+        with self._lock:
+            flight = self._flights.get(key)
+            if flight is not None:
+                flight.followers += 1
+                leader = False
+            else:
+                flight = self._flights[key] = _Flight()
+                leader = True
+
+        if not leader:
+            flight.done.wait()
+            if flight.error is not None:
+                raise flight.error
+            return flight.result, True
+
+        try:
+            flight.result = fn()
+            return flight.result, False
+        except BaseException as exc:
+            flight.error = exc
+            raise
+        finally:
+            with self._lock:
+                del self._flights[key]
+            flight.done.set()
+
+
+# ================= SCHEDULER =================
+
+class RequestScheduler:
+    """
+    Single path for Calendar API calls.
+
+    Every attempt takes a token from the bucket, passes the circuit
+    breaker and is retried on 429/403-rate-limit/5xx with jittered
+    exponential backoff (honouring Retry-After). Identical GET requests
+    that are in flight at the same time share one HTTP round trip.
+    """
+
+    def __init__(self, limiter=None, breaker=None, max_retries=DEFAULT_MAX_RETRIES,
+                 backoff_base=BACKOFF_BASE_SECONDS, coalesce=True, sleep=time.sleep, rng=None):
+        self.limiter = limiter or TokenBucket()
+        self.breaker = breaker or CircuitBreaker()
+        self.max_retries = max_retries
+        self.backoff_base = backoff_base
+        self.coalesce = coalesce
+        self._sleep = sleep
+        self._rng = rng or random.Random()
+        self._flights = SingleFlight()
+        self._stats_lock = threading.Lock()
+        self.stats = {
+            "calls": 0,
+            "attempts": 0,
+            "retries": 0,
+            "coalesced": 0,
+            "rate_limited": 0,
+            "server_errors": 0,
+            "failures": 0,
+            "rejected_open": 0,
+            "throttled_seconds": 0.0,
+            "backoff_seconds": 0.0
+        }
+
+    def _count(self, key, amount=1):
+        with self._stats_lock:
+            self.stats[key] += amount
+
+    @staticmethod
+    def coalesce_key(request):
+        """
+        GETs are safe to share; anything else, including batches, is not.
+        """
+        if getattr(request, "method", None) != "GET":
+            return None
+        return (request.uri, request.body)
+
+    def execute(self, request, send, cost=1, retry=True):
+        """
+        Runs ``send(request)`` under the limiter, breaker and retry policy.
+        ``cost`` is the number of quota units the call uses (a batch
+        counts every request inside it). ``retry=False`` is for calls that
+        must not be repeated blindly, such as a batch of inserts.
+        """
+        self._count("calls")
+
+        key = self.coalesce_key(request) if self.coalesce else None
+        if key is None:
+            return self._run(request, send, cost, retry)
+
+        result, shared = self._flights.do(key, lambda: self._run(request, send, cost, retry))
+        if shared:
+            self._count("coalesced")
+        return result
+
+    def _run(self, request, send, cost, retry):
+        attempt = 0
+
+        while True:
+            try:
+                self.breaker.before_call()
+            except CircuitOpen:
+                self._count("rejected_open")
+                raise
+
+            self._count("throttled_seconds", self.limiter.acquire(cost))
+            self._count("attempts")
+
+            try:
+                response = send(request)
+            except Exception as exc:
+                if is_rate_limited(exc):
+                    # Quota, not health: back off without tripping the breaker.
+                    self._count("rate_limited")
+                    self.limiter.drain()
+                    self.breaker.record_success()
+                elif is_retriable(exc):
+                    self._count("server_errors")
+                    self.breaker.record_failure()
+                else:
+                    # A 4xx answer still means the API is reachable.
+                    self.breaker.record_success()
+                    raise
+
+                if not retry or attempt >= self.max_retries:
+                    self._count("failures")
+                    raise
+
+                delay = retry_after_seconds(exc)
+                if delay is None:
+                    delay = backoff_delay(attempt, base=self.backoff_base, rng=self._rng)
+                self._count("retries")
+                self._count("backoff_seconds", delay)
+                self._sleep(delay)
+                attempt += 1
+                continue
+
+            self.breaker.record_success()
+            return response
+
+
+_DEFAULT_SCHEDULER = None
+_DEFAULT_SCHEDULER_LOCK = threading.Lock()
+
+
+def get_scheduler():
+    global _DEFAULT_SCHEDULER
+
+    if _DEFAULT_SCHEDULER is None:
+        with _DEFAULT_SCHEDULER_LOCK:
+            if _DEFAULT_SCHEDULER is None:
+                _DEFAULT_SCHEDULER = RequestScheduler()
+    return _DEFAULT_SCHEDULER
+
+
+def set_scheduler(scheduler):
+    """
+    Replaces the process-wide scheduler (tests, benchmarks, per-tenant
+    quotas). Returns the previous one.
+    """
+    global _DEFAULT_SCHEDULER
+
+    with _DEFAULT_SCHEDULER_LOCK:
+        previous, _DEFAULT_SCHEDULER = _DEFAULT_SCHEDULER, scheduler
+    return previous
@@ -0,0 +1,570 @@
+import argparse
+import base64
+import hashlib
+import hmac
+import json
+import os
+import re
+import secrets
+import signal
+import socket
+import threading
+import time
+import traceback
+from collections import OrderedDict
+from collections.abc import Mapping
+from contextlib import contextmanager
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import calendar_client
+import calendar_fanout
+import calendar_service
+import google_calendar_server
+import rag_engine
+import telemetry
+from calendar_service import CalendarServiceManager, use_service_manager
+from credential_store import get_credential_store, load_or_create_secret
+from request_scheduler import RequestScheduler
+
+# Loopback unless told otherwise; containers set SERVICE_HOST=0.0.0.0.
+SERVICE_HOST = os.environ.get("SERVICE_HOST", "127.0.0.1")
+SERVICE_PORT = int(os.environ.get("SERVICE_PORT", "8080"))
+SERVICE_WORKERS = int(os.environ.get("SERVICE_WORKERS", "2"))
+TOKEN_DIR = os.environ.get("SERVICE_TOKEN_DIR", "tokens")
+MAX_INFLIGHT = int(os.environ.get("SERVICE_MAX_INFLIGHT", "64"))
+SHUTDOWN_TIMEOUT_SECONDS = float(os.environ.get("SERVICE_SHUTDOWN_TIMEOUT", "30"))
+REQUIRE_RAG = os.environ.get("SERVICE_REQUIRE_RAG", "1") == "1"
+AUTH_SECRET_FILE = os.environ.get("SERVICE_AUTH_SECRET_FILE", "service.secret")
+TOKEN_TTL_SECONDS = float(os.environ.get("SERVICE_TOKEN_TTL", str(30 * 86400)))
+# Shortest signing secret accepted, in bytes.
+MIN_SECRET_BYTES = 32
+# Users kept warm per worker; the least recently used one is closed
+# first, and any idle for USER_IDLE_SECONDS is closed anyway.
+MAX_USERS = int(os.environ.get("SERVICE_MAX_USERS", "256"))
+USER_IDLE_SECONDS = float(os.environ.get("SERVICE_USER_IDLE", "1800"))
+
+USER_ID = re.compile(r"^[A-Za-z0-9_.@-]{1,128}$")
+
+
+# ---------------- AUTH ----------------
+
+class Unauthorized(Exception):
+    """
+    Missing, malformed, expired or forged bearer token.
+    """
+
+
+def load_auth_secret(secret_file=AUTH_SECRET_FILE):
+    """
+    The token signing secret from SERVICE_AUTH_SECRET, else from
+    ``secret_file``, created on first use by
+    credential_store.load_or_create_secret(). Loaded once by main()
+    before any worker is forked. Raises ValueError for a secret shorter
+    than MIN_SECRET_BYTES, which would make tokens forgeable.
+    """
+    secret = os.environ.get("SERVICE_AUTH_SECRET")
+    if secret:
+        secret = secret.encode("utf-8")
+        if len(secret) < MIN_SECRET_BYTES:
+            raise ValueError(f"SERVICE_AUTH_SECRET must be at least {MIN_SECRET_BYTES} bytes")
+        return secret
+
+    return load_or_create_secret(
+        secret_file,
+        lambda: secrets.token_urlsafe(MIN_SECRET_BYTES).encode("ascii"),
+        min_length=MIN_SECRET_BYTES
+    )
+
+
+def _signature(secret, payload):
+    return hmac.new(secret, payload.encode("utf-8"), hashlib.sha256).hexdigest()
+
+
+def issue_token(user_id, secret, ttl=TOKEN_TTL_SECONDS, now=None):
+    """
+    A bearer token naming ``user_id``, valid for ``ttl`` seconds and
+    signed with HMAC-SHA256 under the service secret.
+    """
+    if not USER_ID.match(user_id or ""):
+        raise ValueError(f"invalid user id {user_id!r}")
+
+    payload = f"{user_id}:{int((time.time() if now is None else now) + ttl)}"
+    token = f"{payload}:{_signature(secret, payload)}".encode("utf-8")
+    return base64.urlsafe_b64encode(token).decode("ascii").rstrip("=")
+
+
+def authenticate(header, secret, now=None):
+    """
+    The user id from an ``Authorization: Bearer <token>`` header made by
+    issue_token(). Raises Unauthorized for anything else.
+    """
+    scheme, _, token = (header or "").partition(" ")
+    if scheme.lower() != "bearer" or not token:
+        raise Unauthorized("missing bearer token")
+
+    try:
+        decoded = base64.urlsafe_b64decode(token.strip() + "=" * (-len(token.strip()) % 4)).decode("utf-8")
+        user_id, expires, signature = decoded.rsplit(":", 2)
+        expires = int(expires)
+    except ValueError:
+        raise Unauthorized("malformed token") from None
+
+    if not hmac.compare_digest(signature, _signature(secret, f"{user_id}:{expires}")):
+        raise Unauthorized("invalid token")
+    if expires < (time.time() if now is None else now):
+        raise Unauthorized("token expired")
+    return user_id
+
+
+# ---------------- USERS ----------------
+
+class UnknownUser(Exception):
+    """
+    No stored credentials for the requested user.
+    """
+
+
+def stored_credentials_loader(store, user_id):
+    """
+    Like calendar_service.load_credentials, but never starts the
+    interactive consent flow: a service has nobody to paste a code.
+    """
+    def load():
+        creds = store.get(user_id)
+        if creds is None:
+            raise UnknownUser(f"no credentials stored for user {user_id!r}")
+
+        if not creds.valid and creds.expired and creds.refresh_token:
+            store.refresh(user_id, force=True)
+        return creds
+
+    return load
+
+
+class _UserEntry:
+    __slots__ = ("manager", "last_used", "active")
+
+    def __init__(self, manager, now):
+        self.manager = manager
+        self.last_used = now
+        self.active = 0
+
+
+class UserRegistry:
+    """
+    One CalendarServiceManager per user, created on first request and kept
+    warm: credentials, transport pool, event cache and a scheduler of its
+    own, so users never share quota, cached events or coalesced responses.
+
+    At most ``max_users`` are kept, least recently used first out, and a
+    user idle for ``idle_seconds`` is closed. A manager is never closed
+    while a request is using it (see use()).
+    """
+
+    def __init__(self, token_dir=TOKEN_DIR, pool_size=4, store=None, max_users=MAX_USERS,
+                 idle_seconds=USER_IDLE_SECONDS, clock=time.monotonic):
+        self._token_dir = token_dir
+        self._store = store or get_credential_store()
+        self._pool_size = pool_size
+        self._max_users = max_users
+        self._idle_seconds = idle_seconds
+        self._clock = clock
+        self._lock = threading.Lock()
+        self._managers = OrderedDict()
+        self.stats = {"created": 0, "evicted": 0}
+
+    def __len__(self):
+        return len(self._managers)
+
+    @contextmanager
+    def use(self, user_id):
+        """
+        The user's manager, pinned against eviction for the duration.
+        """
+        entry = self._acquire(user_id)
+        try:
+            yield entry.manager
+        finally:
+            with self._lock:
+                entry.active -= 1
+                entry.last_used = self._clock()
+            self._evict()
+
+    def _acquire(self, user_id):
+        if not USER_ID.match(user_id or ""):
+            raise UnknownUser(f"invalid user id {user_id!r}")
+
+        with self._lock:
+            entry = self._managers.get(user_id)
+            if entry is None:
+                # <token_dir>/<user>.pickle files predate the credential
+                # store; they are imported on first use.
+                token_file = os.path.join(self._token_dir, f"{user_id}.pickle")
+                if self._store.get(user_id) is None and self._store.import_pickle(user_id, token_file) is None:
+                    raise UnknownUser(f"no credentials for user {user_id!r}")
+
+                manager = CalendarServiceManager(
+                    credentials_loader=stored_credentials_loader(self._store, user_id),
+                    pool_size=self._pool_size
+                )
+                manager.get_scoped("scheduler", RequestScheduler)
+                entry = self._managers[user_id] = _UserEntry(manager, self._clock())
+                self.stats["created"] += 1
+
+            self._managers.move_to_end(user_id)
+            entry.active += 1
+            entry.last_used = self._clock()
+        self._evict()
+        return entry
+
+    def _evict(self):
+        now = self._clock()
+        doomed = []
+        with self._lock:
+            excess = len(self._managers) - self._max_users
+            for user_id, entry in list(self._managers.items()):
+                if entry.active:
+                    continue
+                if excess > 0 or now - entry.last_used > self._idle_seconds:
+                    doomed.append(self._managers.pop(user_id).manager)
+                    excess -= 1
+            self.stats["evicted"] += len(doomed)
+        for manager in doomed:
+            manager.close()
+
+    def close(self):
+        with self._lock:
+            entries, self._managers = list(self._managers.values()), OrderedDict()
+        for entry in entries:
+            entry.manager.close()
+
+
+# ---------------- TOOLS ----------------
+
+TOOLS = {
+    "list_events": google_calendar_server.list_events,
+    "search_events": google_calendar_server.search_events,
+    "create_event": google_calendar_server.create_event,
+    "create_events_bulk": google_calendar_server.create_events_bulk,
+    "check_availability": google_calendar_server.check_availability,
+    "find_conflicts": google_calendar_server.find_conflicts,
+    "find_free_slots": google_calendar_server.find_free_slots,
+}
+
+
+# ---------------- HTTP ----------------
+
+class ServiceState:
+    def __init__(self, users, secret, max_inflight=MAX_INFLIGHT, require_rag=REQUIRE_RAG):
+        self.users = users
+        self.secret = secret
+        self.require_rag = require_rag
+        self.started_at = time.time()
+        self.draining = False
+        self.slots = threading.BoundedSemaphore(max_inflight)
+        self.inflight = 0
+        self.idle = threading.Condition()
+
+    def readiness(self):
+        rag_state = rag_engine.RAG_STATS["state"]
+        ready = not self.draining and (rag_state == "ready" or not self.require_rag)
+        return {
+            "ready": ready,
+            "draining": self.draining,
+            "worker_pid": os.getpid(),
+            "uptime_seconds": time.time() - self.started_at,
+            "users": len(self.users),
+            "inflight": self.inflight,
+            "rag": {
+                "state": rag_state,
+                "load_seconds": rag_engine.RAG_STATS["load_seconds"],
+                "error": rag_engine.RAG_STATS["error"]
+            }
+        }
+
+    def wait_idle(self, timeout):
+        deadline = time.monotonic() + timeout
+        with self.idle:
+            while self.inflight:
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    return False
+                self.idle.wait(remaining)
+        return True
+
+
+def _json_default(value):
+    # Event records (event_model.Event) are read-only mappings.
+    if isinstance(value, Mapping):
+        return dict(value)
+    return str(value)
+
+
+class ServiceHandler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"
+    server_version = "AgenticCalendar/1.0"
+
+    @property
+    def state(self):
+        return self.server.state
+
+    def log_message(self, format, *args):
+        return
+
+    def _send(self, status, body, content_type="application/json"):
+        if isinstance(body, (dict, list)):
+            body = json.dumps(body, default=_json_default)
+        data = body.encode("utf-8")
+
+        self.send_response(status)
+        self.send_header("Content-Type", content_type)
+        self.send_header("Content-Length", str(len(data)))
+        if self.state.draining:
+            self.send_header("Connection", "close")
+            self.close_connection = True
+        self.end_headers()
+        self.wfile.write(data)
+
+    def do_GET(self):
+        path = self.path.split("?")[0]
+
+        if path == "/healthz":
+            self._send(200, {"status": "ok"})
+        elif path == "/readyz":
+            readiness = self.state.readiness()
+            self._send(200 if readiness["ready"] else 503, readiness)
+        elif path == "/metrics":
+            self._send(200, telemetry.openmetrics_text(), "application/openmetrics-text; version=1.0.0; charset=utf-8")
+        else:
+            self._send(404, {"error": "not found"})
+
+    def do_POST(self):
+        path = self.path.split("?")[0]
+
+        if path == "/query":
+            call = self._query
+        elif path.startswith("/tools/") and path[len("/tools/"):] in TOOLS:
+            call = self._tool(TOOLS[path[len("/tools/"):]])
+        else:
+            self._send(404, {"error": "not found"})
+            return
+
+        try:
+            length = int(self.headers.get("Content-Length", 0))
+            payload = json.loads(self.rfile.read(length) or b"{}")
+        except ValueError:
+            self._send(400, {"error": "body must be JSON"})
+            return
+
+        if self.state.draining:
+            self._send(503, {"error": "shutting down"})
+            return
+
+        if not self.state.slots.acquire(blocking=False):
+            self._send(503, {"error": "too many requests in flight"})
+            return
+
+        with self.state.idle:
+            self.state.inflight += 1
+        try:
+            self._run(call, payload)
+        finally:
+            with self.state.idle:
+                self.state.inflight -= 1
+                self.state.idle.notify_all()
+            self.state.slots.release()
+
+    def _run(self, call, payload):
+        try:
+            user_id = authenticate(self.headers.get("Authorization"), self.state.secret)
+        except Unauthorized as exc:
+            self._send(401, {"error": str(exc)})
+            return
+
+        try:
+            with self.state.users.use(user_id) as manager, use_service_manager(manager):
+                result = call(payload)
+        except (TypeError, ValueError, KeyError) as exc:
+            self._send(400, {"error": f"{type(exc).__name__}: {exc}"})
+            return
+        except UnknownUser as exc:
+            self._send(401, {"error": str(exc)})
+            return
+        except Exception as exc:
+            self._send(500, {"error": f"{type(exc).__name__}: {exc}"})
+            return
+
+        self._send(200, result)
+
+    @staticmethod
+    def _query(payload):
+        return calendar_client.agent_decide_and_act(payload["query"])
+
+    @staticmethod
+    def _tool(fn):
+        return lambda payload: fn(**payload)
+
+
+class ServiceServer(ThreadingHTTPServer):
+    daemon_threads = True
+    request_queue_size = 128
+
+    def __init__(self, sock, state):
+        super().__init__(sock.getsockname()[:2], ServiceHandler, bind_and_activate=False)
+        self.socket.close()
+        self.socket = sock
+        self.state = state
+
+
+# ---------------- WORKERS ----------------
+
+def serve_worker(sock, args, secret):
+    """
+    Runs one worker until SIGTERM/SIGINT: warms up, serves, then drains.
+    ``secret`` is the token signing secret loaded by main().
+    """
+    # Workers always record spans for /metrics on the service port, so
+    # AGENT_METRICS_PORT (a second listener per worker) is not used here.
+    telemetry.configure_from_env(enabled=True, metrics_port=None, console_events=False)
+
+    state = ServiceState(UserRegistry(args.token_dir), secret, args.max_inflight, not args.no_rag)
+    server = ServiceServer(sock, state)
+
+    calendar_service.get_discovery_document()
+    if not args.no_rag:
+        rag_engine.warm_up(background=True)
+
+    def stop(signum, frame):
+        if state.draining:
+            return
+        # Fail readiness first so the load balancer stops routing here,
+        # then stop accepting and let in-flight requests finish.
+        state.draining = True
+        threading.Thread(target=server.shutdown, name="service-shutdown", daemon=True).start()
+
+    signal.signal(signal.SIGTERM, stop)
+    signal.signal(signal.SIGINT, stop)
+
+    print(f"[Service] worker {os.getpid()} serving on {sock.getsockname()[0]}:{sock.getsockname()[1]}", flush=True)
+    server.serve_forever()
+
+    if not state.wait_idle(args.shutdown_timeout):
+        print(f"[Service] worker {os.getpid()}: {state.inflight} requests still running at shutdown", flush=True)
+
+    state.users.close()
+    calendar_fanout.shutdown_executor()
+    telemetry.configure(enabled=False)
+    print(f"[Service] worker {os.getpid()} stopped", flush=True)
+
+
+def prepare_index():
+    """
+    Brings the saved index up to date once, in a separate process, before
+    the workers start. Workers then only memory-map it, so N workers share
+    one read-only copy in the page cache.
+    """
+    error = rag_engine.prepare_read_only_index()
+    if error is not None:
+        print(f"[Service] index preparation failed:\n{error}", flush=True)
+        return False
+    return True
+
+
+def supervise(sock, args, secret):
+    """
+    Pre-forks ``args.workers`` processes on the shared listening socket,
+    restarts any that die and forwards SIGTERM/SIGINT on shutdown.
+    """
+    children = {}
+    stopping = threading.Event()
+
+    def spawn():
+        pid = os.fork()
+        if pid == 0:
+            code = 0
+            try:
+                serve_worker(sock, args, secret)
+            except BaseException:
+                traceback.print_exc()
+                code = 1
+            finally:
+                os._exit(code)
+        children[pid] = time.monotonic()
+
+    def stop(signum, frame):
+        stopping.set()
+        for pid in list(children):
+            try:
+                os.kill(pid, signal.SIGTERM)
+            except ProcessLookupError:
+                pass
+
+    signal.signal(signal.SIGTERM, stop)
+    signal.signal(signal.SIGINT, stop)
+
+    for _ in range(args.workers):
+        spawn()
+
+    deadline = None
+    while children:
+        if stopping.is_set() and deadline is None:
+            deadline = time.monotonic() + args.shutdown_timeout + 5
+
+        try:
+            pid, status = os.waitpid(-1, 0 if deadline is None else os.WNOHANG)
+        except ChildProcessError:
+            break
+        except InterruptedError:
+            continue
+
+        if pid:
+            started = children.pop(pid, None)
+            if not stopping.is_set() and started is not None:
+                print(f"[Service] worker {pid} exited ({status}); restarting", flush=True)
+                if time.monotonic() - started < 1:
+                    time.sleep(1)
+                spawn()
+        elif time.monotonic() > deadline:
+            for pid in children:
+                os.kill(pid, signal.SIGKILL)
+            deadline = time.monotonic() + 5
+        else:
+            time.sleep(0.1)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Agentic Calendar Assistant HTTP/JSON service")
+    parser.add_argument("--host", default=SERVICE_HOST)
+    parser.add_argument("--port", type=int, default=SERVICE_PORT)
+    parser.add_argument("--workers", type=int, default=SERVICE_WORKERS)
+    parser.add_argument("--token-dir", default=TOKEN_DIR)
+    parser.add_argument("--max-inflight", type=int, default=MAX_INFLIGHT)
+    parser.add_argument("--shutdown-timeout", type=float, default=SHUTDOWN_TIMEOUT_SECONDS)
+    parser.add_argument("--no-rag", action="store_true", help="serve calendar tools without the knowledge base")
+    parser.add_argument("--issue-token", metavar="USER_ID",
+                        help="print a bearer token for USER_ID (signed with the service secret) and exit")
+    parser.add_argument("--token-ttl", type=float, default=TOKEN_TTL_SECONDS, help="token lifetime in seconds")
+    args = parser.parse_args()
+
+    # Loaded before forking so every worker verifies with the same secret.
+    secret = load_auth_secret()
+
+    if args.issue_token:
+        print(issue_token(args.issue_token, secret, ttl=args.token_ttl))
+        return
+
+    sock = socket.create_server((args.host, args.port), backlog=ServiceServer.request_queue_size)
+
+    if not args.no_rag:
+        prepare_index()
+
+    if args.workers <= 1:
+        serve_worker(sock, args, secret)
+    else:
+        supervise(sock, args, secret)
+
+    sock.close()
+
+
+if __name__ == "__main__":
+    main()
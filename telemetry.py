@@ -0,0 +1,392 @@
+import bisect
+import contextvars
+import functools
+import inspect
+import itertools
+import json
+import os
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+CONSOLE_LABELS = {
+    "agent.query": "[Agent]",
+    "agent.reasoning": "[Agent Reasoning]",
+    "agent.action": "[Agent Action]",
+    "rag.warning": "[RAG]",
+    "credentials.warning": "[Credential Store]"
+}
+
+# Histogram bucket upper bounds in ms: 0.01 ms .. ~105 s, sqrt(2) apart.
+BUCKET_BOUNDS_MS = tuple(0.01 * 2 ** (i / 2) for i in range(48))
+
+# Off until an entry point calls configure() or configure_from_env(),
+# which reads AGENT_TRACE=1, AGENT_TRACE_FILE (finished spans as JSON
+# lines) and AGENT_METRICS_PORT (OpenMetrics on /metrics, loopback only
+# unless AGENT_METRICS_HOST names another address); importing this
+# module opens no files or ports. While off, span() returns a shared
+# no-op and nothing is recorded; events are still echoed to the console
+# unless AGENT_CONSOLE_EVENTS=0.
+_ENABLED = False
+_CONSOLE_EVENTS = os.environ.get("AGENT_CONSOLE_EVENTS", "1") != "0"
+_JSONL = None
+_JSONL_LOCK = threading.Lock()
+_METRICS_SERVER = None
+
+_CURRENT_SPAN = contextvars.ContextVar("current_span", default=None)
+_IDS = itertools.count(1)
+
+_LOCK = threading.Lock()
+_HISTOGRAMS = {}
+_COUNTERS = {}
+_COLLECTORS = []
+
+
+# ================= HISTOGRAMS + COUNTERS =================
+
+class Histogram:
+    """
+    Fixed-bucket latency histogram. Percentiles are interpolated inside
+    the bucket, so they are accurate to within one bucket (~41%).
+    """
+
+    __slots__ = ("counts", "count", "total", "maximum")
+
+    def __init__(self):
+        self.counts = [0] * (len(BUCKET_BOUNDS_MS) + 1)
+        self.count = 0
+        self.total = 0.0
+        self.maximum = 0.0
+
+    def observe(self, value_ms):
+        self.counts[bisect.bisect_left(BUCKET_BOUNDS_MS, value_ms)] += 1
+        self.count += 1
+        self.total += value_ms
+        if value_ms > self.maximum:
+            self.maximum = value_ms
+
+    def percentile(self, pct):
+        if not self.count:
+            return 0.0
+
+        rank = pct / 100 * self.count
+        seen = 0
+        for position, bucket_count in enumerate(self.counts):
+            if bucket_count and seen + bucket_count >= rank:
+                lower = BUCKET_BOUNDS_MS[position - 1] if position else 0.0
+                upper = BUCKET_BOUNDS_MS[position] if position < len(BUCKET_BOUNDS_MS) else self.maximum
+                estimate = lower + (upper - lower) * (rank - seen) / bucket_count
+                return min(estimate, self.maximum)
+            seen += bucket_count
+        return self.maximum
+
+    def summary(self):
+        return {
+            "count": self.count,
+            "mean_ms": self.total / self.count if self.count else 0.0,
+            "p50_ms": self.percentile(50),
+            "p95_ms": self.percentile(95),
+            "p99_ms": self.percentile(99),
+            "max_ms": self.maximum
+        }
+
+
+def observe(name, value_ms):
+    if not _ENABLED:
+        return
+    with _LOCK:
+        histogram = _HISTOGRAMS.get(name)
+        if histogram is None:
+            histogram = _HISTOGRAMS[name] = Histogram()
+        histogram.observe(value_ms)
+
+
+def count(name, amount=1):
+    if not _ENABLED:
+        return
+    with _LOCK:
+        _COUNTERS[name] = _COUNTERS.get(name, 0) + amount
+
+
+def register_collector(collector):
+    """
+    ``collector()`` returns {metric_name: number}; it is read at export
+    time, so caches can expose their own hit/miss counters without
+    reporting every access.
+    """
+    _COLLECTORS.append(collector)
+
+
+# ================= SPANS + EVENTS =================
+
+class Span:
+    __slots__ = ("name", "trace_id", "span_id", "parent_id", "attributes", "events",
+                 "started", "wall_started", "duration_ms", "error", "_token")
+
+    def __init__(self, name, parent, attributes):
+        self.name = name
+        self.span_id = next(_IDS)
+        self.trace_id = parent.trace_id if parent else self.span_id
+        self.parent_id = parent.span_id if parent else None
+        self.attributes = attributes
+        self.events = []
+        self.error = None
+        self.duration_ms = None
+
+    def set(self, **attributes):
+        self.attributes.update(attributes)
+
+    def __enter__(self):
+        self._token = _CURRENT_SPAN.set(self)
+        self.wall_started = time.time()
+        self.started = time.perf_counter()
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        self.duration_ms = (time.perf_counter() - self.started) * 1000
+        _CURRENT_SPAN.reset(self._token)
+        if exc is not None:
+            self.error = f"{exc_type.__name__}: {exc}"
+            count(f"{self.name}.errors")
+        observe(self.name, self.duration_ms)
+        _write(self.record())
+        return False
+
+    def record(self):
+        return {
+            "type": "span",
+            "name": self.name,
+            "trace_id": self.trace_id,
+            "span_id": self.span_id,
+            "parent_id": self.parent_id,
+            "start": self.wall_started,
+            "duration_ms": self.duration_ms,
+            "attributes": self.attributes,
+            "events": self.events,
+            "error": self.error
+        }
+
+
+class _NoopSpan:
+    __slots__ = ()
+
+    def set(self, **attributes):
+        pass
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        return False
+
+
+_NOOP_SPAN = _NoopSpan()
+
+
+def span(name, **attributes):
+    """
+    ``with span("calendar.http", method="GET"):`` times the block as a
+    child of the current span and records it in the ``name`` histogram.
+    """
+    if not _ENABLED:
+        return _NOOP_SPAN
+    return Span(name, _CURRENT_SPAN.get(), attributes)
+
+
+def traced(name):
+    """
+    Decorator form of span() for sync and async functions.
+    """
+    def decorate(fn):
+        if inspect.iscoroutinefunction(fn):
+            @functools.wraps(fn)
+            async def async_wrapper(*args, **kwargs):
+                with span(name):
+                    return await fn(*args, **kwargs)
+            return async_wrapper
+
+        @functools.wraps(fn)
+        def wrapper(*args, **kwargs):
+            with span(name):
+                return fn(*args, **kwargs)
+        return wrapper
+
+    return decorate
+
+
+def current_span():
+    """
+    The innermost open span, or a no-op one; ``current_span().set(...)``
+    is always safe to call.
+    """
+    return (_CURRENT_SPAN.get() or _NOOP_SPAN) if _ENABLED else _NOOP_SPAN
+
+
+def event(name, message, **fields):
+    """
+    Structured replacement for the agent's console lines. The message is
+    echoed as before ("[Agent Reasoning] ..."); with tracing on, the event
+    is also attached to the current span (or written on its own).
+    """
+    if _CONSOLE_EVENTS:
+        print(f"{CONSOLE_LABELS.get(name, '[' + name + ']')} {message}")
+
+    if not _ENABLED:
+        return
+
+    count(f"events.{name}")
+    record = {"name": name, "message": message, "time": time.time(), **fields}
+    parent = _CURRENT_SPAN.get()
+    if parent is not None:
+        parent.events.append(record)
+    else:
+        _write(dict(record, type="event"))
+
+
+# ================= EXPORT =================
+
+def _write(record):
+    if _JSONL is None:
+        return
+    line = json.dumps(record, default=str)
+    with _JSONL_LOCK:
+        _JSONL.write(line + "\n")
+
+
+def snapshot():
+    """
+    {"histograms": {name: summary}, "counters": {name: value}} including
+    values from registered collectors.
+    """
+    with _LOCK:
+        histograms = {name: h.summary() for name, h in _HISTOGRAMS.items()}
+        counters = dict(_COUNTERS)
+
+    for collector in _COLLECTORS:
+        try:
+            counters.update(collector())
+        except Exception:
+            continue
+
+    return {"histograms": histograms, "counters": counters}
+
+
+def _metric_name(name):
+    return "agent_" + "".join(ch if ch.isalnum() else "_" for ch in name)
+
+
+def openmetrics_text():
+    """
+    Histograms (in seconds) and counters in OpenMetrics text format.
+    """
+    lines = []
+
+    with _LOCK:
+        histograms = [(name, list(h.counts), h.count, h.total) for name, h in sorted(_HISTOGRAMS.items())]
+        counters = dict(_COUNTERS)
+
+    for name, counts, total_count, total_ms in histograms:
+        metric = _metric_name(name) + "_seconds"
+        lines.append(f"# TYPE {metric} histogram")
+        cumulative = 0
+        for bound, bucket_count in zip(BUCKET_BOUNDS_MS, counts):
+            cumulative += bucket_count
+            lines.append(f'{metric}_bucket{{le="{bound / 1000:.6g}"}} {cumulative}')
+        lines.append(f'{metric}_bucket{{le="+Inf"}} {total_count}')
+        lines.append(f"{metric}_count {total_count}")
+        lines.append(f"{metric}_sum {total_ms / 1000:.6f}")
+
+    for collector in _COLLECTORS:
+        try:
+            counters.update(collector())
+        except Exception:
+            continue
+
+    for name, value in sorted(counters.items()):
+        metric = _metric_name(name)
+        lines.append(f"# TYPE {metric} gauge")
+        lines.append(f"{metric} {value}")
+
+    lines.append("# EOF")
+    return "\n".join(lines) + "\n"
+
+
+class _MetricsHandler(BaseHTTPRequestHandler):
+    def do_GET(self):
+        if self.path.split("?")[0] != "/metrics":
+            self.send_error(404)
+            return
+        body = openmetrics_text().encode("utf-8")
+        self.send_response(200)
+        self.send_header("Content-Type", "application/openmetrics-text; version=1.0.0; charset=utf-8")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, format, *args):
+        return
+
+
+def serve_metrics(port, host="127.0.0.1"):
+    """
+    Serves /metrics from a daemon thread. Returns the server. The endpoint
+    has no authentication, so it listens on loopback unless ``host`` says
+    otherwise (e.g. "0.0.0.0" for a scraper on another machine).
+    """
+    global _METRICS_SERVER
+
+    if _METRICS_SERVER is None:
+        _METRICS_SERVER = ThreadingHTTPServer((host, port), _MetricsHandler)
+        threading.Thread(
+            target=_METRICS_SERVER.serve_forever,
+            name="metrics-http",
+            daemon=True
+        ).start()
+    return _METRICS_SERVER
+
+
+# ================= CONFIGURATION =================
+
+def configure(enabled=True, jsonl_path=None, metrics_port=None, console_events=None, metrics_host="127.0.0.1"):
+    global _ENABLED, _JSONL, _CONSOLE_EVENTS
+
+    _ENABLED = enabled or bool(jsonl_path) or bool(metrics_port)
+
+    if console_events is not None:
+        _CONSOLE_EVENTS = console_events
+
+    with _JSONL_LOCK:
+        if _JSONL is not None:
+            _JSONL.close()
+            _JSONL = None
+        if jsonl_path:
+            _JSONL = open(jsonl_path, "a", buffering=1, encoding="utf-8")
+
+    if metrics_port:
+        serve_metrics(int(metrics_port), metrics_host)
+
+
+def reset():
+    with _LOCK:
+        _HISTOGRAMS.clear()
+        _COUNTERS.clear()
+
+
+def is_enabled():
+    return _ENABLED
+
+
+def configure_from_env(**overrides):
+    """
+    configure() from AGENT_TRACE, AGENT_TRACE_FILE, AGENT_METRICS_PORT and
+    AGENT_METRICS_HOST, for programs' entry points. Keyword arguments take
+    precedence.
+    """
+    settings = {
+        "enabled": os.environ.get("AGENT_TRACE") == "1",
+        "jsonl_path": os.environ.get("AGENT_TRACE_FILE"),
+        "metrics_port": os.environ.get("AGENT_METRICS_PORT"),
+        "metrics_host": os.environ.get("AGENT_METRICS_HOST", "127.0.0.1")
+    }
+    settings.update(overrides)
+    configure(**settings)
@@ -1,29 +1,26 @@
-import os
-import pickle
 from google_auth_oauthlib.flow import InstalledAppFlow
 from googleapiclient.discovery import build
-from google.auth.transport.requests import Request
+
+from credential_store import get_credential_store
 
 SCOPES = ['https://www.googleapis.com/auth/calendar.readonly']
+# Read-only credentials live under their own user so they never replace
+# the agent's read-write ones.
+USER_ID = 'test-calendar-readonly'
 
 def get_service():
-    creds = None
-
-    if os.path.exists('token.pickle'):
-        with open('token.pickle', 'rb') as token:
-            creds = pickle.load(token)
+    store = get_credential_store()
+    creds = store.get(USER_ID)
 
     if not creds or not creds.valid:
         if creds and creds.expired and creds.refresh_token:
-            creds.refresh(Request())
+            store.refresh(USER_ID, force=True)
         else:
             flow = InstalledAppFlow.from_client_secrets_file(
                 'credentials.json', SCOPES
             )
-            creds = flow.run_local_server(port=0)
-
-        with open('token.pickle', 'wb') as token:
-            pickle.dump(creds, token)
+            store.put(USER_ID, flow.run_local_server(port=0))
+            creds = store.get(USER_ID)
 
     return build('calendar', 'v3', credentials=creds)
 